@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: classify_review() vs. the old if/elif chain.
+
+Runs over the three papers in lab3/data. For every paper it classifies each
+reference and every non-empty line, the same texts for both, with
+  - the old approach: an if/elif chain of uncompiled re.search calls
+  - the new approach: classify_review(), a substring pre-check and then the
+    precompiled rules in priority order
+and checks that both give the same answer, also on references where the
+rules overlap, before reporting the timings.
+
+Usage: python benchmark_review_classifier.py [repeats]
+"""
+
+import os
+import re
+import sys
+import timeit
+
+from extract_reviews import classify_review, iter_references, REVIEW_REASONS
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'lab3', 'data')
+PAPERS = ["Badia-i-Mompel et al 2023.md", "Carthew.md", "Claringbould.md"]
+
+# Texts where one rule's match overlaps another's: the earlier rule must win
+OVERLAPS = [
+    "Kim, S. Title. Trends Nat. Rev. Genet. 1, 2 (2020).",
+    "Lai, A. Trends Annu. Rev. Cell 3, 4 (2019).",
+    "Du, B. This Trends Genet. review. 5, 6 (2021).",
+]
+
+
+def old_review_reason(ref_text):
+    """The old per-reference if/elif chain of four re.search calls."""
+    if re.search(r'Nat\. Rev\.', ref_text):
+        return "Nature Reviews journal"
+    elif re.search(r'Annu\. Rev\.', ref_text):
+        return "Annual Review journal"
+    elif re.search(r'Trends\s+[A-Z]', ref_text):
+        return "Trends journal"
+    elif re.search(r'This.*review|extensive review|reviewed elsewhere', ref_text, re.IGNORECASE):
+        return "Explicitly marked as review"
+    return ""
+
+
+def new_review_reason(ref_text):
+    rule = classify_review(ref_text)
+    return REVIEW_REASONS[rule] if rule else ""
+
+
+def load_texts(path):
+    """Return (references, non-empty lines) for one paper."""
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            refs = list(iter_references(f))
+        except ValueError:
+            refs = []
+        f.seek(0)
+        lines = [line.strip() for line in f if line.strip()]
+    return refs, lines
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    print(f"{'paper':<32}{'texts':>8}{'old (ms)':>12}{'new (ms)':>12}{'speedup':>10}")
+    for name in PAPERS:
+        refs, lines = load_texts(os.path.join(DATA_DIR, name))
+        texts = refs + lines
+
+        # Same answers before we compare speed
+        for text in texts + OVERLAPS:
+            assert old_review_reason(text) == new_review_reason(text), text
+
+        def old():
+            for ref in texts:
+                old_review_reason(ref)
+
+        def new():
+            for ref in texts:
+                new_review_reason(ref)
+
+        old_ms = min(timeit.repeat(old, number=1, repeat=repeats)) * 1000
+        new_ms = min(timeit.repeat(new, number=1, repeat=repeats)) * 1000
+        print(f"{name:<32}{len(texts):>8}{old_ms:>12.2f}{new_ms:>12.2f}{old_ms / new_ms:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Fuzz test + worst-case benchmark: find_title() vs. the old title regex.
+
+1. Fuzz: random references built from the pieces that matter to the title
+   pattern (periods, runs of spaces, journal words, initials) must give the
+   same title with both implementations.
+2. Worst case: references glued together because a metadata marker was
+   missing, and period/space-heavy junk, at growing sizes. The time per
+   character of find_title must stay flat; the regex is timed alongside.
+
+Usage: python benchmark_title_extraction.py [fuzz_cases]
+"""
+
+import random
+import re
+import sys
+import time
+
+from extract_reviews import find_title, TITLE_END_WORDS
+
+OLD_TITLE_RE = re.compile(r'^[^\.]+\.\s+([^\.]+(?:\.[^\.]+)*?)\.\s+(?:Nat\.|Annu\.|Trends|Mol\.|Cell|Genet|Biol|Med|Methods)')
+
+PIECES = ['.', '. ', '  ', ' ', '\n', '\t', 'x', 'Smith', 'A.', ' & ', ',', '..', '\xa0'] + \
+         [' ' + w for w in TITLE_END_WORDS] + list(TITLE_END_WORDS)
+
+REFERENCE = ("Statello, L., Guo, C.-J., Chen, L.-L. & Huarte, M. Gene regulation by long non-coding RNAs "
+             "and its biological functions. Nat. Rev. Mol. Cell Biol. 22, 96–118 (2021). ")
+NO_JOURNAL = "Kim, S. & Wysocka, J. Deciphering the multi-scale cis-regulatory code. Xyz 83, 373–392 (2023). "
+
+
+def old_find_title(ref_text):
+    m = OLD_TITLE_RE.search(ref_text)
+    return m.group(1) if m else None
+
+
+def fuzz(cases, seed=0):
+    rng = random.Random(seed)
+    for _ in range(cases):
+        text = ''.join(rng.choice(PIECES) for _ in range(rng.randint(0, 30)))
+        expected = old_find_title(text)
+        got = find_title(text, max_chars=None)
+        assert got == expected, (text, expected, got)
+    print(f"fuzz: {cases} random references, find_title == old regex")
+
+
+def timed(func, text):
+    t0 = time.perf_counter()
+    func(text)
+    return time.perf_counter() - t0
+
+
+def worst_cases():
+    shapes = [
+        ("glued, title found", lambda n: "Smith, J. " + REFERENCE * n),
+        ("glued, no journal word", lambda n: NO_JOURNAL * n),
+        ("periods and spaces", lambda n: "Smith. " + "a.  " * (n * 40)),
+        ("initials only", lambda n: "Smith, J. " + "A. B. C. " * (n * 20)),
+    ]
+    print(f"\n{'input':<24}{'chars':>10}{'old (ms)':>12}{'new (ms)':>12}{'new ns/char':>14}")
+    for name, make in shapes:
+        per_char = []
+        for n in (100, 400, 1600):
+            text = make(n)
+            old_s = timed(old_find_title, text)
+            new_s = timed(lambda t: find_title(t, max_chars=None), text)
+            assert find_title(text, max_chars=None) == old_find_title(text), name
+            per_char.append(new_s / len(text))
+            print(f"{name:<24}{len(text):>10}{old_s * 1000:>12.2f}{new_s * 1000:>12.2f}"
+                  f"{new_s / len(text) * 1e9:>14.1f}")
+        # Linear: 16x the input must not cost much more than 16x the time
+        assert per_char[-1] < per_char[0] * 4 + 50e-9, f"{name}: find_title is not linear"
+
+    # With the default length bound, a huge run-on reference gives up instead of stalling
+    text = NO_JOURNAL * 200_000
+    t = timed(find_title, text)
+    print(f"\n{len(text) / 1e6:.0f} MB run-on reference with the default length bound: "
+          f"{t * 1000:.1f} ms, title {find_title(text)!r}")
+
+
+def main():
+    cases = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    fuzz(cases)
+    worst_cases()
+
+
+if __name__ == '__main__':
+    main()
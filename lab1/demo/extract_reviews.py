@@ -1,237 +1,502 @@
 #!/usr/bin/env python3
 """
 Extract review articles from the references section of the paper.
+
+The paper is streamed line by line: only the lines between the "References"
+heading and "Acknowledgements" are looked at, and every reference is yielded
+exactly once, so memory stays constant no matter how long the paper is.
+
+The output format follows the output file extension: .csv (default), or
+.arrow/.feather/.parquet for a columnar file that download_reviews.py can
+memory-map and read only the columns it needs from (needs pyarrow).
+
+Incremental mode keeps a manifest (mtime, size, sha256) of the papers in a
+drop directory and only parses papers that are new or changed; their rows
+are upserted into the existing output, keyed by a source_paper column:
+
+    python extract_reviews.py --incremental lab1/data review_articles.csv
+    python extract_reviews.py --incremental lab1/data review_articles.csv --watch 30
+
+Add --profile profile.jsonl to record per-stage timings for every paper that
+gets parsed (see stage_profiler.py), and --slowest N to list the slowest ones.
 """
 
+import argparse
+import glob
+import hashlib
+import json
+import os
 import re
 import csv
+import time
+
+from stage_profiler import StageProfiler, print_slowest
+
+# pyarrow is only needed for columnar output
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Default input/output files (can be overridden on the command line)
+INPUT_FILE = "/Users/simonwang/Documents/Usage/AIagent4bio/lab1/data/Badia-i-Mompel et al 2023.md"
+OUTPUT_FILE = "/Users/simonwang/Documents/Usage/AIagent4bio/lab1/demo/review_articles.csv"
+
+FIELDNAMES = ['authors', 'title', 'journal', 'volume', 'pages', 'year', 'full_citation', 'review_reason']
+COLUMNAR_EXTENSIONS = ('.arrow', '.feather', '.parquet')
+INCREMENTAL_FIELDNAMES = ['source_paper'] + FIELDNAMES
+
+# Lines that are publisher metadata, not part of any reference
+METADATA_LINES = {'Article', 'CAS', 'PubMed', 'Google Scholar', 'References'}
 
-# Read the paper file
-input_file = "/Users/simonwang/Documents/Usage/AIagent4bio/lab1/data/Badia-i-Mompel et al 2023.md"
-
-with open(input_file, 'r', encoding='utf-8') as f:
-    content = f.read()
-
-# Find the References section
-ref_start = content.find("References")
-if ref_start == -1:
-    print("Error: Could not find References section")
-    exit(1)
-
-# Extract references section (from "References" to "Acknowledgements" or end of file)
-ref_section = content[ref_start:]
-ack_start = ref_section.find("Acknowledgements")
-if ack_start != -1:
-    ref_section = ref_section[:ack_start]
-
-# Patterns to identify review articles
-review_patterns = [
-    r'Nat\. Rev\.',  # Nature Reviews journals
-    r'Annu\. Rev\.',  # Annual Review journals
-    r'Trends',  # Trends journals
-    r'This.*review',  # Explicit mentions
-    r'extensive review',  # Explicit mentions
-    r'reviewed elsewhere',  # Explicit mentions
+# Rules that mark a reference as a review, in priority order: (name, pattern, reason).
+# Each rule is compiled once and searched on its own, in order, like an if/elif
+# chain (one combined regex would let a lower rule's match consume the text of a
+# higher one, e.g. "Trends N" hiding the "Nat. Rev." in "Trends Nat. Rev.").
+REVIEW_RULES = [
+    ('nature_reviews', r'Nat\. Rev\.', "Nature Reviews journal"),
+    ('annual_review', r'Annu\. Rev\.', "Annual Review journal"),
+    ('trends', r'Trends\s+[A-Z]', "Trends journal"),
+    ('explicit', r'(?i:This.*review|extensive review|reviewed elsewhere)', "Explicitly marked as review"),
 ]
+REVIEW_PATTERNS = [(name, re.compile(pattern)) for name, pattern, _ in REVIEW_RULES]
+REVIEW_REASONS = {name: reason for name, _, reason in REVIEW_RULES}
+
+# Precompiled patterns used for every line / reference
+COUNT_LINE_RE = re.compile(r'^\d+[,\d]*$')
+REF_START_RE = re.compile(r'^[A-Z][a-z]+.*,.*[A-Z]\.|^[A-Z][a-z]+.*et al\.')
+AUTHOR_RE = re.compile(r'^([^\.]+)\.')
+TITLE_SUFFIX_RE = re.compile(r'\s+(CAS|PubMed|Google Scholar).*$')
+INITIALS_RE = re.compile(r'^[A-Z]\.\s+[A-Z]\.')
+JOURNAL_RE = re.compile(r'\.\s+((?:Nat\.\s+Rev\.|Annu\.\s+Rev\.|Trends)\s+[^\.]+?)\.?\s+(\d+)[,\s]+([^\s\(]+)\s+\((\d{4})\)')
+DOI_JOURNAL_RE = re.compile(r'\.\s+((?:Nat\.\s+Rev\.|Annu\.\s+Rev\.|Trends)\s+[^\.]+?)\.?\s+https?://')
+YEAR_RE = re.compile(r'\((\d{4})\)')
+
+# A title ends at ". " followed by one of these journal words (Authors. Title. Journal ...)
+TITLE_END_WORDS = ('Nat.', 'Annu.', 'Trends', 'Mol.', 'Cell', 'Genet', 'Biol', 'Med', 'Methods')
+TITLE_END_RE = re.compile(r'\.(?=\s+(?:' + '|'.join(re.escape(w) for w in TITLE_END_WORDS) + '))')
+# Glued run-on references can be huge; a title is never longer than this
+TITLE_MAX_CHARS = 1000
+
+
+def iter_reference_section(lines):
+    """
+    Yield the lines from "References" up to (not including) "Acknowledgements".
+
+    Raises ValueError if the paper has no References section.
+    """
+    found = False
+    for line in lines:
+        if not found:
+            ref_start = line.find("References")
+            if ref_start == -1:
+                continue
+            found = True
+            line = line[ref_start:]
+        ack_start = line.find("Acknowledgements")
+        if ack_start != -1:
+            yield line[:ack_start]
+            return
+        yield line
+    if not found:
+        raise ValueError("Could not find References section")
+
+
+def iter_references(lines):
+    """Yield one string per reference in the paper's References section."""
+    return group_references(iter_reference_section(lines))
+
+
+def group_references(section_lines):
+    """Group the reference-section lines into one string per reference."""
+    current_ref_text = ""
+    collecting = False
+
+    for line in section_lines:
+        line = line.strip()
+
+        # Skip empty lines and metadata lines
+        if not line or line in METADATA_LINES:
+            continue
+
+        # Citation counts and "Download references" close the current reference
+        if COUNT_LINE_RE.match(line) or line.startswith('Download references'):
+            if collecting and current_ref_text:
+                yield current_ref_text
+                current_ref_text = ""
+                collecting = False
+            continue
+
+        # Check if this looks like the start of a reference
+        # Pattern: LastName, FirstInitial. & LastName, FirstInitial.
+        if REF_START_RE.match(line):
+            if collecting and current_ref_text:
+                yield current_ref_text
+            current_ref_text = line
+            collecting = True
+        elif collecting:
+            current_ref_text += " " + line
+
+    # Don't forget the last one
+    if collecting and current_ref_text:
+        yield current_ref_text
+
+
+def classify_review(ref_text):
+    """
+    Return the name of the highest-priority review rule matching ref_text, or None.
+    """
+    # Every rule needs "Trends" or "ev" (Rev. / review, any case); most
+    # references have neither, and a substring test is much cheaper than the regexes
+    if 'Trends' not in ref_text and 'ev' not in ref_text.lower():
+        return None
+    for name, pattern in REVIEW_PATTERNS:
+        if pattern.search(ref_text):
+            return name
+    return None
+
+
+def parse_review(ref_text):
+    """Return a CSV row for ref_text if it looks like a review, otherwise None."""
+    rule = classify_review(ref_text)
+    if rule is None:
+        return None
+    return review_fields(ref_text, rule, extract_title(ref_text))
+
+
+def find_title(ref_text, max_chars=TITLE_MAX_CHARS):
+    r"""
+    Return the raw title text of "Authors. Title. Journal ...", or None.
+
+    Gives exactly what the old regex
+        ^[^.]+\.\s+([^.]+(?:\.[^.]+)*?)\.\s+(?:Nat\.|Annu\.|Trends|...)
+    captured for titles of up to max_chars characters (None: any length), but
+    without its nested quantifiers: one search for the first period followed
+    by a journal word and one for the first pair of periods (which a title
+    cannot contain), so the cost is linear in the length of the reference.
+    """
+    n = len(ref_text)
+    # Authors: everything up to the first period, then at least one space
+    period = ref_text.find('.')
+    if period < 1:
+        return None
+    start = period + 1
+    while start < n and ref_text[start].isspace():
+        start += 1
+    if start == period + 1 or start == n:
+        return None
+    if ref_text[start] == '.':
+        # The title cannot start with a period, but the regex would let it
+        # start on the last space instead
+        start -= 1
+        if start == period + 1:
+            return None
+
+    # The title ends at the first period followed by spaces and a journal
+    # word; it may contain periods, but never two in a row
+    title_end = TITLE_END_RE.search(ref_text, start)
+    if title_end is None:
+        return None
+    end = title_end.start()
+    if max_chars is not None and end - start > max_chars:
+        return None
+    if ref_text.find('..', start, end + 1) != -1:
+        return None
+    return ref_text[start:end]
+
+
+def extract_title(ref_text):
+    """Return the title (between authors and journal), or "" if none is found."""
+    # Look for pattern: Authors. Title. Journal
+    potential_title = find_title(ref_text)
+    title = ""
+    if potential_title is not None:
+        potential_title = potential_title.strip()
+        # Clean up title - remove common suffixes
+        potential_title = TITLE_SUFFIX_RE.sub('', potential_title)
+        if len(potential_title) > 10 and not INITIALS_RE.match(potential_title):
+            title = potential_title
+    return title
+
+
+def review_fields(ref_text, rule, title):
+    """Build the CSV row for a reference classified as a review by `rule`."""
+    review_reason = REVIEW_REASONS[rule]
+
+    # Parse the reference more carefully
+    # Pattern: Authors. Title. Journal Volume, Pages (Year)
+    # Extract authors (everything up to first period)
+    author_match = AUTHOR_RE.match(ref_text)
+    authors = author_match.group(1).strip() if author_match else ""
 
-# List to store review articles
-review_articles = []
-
-# Split references by lines and process
-lines = ref_section.split('\n')
-current_ref = None
-in_reference = False
-
-for i, line in enumerate(lines):
-    line = line.strip()
-    
-    # Skip empty lines and metadata lines
-    if not line or line in ['Article', 'CAS', 'PubMed', 'Google Scholar', 'References']:
-        continue
-    
-    # Skip citation counts and other metadata
-    if re.match(r'^\d+[,\d]*$', line) or line.startswith('Download references'):
-        continue
-    
-    # Check if this line starts a new reference (author names pattern)
-    # Pattern: LastName, FirstInitial. & LastName, FirstInitial.
-    if re.match(r'^[A-Z][a-z]+.*,.*[A-Z]\.', line) or re.match(r'^[A-Z][a-z]+.*et al\.', line):
-        # Save previous reference if it was a review
-        if current_ref and current_ref.get('is_review'):
-            review_articles.append(current_ref)
-        
-        # Start new reference
-        current_ref = {
-            'full_text': line,
-            'is_review': False,
-            'authors': '',
-            'title': '',
-            'journal': '',
-            'year': '',
-            'volume': '',
-            'pages': ''
-        }
-        in_reference = True
-        
-        # Check if this line contains review indicators
-        for pattern in review_patterns:
-            if re.search(pattern, line, re.IGNORECASE):
-                current_ref['is_review'] = True
-                break
-        
-        # Try to extract author names
-        author_match = re.match(r'^([^\.]+)\.', line)
-        if author_match:
-            current_ref['authors'] = author_match.group(1).strip()
-    
-    elif in_reference and current_ref:
-        # Continue building the reference
-        current_ref['full_text'] += ' ' + line
-        
-        # Check for review indicators in this line
-        for pattern in review_patterns:
-            if re.search(pattern, line, re.IGNORECASE):
-                current_ref['is_review'] = True
-                break
-        
-        # Try to extract journal, year, volume, pages
-        # Pattern: Journal Name Volume, Pages (Year)
-        journal_match = re.search(r'\.\s+([^\.]+)\.?\s+(\d+)[,\s]+([\d–-]+)\s+\((\d{4})\)', line)
-        if journal_match:
-            current_ref['journal'] = journal_match.group(1).strip()
-            current_ref['volume'] = journal_match.group(2).strip()
-            current_ref['pages'] = journal_match.group(3).strip()
-            current_ref['year'] = journal_match.group(4).strip()
-        
-        # Try to extract title (between authors and journal)
-        # Title is usually between the first period and the journal name
-        if not current_ref['title']:
-            title_match = re.search(r'\.\s+([^\.]+(?:\.[^\.]+)*?)\.\s+[A-Z]', current_ref['full_text'])
-            if title_match:
-                potential_title = title_match.group(1).strip()
-                # Filter out common non-title patterns
-                if len(potential_title) > 10 and not re.match(r'^[A-Z]\.', potential_title):
-                    current_ref['title'] = potential_title
-
-# Don't forget the last reference
-if current_ref and current_ref.get('is_review'):
-    review_articles.append(current_ref)
-
-# Now let's do a more comprehensive search by looking at all references
-# and checking each one for review indicators
-all_refs = []
-current_ref_text = ""
-collecting = False
-
-for line in lines:
-    line = line.strip()
-    
-    if not line or line in ['Article', 'CAS', 'PubMed', 'Google Scholar', 'References']:
-        continue
-    
-    if re.match(r'^\d+[,\d]*$', line) or line.startswith('Download references'):
-        if collecting and current_ref_text:
-            all_refs.append(current_ref_text)
-            current_ref_text = ""
-            collecting = False
-        continue
-    
-    # Check if this looks like the start of a reference
-    if re.match(r'^[A-Z][a-z]+.*,.*[A-Z]\.', line) or re.match(r'^[A-Z][a-z]+.*et al\.', line):
-        if collecting and current_ref_text:
-            all_refs.append(current_ref_text)
-        current_ref_text = line
-        collecting = True
-    elif collecting:
-        current_ref_text += " " + line
-
-# Add the last one
-if collecting and current_ref_text:
-    all_refs.append(current_ref_text)
-
-# Now check each reference for review indicators
-review_articles_comprehensive = []
-
-for ref_text in all_refs:
-    is_review = False
-    review_reason = ""
-    
-    # Check for review journal patterns
-    if re.search(r'Nat\. Rev\.', ref_text):
-        is_review = True
-        review_reason = "Nature Reviews journal"
-    elif re.search(r'Annu\. Rev\.', ref_text):
-        is_review = True
-        review_reason = "Annual Review journal"
-    elif re.search(r'Trends\s+[A-Z]', ref_text):
-        is_review = True
-        review_reason = "Trends journal"
-    elif re.search(r'This.*review|extensive review|reviewed elsewhere', ref_text, re.IGNORECASE):
-        is_review = True
-        review_reason = "Explicitly marked as review"
-    
-    if is_review:
-        # Parse the reference more carefully
-        # Pattern: Authors. Title. Journal Volume, Pages (Year)
-        # Extract authors (everything up to first period)
-        author_match = re.match(r'^([^\.]+)\.', ref_text)
-        authors = author_match.group(1).strip() if author_match else ""
-        
-        # Extract title - between authors and journal
-        # Look for pattern: Authors. Title. Journal
-        title_match = re.search(r'^[^\.]+\.\s+([^\.]+(?:\.[^\.]+)*?)\.\s+(?:Nat\.|Annu\.|Trends|Mol\.|Cell|Genet|Biol|Med|Methods)', ref_text)
-        title = ""
-        if title_match:
-            potential_title = title_match.group(1).strip()
-            # Clean up title - remove common suffixes
-            potential_title = re.sub(r'\s+(CAS|PubMed|Google Scholar).*$', '', potential_title)
-            if len(potential_title) > 10 and not re.match(r'^[A-Z]\.\s+[A-Z]\.', potential_title):
-                title = potential_title
-        
-        # Extract journal, volume, pages, year
-        # Pattern for standard citations: Journal Volume, Pages (Year)
-        journal_match = re.search(r'\.\s+((?:Nat\.\s+Rev\.|Annu\.\s+Rev\.|Trends)\s+[^\.]+?)\.?\s+(\d+)[,\s]+([^\s\(]+)\s+\((\d{4})\)', ref_text)
-        journal = ""
-        volume = ""
-        pages = ""
-        year = ""
-        
-        if journal_match:
-            journal = journal_match.group(1).strip()
-            volume = journal_match.group(2).strip()
-            pages = journal_match.group(3).strip()
-            year = journal_match.group(4).strip()
+    # Extract journal, volume, pages, year
+    # Pattern for standard citations: Journal Volume, Pages (Year)
+    journal_match = JOURNAL_RE.search(ref_text)
+    journal = ""
+    volume = ""
+    pages = ""
+    year = ""
+
+    if journal_match:
+        journal = journal_match.group(1).strip()
+        volume = journal_match.group(2).strip()
+        pages = journal_match.group(3).strip()
+        year = journal_match.group(4).strip()
+    else:
+        # Try alternative pattern for DOI references
+        doi_match = DOI_JOURNAL_RE.search(ref_text)
+        if doi_match:
+            journal = doi_match.group(1).strip()
+        year_match = YEAR_RE.search(ref_text)
+        if year_match:
+            year = year_match.group(1)
+
+    return {
+        'authors': authors,
+        'title': title,
+        'journal': journal,
+        'volume': volume,
+        'pages': pages,
+        'year': year,
+        'full_citation': ref_text,
+        'review_reason': review_reason
+    }
+
+
+def write_review_articles(review_articles, output_file, fieldnames=FIELDNAMES):
+    """Write the rows as CSV, or as Arrow IPC / Parquet for columnar extensions."""
+    if output_file.lower().endswith(COLUMNAR_EXTENSIONS):
+        if not HAS_PYARROW:
+            print("Error: columnar output needs pyarrow. Install with: pip install pyarrow")
+            exit(1)
+        schema = pa.schema([(name, pa.string()) for name in fieldnames])
+        table = pa.Table.from_pylist(review_articles, schema=schema)
+        if output_file.lower().endswith('.parquet'):
+            pq.write_table(table, output_file)
         else:
-            # Try alternative pattern for DOI references
-            doi_match = re.search(r'\.\s+((?:Nat\.\s+Rev\.|Annu\.\s+Rev\.|Trends)\s+[^\.]+?)\.?\s+https?://', ref_text)
-            if doi_match:
-                journal = doi_match.group(1).strip()
-            year_match = re.search(r'\((\d{4})\)', ref_text)
-            if year_match:
-                year = year_match.group(1)
-        
-        review_articles_comprehensive.append({
-            'authors': authors,
-            'title': title,
-            'journal': journal,
-            'volume': volume,
-            'pages': pages,
-            'year': year,
-            'full_citation': ref_text,
-            'review_reason': review_reason
-        })
-
-# Write to CSV
-output_file = "/Users/simonwang/Documents/Usage/AIagent4bio/lab1/demo/review_articles.csv"
-
-with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-    fieldnames = ['authors', 'title', 'journal', 'volume', 'pages', 'year', 'full_citation', 'review_reason']
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    
-    writer.writeheader()
-    for article in review_articles_comprehensive:
-        writer.writerow(article)
-
-print(f"Found {len(review_articles_comprehensive)} review articles")
-print(f"CSV file saved to: {output_file}")
+            # Uncompressed so readers can memory-map it
+            feather.write_feather(table, output_file, compression='uncompressed')
+        return
+
+    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+
+        writer.writeheader()
+        for article in review_articles:
+            writer.writerow(article)
+
+
+def read_review_articles(output_file):
+    """Read back rows written by write_review_articles (CSV or columnar)."""
+    if output_file.lower().endswith(COLUMNAR_EXTENSIONS):
+        if output_file.lower().endswith('.parquet'):
+            return pq.read_table(output_file).to_pylist()
+        return feather.read_table(output_file).to_pylist()
+    with open(output_file, 'r', newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def read_fieldnames(output_file):
+    """Column names of an existing output file (CSV header or columnar schema)."""
+    if output_file.lower().endswith(COLUMNAR_EXTENSIONS):
+        if output_file.lower().endswith('.parquet'):
+            return pq.read_schema(output_file).names
+        return feather.read_table(output_file).schema.names
+    with open(output_file, 'r', newline='', encoding='utf-8') as f:
+        return next(csv.reader(f), [])
+
+
+def extract_review_articles(input_file, profiler=None):
+    """
+    Stream one paper and return its review articles (ValueError if no References).
+    With a StageProfiler, every stage of the pipeline is timed for this paper.
+    """
+    if profiler is not None:
+        return profile_review_articles(input_file, profiler)
+    review_articles = []
+    with open(input_file, 'r', encoding='utf-8') as f:
+        for ref_text in iter_references(f):
+            article = parse_review(ref_text)
+            if article:
+                review_articles.append(article)
+    return review_articles
+
+
+def profile_review_articles(input_file, profiler):
+    """Same as extract_review_articles, with each stage wrapped in the profiler."""
+    review_articles = []
+    with profiler.document(input_file), open(input_file, 'r', encoding='utf-8') as f:
+        section = profiler.iter('references_block', iter_reference_section(f))
+        for ref_text in profiler.iter('split', group_references(section)):
+            profiler.count('references')
+            profiler.count('reference_chars', len(ref_text))
+            with profiler.stage('classify'):
+                rule = classify_review(ref_text)
+            if rule is None:
+                continue
+            with profiler.stage('title_regex'):
+                title = extract_title(ref_text)
+            with profiler.stage('fields'):
+                review_articles.append(review_fields(ref_text, rule, title))
+        profiler.count('section_lines', profiler.stages['references_block']['calls'] - 1)
+        profiler.count('reviews', len(review_articles))
+    return review_articles
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_manifest(manifest_file):
+    if not os.path.exists(manifest_file):
+        return {}
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, manifest_file):
+    # Write to a temp file first so a crash never leaves a half-written manifest
+    tmp = manifest_file + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, manifest_file)
+
+
+def run_incremental(drop_dir, output_file, manifest_file=None, profiler=None):
+    """
+    Bring output_file up to date with the papers (*.md) in drop_dir.
+
+    A paper is re-parsed only if it is new or its content hash changed; a
+    paper whose mtime/size are unchanged is not even hashed. Rows of changed
+    or deleted papers are replaced/removed. When there are only new papers
+    and the output is CSV, their rows are appended without rewriting the file
+    (unless an interrupted run already wrote some of them).
+    An output without the source_paper column (from a normal run) is rebuilt.
+
+    Returns (new, changed, removed) paper counts.
+    """
+    manifest_file = manifest_file or output_file + '.manifest.json'
+    manifest = load_manifest(manifest_file)
+    # Output deleted, or written by a normal run (no source_paper column): rebuild from scratch
+    rebuild = not os.path.exists(output_file) or read_fieldnames(output_file) != INCREMENTAL_FIELDNAMES
+    if rebuild:
+        manifest = {}
+
+    papers = sorted(glob.glob(os.path.join(drop_dir, '**', '*.md'), recursive=True))
+    new, changed = [], []
+    for path in papers:
+        st = os.stat(path)
+        entry = manifest.get(path)
+        if entry and entry['mtime'] == st.st_mtime and entry['size'] == st.st_size:
+            continue
+        digest = file_sha256(path)
+        if entry and entry['sha256'] == digest:
+            entry['mtime'] = st.st_mtime  # touched but not modified
+            continue
+        (changed if entry else new).append(path)
+        manifest[path] = {'mtime': st.st_mtime, 'size': st.st_size, 'sha256': digest}
+    present = set(papers)
+    removed = [path for path in manifest if path not in present]
+    for path in removed:
+        del manifest[path]
+
+    rows = []
+    for path in new + changed:
+        try:
+            articles = extract_review_articles(path, profiler)
+        except ValueError as e:
+            print(f"Warning: {path}: {e}")
+            continue
+        rows.extend(dict(article, source_paper=path) for article in articles)
+
+    # The output is written before the manifest: if a run was stopped in between,
+    # the output already has rows of papers that look new now, so those are
+    # replaced like the rows of changed papers rather than appended again
+    stale = set(new) | set(changed) | set(removed)
+    existing = read_review_articles(output_file) if stale and not rebuild else []
+    append_only = (not rebuild and not changed and not removed
+                   and not output_file.lower().endswith(COLUMNAR_EXTENSIONS)
+                   and not any(row['source_paper'] in stale for row in existing))
+    if append_only:
+        if rows:
+            with open(output_file, 'a', newline='', encoding='utf-8') as csvfile:
+                csv.DictWriter(csvfile, fieldnames=INCREMENTAL_FIELDNAMES).writerows(rows)
+    elif rebuild or stale:
+        kept = [row for row in existing if row['source_paper'] not in stale]
+        root, ext = os.path.splitext(output_file)
+        tmp = root + '.tmp' + ext
+        write_review_articles(kept + rows, tmp, INCREMENTAL_FIELDNAMES)
+        os.replace(tmp, output_file)
+
+    save_manifest(manifest, manifest_file)
+    return len(new), len(changed), len(removed)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', nargs='?', default=INPUT_FILE,
+                        help="paper markdown file (or drop directory with --incremental)")
+    parser.add_argument('output', nargs='?', default=OUTPUT_FILE,
+                        help="output file: .csv, or .arrow/.feather/.parquet")
+    parser.add_argument('--incremental', action='store_true',
+                        help="treat input as a drop directory and only process new/changed papers")
+    parser.add_argument('--manifest', default=None,
+                        help="manifest file for --incremental (default: <output>.manifest.json)")
+    parser.add_argument('--watch', type=float, default=None, metavar='SECONDS',
+                        help="with --incremental, keep polling the drop directory every SECONDS")
+    parser.add_argument('--profile', default=None, metavar='JSONL',
+                        help="append per-stage timings for every parsed paper to this JSON lines file")
+    parser.add_argument('--profile-memory', action='store_true',
+                        help="with --profile, also record peak memory (tracemalloc, much slower)")
+    parser.add_argument('--slowest', type=int, default=None, metavar='N',
+                        help="with --profile, print the N slowest documents of the profile at the end")
+    args = parser.parse_args()
+    input_file = args.input
+    output_file = args.output
+
+    profiler = StageProfiler(args.profile, args.profile_memory) if args.profile else None
+    try:
+        run(args, input_file, output_file, profiler)
+    finally:
+        if profiler:
+            profiler.close()
+            if args.slowest:
+                print_slowest(args.profile, args.slowest)
+
+
+def run(args, input_file, output_file, profiler):
+    if args.incremental:
+        while True:
+            new, changed, removed = run_incremental(input_file, output_file, args.manifest, profiler)
+            if new or changed or removed or args.watch is None:
+                print(f"{new} new, {changed} changed, {removed} removed papers -> {output_file}")
+            if args.watch is None:
+                return
+            try:
+                time.sleep(args.watch)
+            except KeyboardInterrupt:
+                return
+
+    # Stream the paper and keep only the review articles
+    try:
+        review_articles = extract_review_articles(input_file, profiler)
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit(1)
+
+    write_review_articles(review_articles, output_file)
+
+    print(f"Found {len(review_articles)} review articles")
+    print(f"Output file saved to: {output_file}")
+
 
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-reference cost of parsing a whole reference list with
+parse_reference_lines (the Nature style's list parser) vs. a loop over
+parse_reference_line, on synthetic Nature-style references.
+
+parse_reference_lines maps parse_reference_line, so the two should cost the
+same: this measures what a reference costs, and that the list API adds
+nothing to it. (A vectorised version was tried and dropped: its speedup was
+within noise, 0.8x-1.4x.) The synthetic list mixes the reference shapes seen
+in lab1/data (with and without year, DOI links, "&" author lists, titles with
+colons) plus a few awkward ones with double or non-breaking spaces. Both must
+return identical tuples.
+
+Usage: python benchmark_bulk_parse.py [n_references]
+"""
+import random
+import sys
+import time
+
+import extract_review_references as err
+
+SURNAMES = ["Kim", "Zaret", "Statello", "Carthew", "Claringbould", "Ideker", "Lai", "Du", "Badia-i-Mompel"]
+WORDS = ["gene", "regulatory", "network", "inference", "single-cell", "chromatin", "accessibility",
+         "enhancers", "transcription", "factor", "multi-omics", "landscape", "in", "of", "the"]
+JOURNALS = ["Nat. Rev. Genet.", "Mol. Cell", "Genes Dev.", "Trends Genet.", "Annu. Rev. Genomics Hum. Genet.",
+            "Nucleic Acids Res.", "Cell", "Nat. Methods", "Curr. Opin. Syst. Biol."]
+
+
+def synthetic_reference(rng: random.Random) -> str:
+    authors = ", ".join(f"{rng.choice(SURNAMES)}, {rng.choice('ABCDEFGH')}." for _ in range(rng.randint(1, 4)))
+    authors = authors[:-1] + f" & {rng.choice(SURNAMES)}, {rng.choice('JKLMN')}."
+    title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12))).capitalize()
+    if rng.random() < 0.2:
+        title += ": a review"
+    journal = rng.choice(JOURNALS)
+    year = rng.randint(1990, 2024)
+    kind = rng.random()
+    if kind < 0.8:
+        return f"{authors} {title}. {journal} {rng.randint(1, 60)}, {rng.randint(1, 999)}–{rng.randint(1000, 2000)} ({year})."
+    if kind < 0.9:
+        return f"{authors} {title}. {journal} https://doi.org/10.1038/s{rng.randint(10000, 99999)} ({year})."
+    if kind < 0.97:
+        return f"{authors} {title}. {journal}"
+    # awkward: double spaces / non-breaking spaces take the fallback path
+    return f"{authors}  {title}.\xa0{journal} {rng.randint(1, 60)}, 1–2 ({year})."
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(0)
+    lines = [synthetic_reference(rng) for _ in range(n)]
+
+    t0 = time.perf_counter()
+    loop = [err.parse_reference_line(line) for line in lines]
+    t_loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    bulk = err.parse_reference_lines(lines)
+    t_bulk = time.perf_counter() - t0
+
+    assert bulk == loop, "list and per-line results differ"
+    awkward = sum(1 for line in lines if '  ' in line or '\xa0' in line)
+    print(f"{n} references ({awkward} with double or non-breaking spaces)")
+    print(f"per-line loop:         {t_loop * 1e6 / n:8.2f} us/reference  ({t_loop:.2f} s)")
+    print(f"parse_reference_lines: {t_bulk * 1e6 / n:8.2f} us/reference  ({t_bulk:.2f} s)")
+    print(f"ratio:                 {t_loop / t_bulk:8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
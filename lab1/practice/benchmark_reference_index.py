@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark + check of batch mode with the global reference index (--index).
+
+1. A synthetic corpus of papers citing works from a shared pool: plain
+   batch mode vs --index (first run, and a re-run with nothing changed).
+   The index output must hold each review-like work once, with the number
+   of papers citing it.
+2. A changed paper that drops some references: works nobody cites any more
+   leave the index and the output.
+
+Usage: python benchmark_reference_index.py [papers] [refs_per_paper]
+"""
+import contextlib
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+from extract_review_references import run_batch, run_indexed_batch
+from reference_index import ReferenceIndex
+
+METADATA = "Article\n CAS PubMed Google Scholar \n"
+JOURNALS = ["Nat. Genet.", "Cell", "Genome Res.", "Nat. Rev. Genet.", "Trends Genet."]
+REVIEW_JOURNALS = {"Nat. Rev. Genet.", "Trends Genet."}
+
+
+def make_work(i: int) -> str:
+    journal = JOURNALS[i % len(JOURNALS)]
+    return (f"Author{i} et al. Work number {i} on gene regulation. "
+            f"{journal} {i % 50 + 1}, {i}-{i + 9} ({1990 + i % 35}).")
+
+
+def write_paper(path: str, works) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("Intro\n\nReferences\n")
+        for w in works:
+            f.write(w + "\n" + METADATA)
+        f.write("\nAcknowledgements\nThanks.\n")
+
+
+def read_output(path: str):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))[1:]
+
+
+def timed(func, *args):
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(*args)
+    return time.perf_counter() - t0
+
+
+def main():
+    n_papers = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    per_paper = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    rng = random.Random(0)
+    pool = [make_work(i) for i in range(n_papers * per_paper // 8)]
+    citing = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        papers_dir = os.path.join(tmp, 'papers')
+        os.makedirs(papers_dir)
+        papers = {}
+        for p in range(n_papers):
+            works = rng.sample(pool, per_paper)
+            if p == 0:
+                # Works no other paper cites
+                works += [make_work(i) for i in range(len(pool), len(pool) + 10)]
+            papers[os.path.join(papers_dir, f"paper{p:04d}.md")] = works
+            for w in works:
+                citing[w] = citing.get(w, 0) + 1
+        for path, works in papers.items():
+            write_paper(path, works)
+        db = os.path.join(tmp, 'index.sqlite')
+        plain_csv, index_csv = os.path.join(tmp, 'plain.csv'), os.path.join(tmp, 'index.csv')
+
+        plain = timed(run_batch, papers_dir, plain_csv, 2)
+        first = timed(run_indexed_batch, papers_dir, index_csv, 2, db)
+        again = timed(run_indexed_batch, papers_dir, index_csv, 2, db)
+        print(f"{n_papers} papers x {per_paper} references, {len(citing)} distinct works")
+        print(f"{'run':<26}{'seconds':>9}{'output rows':>13}")
+        print(f"{'plain batch':<26}{plain:>9.2f}{len(read_output(plain_csv)):>13}")
+        print(f"{'--index, first run':<26}{first:>9.2f}{len(read_output(index_csv)):>13}")
+        print(f"{'--index, unchanged':<26}{again:>9.2f}{len(read_output(index_csv)):>13}")
+
+        expected = {w: n for w, n in citing.items() if n and any(j in w for j in REVIEW_JOURNALS)}
+        rows = {row[-1]: int(row[0]) for row in read_output(index_csv)}
+        assert rows == expected, "index output is not one row per cited review with its citation count"
+
+        # A changed paper drops its review citations; works only it cited leave the index
+        path, works = next(iter(papers.items()))
+        dropped = [w for w in works if w in expected]
+        for w in dropped:
+            citing[w] -= 1
+        write_paper(path, [w for w in works if w not in dropped])
+        timed(run_indexed_batch, papers_dir, index_csv, 2, db)
+        rows = {row[-1]: int(row[0]) for row in read_output(index_csv)}
+        expected = {w: n for w, n in citing.items() if n and any(j in w for j in REVIEW_JOURNALS)}
+        assert rows == expected, "a dropped reference is still listed, or with the wrong count"
+        with ReferenceIndex(db) as index:
+            stats = index.stats()
+        assert stats['unique_references'] == sum(1 for n in citing.values() if n), stats
+        orphaned = sum(1 for w in dropped if not citing[w])
+        print(f"\nchanged paper: dropped {len(dropped)} review citations, {orphaned} of them cited by "
+              f"no other paper; index now {stats['unique_references']} unique references")
+    print("reference index checks passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Regression benchmark for extract_references_block on worst-case inputs.
+
+Compares the old lazy-dotall regex with the forward-scan locator on:
+  - the lab1 sample paper
+  - a ~5 MB paper with a References heading but no terminator marker
+  - a ~5 MB paper whose References block ends right before the end
+  - a ~5 MB paper with no References heading at all
+Both implementations must return the same block.
+
+Usage: python benchmark_references_block.py [size_mb]
+"""
+import os
+import re
+import sys
+import time
+
+from extract_review_references import extract_references_block
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'Badia-i-Mompel et al 2023.md')
+
+REFERENCE = (
+    "Smith, J. & Doe, A. A study of gene regulatory networks. Nat. Genet. 12, 1-10 (2020).\n"
+    "Article\n CAS PubMed Google Scholar \n"
+)
+
+
+def old_extract_references_block(text: str) -> str:
+    m = re.search(
+        r"\nReferences\n([\s\S]*?)(?:\nDownload references|\nAcknowledgements|\nAuthor information|\nRights and permissions|\nAbout this article|\nThis article is cited by|$)",
+        text,
+        re.IGNORECASE,
+    )
+    if m:
+        return m.group(1).strip()
+    m2 = re.search(r"\nReferences\n([\s\S]*)$", text, re.IGNORECASE)
+    return m2.group(1).strip() if m2 else ""
+
+
+def make_inputs(size: int):
+    refs = REFERENCE * (size // len(REFERENCE))
+    with open(SAMPLE, 'r', encoding='utf-8') as f:
+        sample = f.read()
+    return [
+        ("sample paper", sample),
+        ("no terminator", "Intro\n" * 100 + "\nReferences\n" + refs),
+        ("late terminator", "Intro\n" * 100 + "\nReferences\n" + refs + "\nAcknowledgements\nThanks.\n"),
+        ("no References heading", refs),
+    ]
+
+
+def best_time(func, text, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func(text)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'input':<24}{'size (MB)':>10}{'old (ms)':>12}{'new (ms)':>12}{'speedup':>10}")
+    for name, text in make_inputs(int(size_mb * 1024 * 1024)):
+        old_s, old_block = best_time(old_extract_references_block, text)
+        new_s, new_block = best_time(extract_references_block, text)
+        assert old_block == new_block, name
+        print(f"{name:<24}{len(text) / 1e6:>10.1f}{old_s * 1000:>12.2f}{new_s * 1000:>12.2f}"
+              f"{old_s / new_s:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,110 @@
 #!/usr/bin/env python3
+"""
+Find review-like references in a paper's References section.
+
+Single paper:  extract_review_references.py paper.md [out.csv]
+Batch mode:    extract_review_references.py papers_dir/ merged.csv [--workers N]
+               extract_review_references.py "corpus/**/*.md" merged.csv
+
+Output format follows the output file extension: .csv (default), or the
+columnar .arrow/.feather (Arrow IPC, memory-mappable) and .parquet, which
+need pyarrow.
+
+Add --cache to reuse parsed references for papers whose content hasn't
+changed (see reference_cache.py for stats/prune/clear).
+
+The citation style of each References block (Nature, Cell, PLOS/PMC
+author-year, numbered Vancouver) is detected once per paper and that
+style's parser handles every entry; see reference_styles.py.
+
+Add --index (batch mode) to collect references into a global index shared by
+all papers: each unique reference is parsed once, and the output lists each
+review-like work once with the number of papers citing it (see
+reference_index.py for stats/export).
+
+Add --profile profile.jsonl to record per-stage timings (decode, references_block,
+detect_style, split, parse, classify) for every paper that gets parsed (see
+stage_profiler.py), and --slowest N to list the slowest ones.
+"""
+import argparse
+import contextlib
+import functools
+import glob
+import multiprocessing
+import multiprocessing.util
 import re
 import csv
 import os
 import sys
-from typing import List, Tuple
+from typing import Iterable, List, Optional, Tuple
+
+# pyarrow is only needed for columnar (.arrow/.feather/.parquet) output
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+from reference_cache import DEFAULT_DB, DEFAULT_MAX_BYTES, ReferenceCache, content_key
+from reference_index import DEFAULT_INDEX, ReferenceIndex
+from reference_styles import ReferenceStyle, detect_style, get_style, register_style
+from stage_profiler import StageProfiler, print_slowest
+
+# Bump whenever parsing or review detection changes, so cached results are not reused
+PARSER_VERSION = "2"
 
 # Heuristic: journals that are predominantly reviews
+# (abbreviations with or without the period: "Nat. Rev." in Nature style, "Nat Rev" in PMC/Vancouver)
 REVIEW_JOURNAL_PATTERNS = [
-    r"\bNature Reviews\b|\bNat(ure)?\.?\s+Rev\.",
-    r"\bAnnual Review\b|\bAnnu\.?\s+Rev\.",
+    r"\bNature Reviews\b|\bNat(ure)?\.?\s+Rev\b",
+    r"\bAnnual Review\b|\bAnnu\.?\s+Rev\b",
     r"\bTrends\b",  # e.g., Trends Genet., Trends Mol. Med.
-    r"\bCurr\.?\s+Opin\.|\bCurrent\s+Opinion\b",
+    r"\bCurr\.?\s+Opin\b|\bCurrent\s+Opinion\b",
     r"\bBrief\.?\b",  # Briefings in ... often review-style
 ]
-REVIEW_RE = re.compile("|".join(REVIEW_JOURNAL_PATTERNS), re.IGNORECASE)
+REVIEW_JOURNAL_RULES = list(zip(
+    ["nature_reviews", "annual_review", "trends", "current_opinion", "briefings"],
+    REVIEW_JOURNAL_PATTERNS,
+))
+
+
+class ReviewClassifier:
+    """
+    Ordered (name, pattern) rules, each compiled once.
+
+    classify() searches the rules one by one in order, exactly like an
+    if/elif chain: the earliest matching rule wins. (A single combined regex
+    is not equivalent, as one rule's match can consume text another rule
+    would have matched.) search() only asks whether any rule matches, which
+    one combined regex does answer correctly in a single scan.
+    """
+
+    def __init__(self, rules: Iterable[Tuple[str, str]], flags: int = 0):
+        self.rules = list(rules)
+        self.patterns = [(name, re.compile(pattern, flags)) for name, pattern in self.rules]
+        self.regex = re.compile(
+            "|".join(f"(?P<{name}>{pattern})" for name, pattern in self.rules),
+            flags,
+        )
+
+    def classify(self, text: str) -> Optional[str]:
+        """Return the name of the highest-priority matching rule, or None."""
+        for name, pattern in self.patterns:
+            if pattern.search(text):
+                return name
+        return None
+
+    def search(self, text: str) -> bool:
+        """Return True if any rule matches (cheaper than classify)."""
+        return self.regex.search(text) is not None
+
+
+REVIEW_CLASSIFIER = ReviewClassifier(REVIEW_JOURNAL_RULES, re.IGNORECASE)
+REVIEW_RE = REVIEW_CLASSIFIER.regex
+
+YEAR_RE = re.compile(r"\((\d{4})\)")
+JOURNAL_RE = re.compile(r"(.+?)\s+\d|(.+?)\s*,")
 
 
 def read_file(fp: str) -> str:
@@ -21,18 +112,52 @@ def read_file(fp: str) -> str:
         return f.read()
 
 
+def decode_text(data: bytes) -> str:
+    # Same result as read_file: utf-8 with universal newlines
+    return data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+
+# Section headings that can end the References block
+# Plain "References" line or a markdown heading ("## References")
+REFERENCES_HEADING_RE = re.compile(r"\n(?:#{1,6}[ \t]*)?References\n", re.IGNORECASE)
+SECTION_END_RE = re.compile(
+    r"\n(?:Download references|Acknowledgements|Author information|Rights and permissions|About this article|This article is cited by)",
+    re.IGNORECASE,
+)
+
+
+def locate_references_block(text: str) -> Optional[Tuple[int, int]]:
+    """
+    Return (start, end) offsets of the References block in text, or None.
+
+    One forward scan finds the heading, and the next one picks up where it
+    stopped to find the first section terminator; if there is none the block
+    simply runs to the end of the text. The offsets are already trimmed of
+    surrounding whitespace, so text[start:end] is the block and nothing is
+    copied until the caller slices.
+    """
+    m = REFERENCES_HEADING_RE.search(text)
+    if not m:
+        return None
+    start = m.end()
+    end_match = SECTION_END_RE.search(text, start)
+    end = end_match.start() if end_match else len(text)
+
+    # Trim whitespace without slicing
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
 def extract_references_block(text: str) -> str:
-    # Capture content between 'References' and next major section marker
-    m = re.search(
-        r"\nReferences\n([\s\S]*?)(?:\nDownload references|\nAcknowledgements|\nAuthor information|\nRights and permissions|\nAbout this article|\nThis article is cited by|$)",
-        text,
-        re.IGNORECASE,
-    )
-    if m:
-        return m.group(1).strip()
-    # Fallback: from References to end
-    m2 = re.search(r"\nReferences\n([\s\S]*)$", text, re.IGNORECASE)
-    return m2.group(1).strip() if m2 else ""
+    # Capture content between 'References' and next major section marker (or end of text)
+    span = locate_references_block(text)
+    if span is None:
+        return ""
+    start, end = span
+    return text[start:end]
 
 
 def split_reference_entries(ref_block: str) -> List[str]:
@@ -85,7 +210,7 @@ def parse_reference_line(line: str) -> Tuple[str, str, str, str]:
     Return (authors, title, journal, year) best-effort from a single-line reference.
     Assumes pattern: Authors. Title. Journal vol, pages (year).
     """
-    year_match = re.search(r"\((\d{4})\)", line)
+    year_match = YEAR_RE.search(line)
     year = year_match.group(1) if year_match else ""
 
     # Split by '. ' into segments
@@ -106,7 +231,7 @@ def parse_reference_line(line: str) -> Tuple[str, str, str, str]:
             up_to_year = after_title.split(f'({year})')[0].strip()
             # journal is the first token(s) before volume number; but allow dots in journal names
             # Often formatted like: Journal 24, pages...
-            jmatch = re.match(r"(.+?)\s+\d|(.+?)\s*,", up_to_year)
+            jmatch = JOURNAL_RE.match(up_to_year)
             if jmatch:
                 journal = (jmatch.group(1) or jmatch.group(2) or up_to_year).strip()
             else:
@@ -120,39 +245,43 @@ def parse_reference_line(line: str) -> Tuple[str, str, str, str]:
     return authors, title.rstrip('.'), journal.rstrip('.'), year
 
 
+def parse_reference_lines(lines: List[str]) -> List[Tuple[str, str, str, str]]:
+    """parse_reference_line over a whole reference list (the Nature style's list parser)."""
+    return [parse_reference_line(line) for line in lines]
+
+
+# Nature style: "Authors. Title. Journal vol, pages (year)." -- the default
+NATURE_STYLE = register_style(ReferenceStyle(
+    'nature', r"\d+,\s*\S+\s+\(\d{4}\)", split_reference_entries, parse_reference_lines))
+
+
 def is_review_journal(journal: str) -> bool:
     if not journal:
         return False
-    return bool(REVIEW_RE.search(journal))
-
-
-def main():
-    input_path = (
-        sys.argv[1]
-        if len(sys.argv) > 1
-        else "/workspaces/Agent4BioPhD/lab1/data/Badia-i-Mompel et al 2023.md"
-    )
-    output_path = (
-        sys.argv[2]
-        if len(sys.argv) > 2
-        else "/workspaces/Agent4BioPhD/lab1/practice/review_articles.csv"
-    )
+    return REVIEW_CLASSIFIER.search(journal)
 
-    if not os.path.exists(input_path):
-        print(f"Input file not found: {input_path}", file=sys.stderr)
-        sys.exit(1)
 
-    text = read_file(input_path)
+def parse_references(text: str) -> Optional[List[dict]]:
+    """
+    Parse every reference of a paper into a row dict.
+    Returns None if the paper has no References section.
+    """
     ref_block = extract_references_block(text)
     if not ref_block:
-        print("Could not locate References section.", file=sys.stderr)
-        sys.exit(2)
+        return None
+    style = detect_style(ref_block, NATURE_STYLE)
+    return parse_entries(style.split(ref_block), style)
+
+
+def parse_entries(entries: List[str], style: ReferenceStyle = NATURE_STYLE) -> List[dict]:
+    """Parse the entries split from a References block (in `style`) into row dicts."""
+    return classify_entries(entries, style.parse(entries))
 
-    entries = split_reference_entries(ref_block)
 
+def classify_entries(entries: List[str], fields: List[Tuple[str, str, str, str]]) -> List[dict]:
+    """Row dicts of the entries and their parsed (authors, title, journal, year), with is_review."""
     parsed = []
-    for e in entries:
-        authors, title, journal, year = parse_reference_line(e)
+    for e, (authors, title, journal, year) in zip(entries, fields):
         parsed.append({
             'authors': authors,
             'title': title,
@@ -161,19 +290,374 @@ def main():
             'raw': e,
             'is_review': 'yes' if is_review_journal(journal) else 'no',
         })
+    return parsed
+
+
+REVIEW_COLUMNS = ['authors', 'year', 'title', 'journal', 'raw_reference']
+CSV_HEADER = REVIEW_COLUMNS + [
+    'note: heuristic journal-based detection (Nat/Nature Reviews, Annual Review, Trends, Current Opinion, Briefings)'
+]
+COLUMNAR_EXTENSIONS = ('.arrow', '.feather', '.parquet')
+
+
+def review_row(r: dict) -> List[str]:
+    return [r['authors'], r['year'], r['title'], r['journal'], r['raw']]
+
+
+class ColumnarWriter:
+    """
+    csv.writer-like sink for Arrow IPC (.arrow/.feather) or Parquet files.
+    Rows are buffered and flushed as record batches, so memory stays bounded.
+    Arrow IPC is written uncompressed so readers can memory-map it.
+    """
+
+    def __init__(self, path: str, columns: List[str], batch_size: int = 10000):
+        self.schema = pa.schema([(c, pa.string()) for c in columns])
+        self.batch_size = batch_size
+        self._rows: List[List[str]] = []
+        if path.lower().endswith('.parquet'):
+            self._writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self._writer = pa.ipc.new_file(path, self.schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def writerow(self, row: List[str]) -> None:
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        columns = [pa.array(col, pa.string()) for col in zip(*self._rows)]
+        self._writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=self.schema))
+        self._rows = []
+
+    def close(self) -> None:
+        self.flush()
+        self._writer.close()
+
+
+@contextlib.contextmanager
+def open_review_writer(path: str, prefix: Iterable[str] = ()):
+    """
+    Yield a writer with writerow() for CSV or columnar output, chosen by extension.
+    prefix: extra columns in front of REVIEW_COLUMNS (e.g. source_paper in batch mode).
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if path.lower().endswith(COLUMNAR_EXTENSIONS):
+        if not HAS_PYARROW:
+            print("Columnar output needs pyarrow. Install with: pip install pyarrow", file=sys.stderr)
+            sys.exit(1)
+        with ColumnarWriter(path, list(prefix) + REVIEW_COLUMNS) as writer:
+            yield writer
+    else:
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(list(prefix) + CSV_HEADER)
+            yield writer
+
+
+def load_references(path: str, cache: Optional[ReferenceCache] = None,
+                    profiler: Optional[StageProfiler] = None) -> Optional[List[dict]]:
+    """
+    parse_references() for a file, going through the cache when one is given:
+    an unchanged paper costs a sha256 of its bytes and one lookup. With a
+    StageProfiler, every paper that gets parsed is profiled stage by stage.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if cache is None:
+        return parse_bytes(path, data, profiler)
+
+    key = content_key(data)
+    found, parsed = cache.get(key)
+    if not found:
+        parsed = parse_bytes(path, data, profiler)
+        cache.put(key, parsed)
+    return parsed
+
+
+def parse_bytes(path: str, data: bytes, profiler: Optional[StageProfiler] = None) -> Optional[List[dict]]:
+    if profiler is None:
+        return parse_references(decode_text(data))
+    return profile_references(path, data, profiler)
+
+
+def profile_references(path: str, data: bytes, profiler: StageProfiler) -> Optional[List[dict]]:
+    """Same as parse_references(decode_text(data)), with each stage wrapped in the profiler."""
+    with profiler.document(path):
+        with profiler.stage('decode'):
+            text = decode_text(data)
+        profiler.count('bytes', len(data))
+        with profiler.stage('references_block'):
+            ref_block = extract_references_block(text)
+        if not ref_block:
+            return None
+        profiler.count('block_chars', len(ref_block))
+        with profiler.stage('detect_style'):
+            style = detect_style(ref_block, NATURE_STYLE)
+        profiler.count(f"style_{style.name}")
+        with profiler.stage('split'):
+            entries = style.split(ref_block)
+        with profiler.stage('parse'):
+            fields = style.parse(entries)
+        with profiler.stage('classify'):
+            parsed = classify_entries(entries, fields)
+        profiler.count('references', len(parsed))
+        profiler.count('reviews', sum(1 for r in parsed if r['is_review'] == 'yes'))
+    return parsed
+
+
+# Per-process cache connection and profiler for batch workers (set by _init_worker)
+_worker_cache: Optional[ReferenceCache] = None
+_worker_profiler: Optional[StageProfiler] = None
+
+
+def _init_worker(cache_path: Optional[str], cache_max_bytes: int,
+                 profile_path: Optional[str] = None, profile_memory: bool = False) -> None:
+    global _worker_cache, _worker_profiler
+    if cache_path:
+        _worker_cache = ReferenceCache(cache_path, PARSER_VERSION, cache_max_bytes)
+        # Runs when the worker exits after pool.close(): writes the last batch of hits
+        multiprocessing.util.Finalize(_worker_cache, _worker_cache.close, exitpriority=10)
+    if profile_path:
+        # Every worker appends its own whole lines to the profile file
+        _worker_profiler = StageProfiler(profile_path, profile_memory)
+        multiprocessing.util.Finalize(_worker_profiler, _worker_profiler.close, exitpriority=10)
+
+
+def process_paper(path: str) -> Tuple[str, Optional[List[dict]], int, bool, Optional[str]]:
+    """
+    Worker for batch mode: read and parse one paper.
+    Returns (path, review rows or None if no References section, total references,
+    whether it came from the cache, warning if the file could not be read).
+    Only the review rows are sent back to the parent process.
+    """
+    hits = _worker_cache.hits if _worker_cache else 0
+    try:
+        parsed = load_references(path, _worker_cache, _worker_profiler)
+    except (OSError, UnicodeDecodeError) as e:
+        # One unreadable / non-UTF-8 file must not abort the whole batch
+        return path, None, 0, False, f"Could not read {path}: {e}"
+    cached = bool(_worker_cache) and _worker_cache.hits > hits
+    if parsed is None:
+        return path, None, 0, cached, None
+    return path, [r for r in parsed if r['is_review'] == 'yes'], len(parsed), cached, None
+
+
+def read_entries(task: Tuple[str, Optional[str]]) -> Tuple[str, str, Optional[List[str]], str, Optional[str]]:
+    """
+    Worker for batch mode with --index: read and split one paper, without parsing.
+    task is (path, content hash already in the index or None). Returns
+    (path, content hash, reference entries, style name, warning); the entries
+    are None when the paper has no References section or could not be read
+    (then with a warning), and [] when it is unchanged since last indexed.
+    """
+    path, indexed_key = task
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        key = content_key(data)
+        if key == indexed_key:
+            return path, key, [], NATURE_STYLE.name, None
+        ref_block = extract_references_block(decode_text(data))
+    except (OSError, UnicodeDecodeError) as e:
+        return path, '', None, NATURE_STYLE.name, f"Could not read {path}: {e}"
+    if not ref_block:
+        return path, key, None, NATURE_STYLE.name, None
+    style = detect_style(ref_block, NATURE_STYLE)
+    return path, key, style.split(ref_block), style.name, None
+
+
+def find_papers(pattern: str) -> List[str]:
+    """Expand a directory (all *.md files inside, recursively) or a glob into a sorted file list."""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, '**', '*.md')
+    return sorted(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+
+
+def run_batch(input_pattern: str, output_path: str, workers: Optional[int] = None,
+              cache_path: Optional[str] = None, cache_max_bytes: int = DEFAULT_MAX_BYTES,
+              profile_path: Optional[str] = None, profile_memory: bool = False) -> None:
+    """
+    Process every paper matching input_pattern across a process pool.
+    Rows are written to one merged output (with a source_paper column) as soon as
+    each paper finishes, so nothing is held in memory beyond the current paper.
+    """
+    papers = find_papers(input_pattern)
+    if not papers:
+        print(f"No papers found for: {input_pattern}", file=sys.stderr)
+        sys.exit(1)
+
+    workers = workers or os.cpu_count() or 1
+    # Several papers per task keeps the inter-process overhead small
+    chunksize = max(1, min(32, len(papers) // (workers * 4)))
+
+    n_reviews = n_refs = n_skipped = n_cached = 0
+    with open_review_writer(output_path, ['source_paper']) as writer, \
+            multiprocessing.Pool(workers, _init_worker,
+                                 (cache_path, cache_max_bytes, profile_path, profile_memory)) as pool:
+        for path, reviews, total, cached, warning in pool.imap(process_paper, papers, chunksize=chunksize):
+            n_cached += cached
+            if warning:
+                print(f"Warning: {warning}", file=sys.stderr)
+                n_skipped += 1
+                continue
+            if reviews is None:
+                print(f"Could not locate References section: {path}", file=sys.stderr)
+                n_skipped += 1
+                continue
+            for r in reviews:
+                writer.writerow([path] + review_row(r))
+            n_reviews += len(reviews)
+            n_refs += total
+        # Let the workers exit on their own (not terminate()) so they close their caches
+        pool.close()
+        pool.join()
+
+    print(f"Found {n_reviews} review-like references out of {n_refs} total "
+          f"in {len(papers) - n_skipped} papers ({n_skipped} skipped).\nOutput: {output_path}")
+    if cache_path:
+        print(f"Cache: {n_cached} hits, {len(papers) - n_cached} misses ({cache_path})")
+
+
+def run_indexed_batch(input_pattern: str, output_path: str, workers: Optional[int] = None,
+                      index_path: str = DEFAULT_INDEX) -> None:
+    """
+    Batch mode through the global reference index: workers only read and split
+    papers, the parent parses references the index has not seen yet, and the
+    output holds every unique review-like reference once, with a cited_by count.
+    """
+    papers = find_papers(input_pattern)
+    if not papers:
+        print(f"No papers found for: {input_pattern}", file=sys.stderr)
+        sys.exit(1)
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, min(32, len(papers) // (workers * 4)))
+
+    n_refs = n_parsed = n_skipped = n_unchanged = 0
+    # An index parsed by another PARSER_VERSION starts over
+    with ReferenceIndex(index_path, PARSER_VERSION) as index:
+        indexed = index.paper_keys()
+        tasks = [(p, indexed.get(p)) for p in papers]
+        # Papers no longer in the input, and those without References now, drop their citations
+        gone = set(indexed) - set(papers)
+        with multiprocessing.Pool(workers) as pool:
+            for path, key, entries, style, warning in pool.imap(read_entries, tasks, chunksize=chunksize):
+                if warning:
+                    # Left in the index as it was: the file may be readable again next time
+                    print(f"Warning: {warning}", file=sys.stderr)
+                    n_skipped += 1
+                    gone.discard(path)
+                    continue
+                if entries is None:
+                    print(f"Could not locate References section: {path}", file=sys.stderr)
+                    n_skipped += 1
+                    gone.add(path)
+                    continue
+                if key == indexed.get(path):
+                    n_unchanged += 1
+                    continue
+                n_refs += len(entries)
+                n_parsed += index.add_paper(path, key, entries,
+                                            functools.partial(parse_entries, style=get_style(style)))
+        n_removed = index.remove_papers(gone)
+
+        n_reviews = 0
+        with open_review_writer(output_path, ['cited_by']) as writer:
+            for r in index.references():
+                writer.writerow([str(r['cited_by'])] + review_row(r))
+                n_reviews += 1
+        stats = index.stats()
+
+    print(f"Indexed {len(papers) - n_skipped - n_unchanged} papers ({n_unchanged} unchanged, "
+          f"{n_skipped} skipped, {n_removed} removed): {n_refs} references, "
+          f"{n_parsed} new unique references parsed.")
+    print(f"Index: {stats['unique_references']} unique references cited {stats['citations']} times "
+          f"by {stats['papers']} papers ({index_path})")
+    print(f"Found {n_reviews} unique review-like references.\nOutput: {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        'input', nargs='?',
+        default="/workspaces/Agent4BioPhD/lab1/data/Badia-i-Mompel et al 2023.md",
+        help="paper markdown file, or a directory / glob of papers for batch mode",
+    )
+    parser.add_argument(
+        'output', nargs='?',
+        default="/workspaces/Agent4BioPhD/lab1/practice/review_articles.csv",
+        help="output file: .csv, or .arrow/.feather/.parquet for columnar output",
+    )
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes for batch mode (default: all cores)")
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_DB, default=None, metavar='DB',
+                        help=f"reuse parsed references keyed by content hash (default DB: {DEFAULT_DB})")
+    parser.add_argument('--index', nargs='?', const=DEFAULT_INDEX, default=None, metavar='DB',
+                        help=f"batch mode: deduplicate references across papers in a global index "
+                             f"(default DB: {DEFAULT_INDEX})")
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help="evict least-recently-used cache entries beyond this size")
+    parser.add_argument('--profile', default=None, metavar='JSONL',
+                        help="append per-stage timings of every parsed paper to this JSON lines file")
+    parser.add_argument('--profile-memory', action='store_true',
+                        help="with --profile, also record peak memory (tracemalloc, much slower)")
+    parser.add_argument('--slowest', type=int, default=None, metavar='N',
+                        help="with --profile, print the N slowest documents of the profile at the end")
+    args = parser.parse_args()
+
+    if args.index and args.cache:
+        parser.error("--cache and --index can't be combined: the index already parses each unique reference once")
+    if args.index and args.profile:
+        parser.error("--profile profiles whole papers and can't be combined with --index")
+
+    run(args)
+    if args.profile and args.slowest:
+        print_slowest(args.profile, args.slowest)
+
+
+def run(args: argparse.Namespace) -> None:
+    input_path = args.input
+    output_path = args.output
+    cache_max_bytes = int(args.cache_max_mb * 1024 * 1024)
+
+    if not os.path.isfile(input_path):
+        if os.path.isdir(input_path) or glob.has_magic(input_path):
+            if args.index:
+                run_indexed_batch(input_path, output_path, args.workers, args.index)
+                return
+            run_batch(input_path, output_path, args.workers, args.cache, cache_max_bytes,
+                      args.profile, args.profile_memory)
+            return
+        print(f"Input file not found: {input_path}", file=sys.stderr)
+        sys.exit(1)
+
+    with contextlib.ExitStack() as stack:
+        cache = profiler = None
+        if args.cache:
+            cache = stack.enter_context(ReferenceCache(args.cache, PARSER_VERSION, cache_max_bytes))
+        if args.profile:
+            profiler = stack.enter_context(StageProfiler(args.profile, args.profile_memory))
+        parsed = load_references(input_path, cache, profiler)
+    if parsed is None:
+        print("Could not locate References section.", file=sys.stderr)
+        sys.exit(2)
 
     # Filter for review entries
     reviews = [row for row in parsed if row['is_review'] == 'yes']
 
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with open(output_path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            'authors', 'year', 'title', 'journal', 'raw_reference',
-            'note: heuristic journal-based detection (Nat/Nature Reviews, Annual Review, Trends, Current Opinion, Briefings)'
-        ])
+    with open_review_writer(output_path) as writer:
         for r in reviews:
-            writer.writerow([r['authors'], r['year'], r['title'], r['journal'], r['raw']])
+            writer.writerow(review_row(r))
 
     print(f"Found {len(reviews)} review-like references out of {len(parsed)} total.\nOutput: {output_path}")
 
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of parsed references, keyed by paper content hash + parser version.
+
+extract_review_references.py stores the rows it parsed for each paper here,
+so re-running over an unchanged corpus costs one sha256 per file. Entries are
+evicted least-recently-used first once the cache grows past its size limit.
+Bump PARSER_VERSION in extract_review_references.py when the parsing or review
+heuristics change; old entries then stop matching and are dropped by `prune`.
+
+Usage:
+    python reference_cache.py stats [--db PATH]
+    python reference_cache.py prune [--db PATH] [--max-mb N] [--parser-version V]
+    python reference_cache.py clear [--db PATH]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import List, Optional, Tuple
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.reference_cache.sqlite')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+TOUCH_BATCH = 256  # cache hits whose last_used is written back in one transaction
+EVICT_TO = 0.9  # once over max_bytes, evict down to this fraction of it
+
+
+def content_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ReferenceCache:
+    """
+    SQLite-backed cache: (content hash, parser version) -> parsed reference rows.
+
+    Safe to open from several processes at once (WAL mode); each process
+    should use its own ReferenceCache instance, and close it so the last
+    batch of last_used updates is written. The size of the cache is kept as
+    a running total per instance (what other processes add is only seen at
+    the next eviction, which recounts).
+    """
+
+    def __init__(self, path: str = DEFAULT_DB, parser_version: str = '',
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.parser_version = parser_version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # A power loss may drop the last commits of a cache, never corrupt it
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS papers ("
+            " key TEXT NOT NULL,"
+            " parser_version TEXT NOT NULL,"
+            " rows TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (key, parser_version))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS papers_last_used ON papers (last_used)")
+        self.conn.commit()
+        self._touched = []  # (last_used, key, parser_version) of hits not written yet
+        self._bytes = None  # running total of the entry sizes, counted at the first put
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
+
+    def flush(self) -> None:
+        """Write the last_used times of the hits since the last flush, in one transaction."""
+        if self._touched:
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE papers SET last_used = ? WHERE key = ? AND parser_version = ?",
+                    self._touched)
+            self._touched = []
+
+    def get(self, key: str) -> Tuple[bool, Optional[List[dict]]]:
+        """Return (found, rows). rows is None for papers with no References section."""
+        row = self.conn.execute(
+            "SELECT rows FROM papers WHERE key = ? AND parser_version = ?",
+            (key, self.parser_version),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        self._touched.append((time.time(), key, self.parser_version))
+        if len(self._touched) >= TOUCH_BATCH:
+            self.flush()
+        return True, json.loads(row[0])
+
+    def put(self, key: str, rows: Optional[List[dict]]) -> None:
+        payload = json.dumps(rows, ensure_ascii=False)
+        if self._bytes is None:
+            self._bytes = self.total_bytes()
+        with self.conn:
+            old = self.conn.execute(
+                "SELECT size FROM papers WHERE key = ? AND parser_version = ?",
+                (key, self.parser_version),
+            ).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO papers (key, parser_version, rows, size, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, self.parser_version, payload, len(payload), time.time()),
+            )
+        self._bytes += len(payload) - (old[0] if old else 0)
+        if self._bytes > self.max_bytes:
+            self.evict(int(self.max_bytes * EVICT_TO))
+
+    def total_bytes(self) -> int:
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM papers").fetchone()[0]
+
+    def evict(self, target: Optional[int] = None) -> int:
+        """Drop least-recently-used entries until the cache fits in target (default max_bytes)."""
+        self.flush()
+        total = self.total_bytes()
+        excess = total - (self.max_bytes if target is None else target)
+        self._bytes = total
+        if excess <= 0:
+            return 0
+        doomed = []
+        for key, version, size in self.conn.execute(
+                "SELECT key, parser_version, size FROM papers ORDER BY last_used"):
+            if excess <= 0:
+                break
+            doomed.append((key, version))
+            excess -= size
+            self._bytes -= size
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM papers WHERE key = ? AND parser_version = ?", doomed)
+        return len(doomed)
+
+    def prune(self) -> int:
+        """Drop entries written by other parser versions, then enforce the size limit."""
+        self.flush()
+        with self.conn:
+            n = self.conn.execute(
+                "DELETE FROM papers WHERE parser_version != ?", (self.parser_version,)
+            ).rowcount
+        return n + self.evict()
+
+    def clear(self) -> int:
+        with self.conn:
+            n = self.conn.execute("DELETE FROM papers").rowcount
+        self._touched = []
+        self._bytes = 0
+        self.conn.execute("VACUUM")
+        return n
+
+    def stats(self) -> dict:
+        self.flush()
+        count, size = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM papers").fetchone()
+        versions = dict(self.conn.execute(
+            "SELECT parser_version, COUNT(*) FROM papers GROUP BY parser_version"))
+        return {'entries': count, 'bytes': size, 'by_parser_version': versions}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['stats', 'prune', 'clear'])
+    parser.add_argument('--db', default=DEFAULT_DB, help="cache database file")
+    parser.add_argument('--max-mb', type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help="size limit used by prune")
+    parser.add_argument('--parser-version', default=None,
+                        help="entries from other versions are dropped by prune "
+                             "(default: the current extract_review_references.PARSER_VERSION)")
+    args = parser.parse_args()
+
+    version = args.parser_version
+    if version is None:
+        from extract_review_references import PARSER_VERSION
+        version = PARSER_VERSION
+
+    with ReferenceCache(args.db, version, int(args.max_mb * 1024 * 1024)) as cache:
+        if args.command == 'stats':
+            print(json.dumps(cache.stats(), indent=2))
+        elif args.command == 'prune':
+            print(f"Removed {cache.prune()} entries from {args.db}")
+        else:
+            print(f"Removed {cache.clear()} entries from {args.db}")
+
+
+if __name__ == '__main__':
+    main()
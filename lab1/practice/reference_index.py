@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Global index of unique references across every paper processed in batch mode.
+
+The same review is usually cited by many papers in a corpus. The index keys
+each reference by its DOI when the citation has one, otherwise by a
+normalized form of the citation text (case, punctuation, accents and author
+initials ignored), so each unique work is parsed and classified once. For
+every reference it keeps the list of citing papers as (reference id, paper id)
+integer pairs.
+
+`export` writes the unique review-like references, most cited first, in the
+column layout lab2/demo/download_reviews.py reads, so the download queue
+holds each work only once.
+
+Usage:
+    python reference_index.py stats [--db PATH]
+    python reference_index.py export queue.csv [--db PATH] [--all]
+    python reference_index.py citing "doi:10.1038/..." [--db PATH]
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import unicodedata
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+DEFAULT_INDEX = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.reference_index.sqlite')
+
+DOI_RE = re.compile(r"\b(10\.\d{4,9}/\S+)")
+WORD_RE = re.compile(r"[^\W_]+")
+
+# Columns of the queue CSV read by lab2/demo/download_reviews.py, plus the citation count
+QUEUE_COLUMNS = ['title', 'authors', 'full_citation', 'journal', 'year', 'cited_by']
+
+
+def reference_key(raw: str) -> str:
+    """
+    Identity of a reference: 'doi:<doi>' when the citation contains a DOI,
+    else 'cit:<normalized citation>'. The normalized form keeps only
+    lower-cased words of two or more letters/digits, so "Kim, S. J." and
+    "Kim, S.J.", or an en dash vs. a hyphen in the page range, give the same key.
+    """
+    m = DOI_RE.search(raw)
+    if m:
+        return 'doi:' + m.group(1).rstrip('.,;)').lower()
+    text = unicodedata.normalize('NFKD', raw).casefold()
+    words = [w for w in WORD_RE.findall(text) if len(w) > 1]
+    return 'cit:' + ' '.join(words)
+
+
+class ReferenceIndex:
+    """
+    SQLite-backed index: unique reference -> parsed fields + citing papers.
+
+    Papers are remembered with their content hash, so re-indexing an
+    unchanged paper is a no-op and a changed one replaces its old citations.
+    The parsed fields depend on the parser, so an index built by another
+    parser_version is emptied on open and rebuilt from the papers (None:
+    open it as it is, e.g. to read stats).
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX, parser_version: Optional[str] = None):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS papers ("
+            " id INTEGER PRIMARY KEY,"
+            " path TEXT NOT NULL UNIQUE,"
+            " content_key TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS refs ("
+            " id INTEGER PRIMARY KEY,"
+            " key TEXT NOT NULL UNIQUE,"
+            " authors TEXT, year TEXT, title TEXT, journal TEXT, raw TEXT,"
+            " is_review TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS citations ("
+            " ref_id INTEGER NOT NULL,"
+            " paper_id INTEGER NOT NULL,"
+            " PRIMARY KEY (ref_id, paper_id)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS citations_paper ON citations (paper_id);"
+            "CREATE TABLE IF NOT EXISTS meta ("
+            " name TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL);"
+        )
+        self.conn.commit()
+        if parser_version is not None and parser_version != self.parser_version():
+            with self.conn:
+                for table in ('citations', 'refs', 'papers'):
+                    self.conn.execute(f"DELETE FROM {table}")
+                self.conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('parser_version', ?)",
+                                  (parser_version,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def parser_version(self) -> Optional[str]:
+        """Parser version the indexed references were parsed with (None for an empty old index)."""
+        row = self.conn.execute("SELECT value FROM meta WHERE name = 'parser_version'").fetchone()
+        return row[0] if row else None
+
+    def paper_keys(self) -> Dict[str, str]:
+        """path -> content hash of every indexed paper."""
+        return dict(self.conn.execute("SELECT path, content_key FROM papers"))
+
+    def add_paper(self, path: str, content_key: str, entries: List[str],
+                  parse: Callable[[List[str]], List[dict]]) -> int:
+        """
+        Record that `path` cites `entries` (raw reference lines). Only entries
+        whose key is not in the index yet are passed to `parse`, which must
+        return one row dict (authors/title/journal/year/raw/is_review) per entry.
+        Returns how many new unique references were parsed.
+        """
+        keys: Dict[str, str] = {}
+        for e in entries:
+            keys.setdefault(reference_key(e), e)
+
+        known = {}
+        key_list = list(keys)
+        for i in range(0, len(key_list), 500):
+            chunk = key_list[i:i + 500]
+            known.update(self.conn.execute(
+                f"SELECT key, id FROM refs WHERE key IN ({','.join('?' * len(chunk))})", chunk))
+        new_keys = [k for k in key_list if k not in known]
+
+        with self.conn:
+            if new_keys:
+                rows = parse([keys[k] for k in new_keys])
+                for k, r in zip(new_keys, rows):
+                    known[k] = self.conn.execute(
+                        "INSERT INTO refs (key, authors, year, title, journal, raw, is_review)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (k, r['authors'], r['year'], r['title'], r['journal'], r['raw'], r['is_review']),
+                    ).lastrowid
+            self.conn.execute(
+                "INSERT INTO papers (path, content_key) VALUES (?, ?)"
+                " ON CONFLICT(path) DO UPDATE SET content_key = excluded.content_key",
+                (path, content_key),
+            )
+            paper_id = self.conn.execute("SELECT id FROM papers WHERE path = ?", (path,)).fetchone()[0]
+            cited_before = [r for (r,) in self.conn.execute(
+                "SELECT ref_id FROM citations WHERE paper_id = ?", (paper_id,))]
+            self.conn.execute("DELETE FROM citations WHERE paper_id = ?", (paper_id,))
+            self.conn.executemany(
+                "INSERT INTO citations (ref_id, paper_id) VALUES (?, ?)",
+                [(known[k], paper_id) for k in key_list],
+            )
+            # References this paper no longer cites may now be cited by nobody
+            self._drop_orphans(cited_before)
+        return len(new_keys)
+
+    def remove_papers(self, paths: Iterable[str]) -> int:
+        """
+        Forget papers (gone from the input, or without a References section
+        any more) with their citations, and the references nobody cites now.
+        Returns how many papers were removed.
+        """
+        paths = list(paths)
+        with self.conn:
+            ids = [row[0] for p in paths for row in self.conn.execute("SELECT id FROM papers WHERE path = ?", (p,))]
+            cited_before = [r for i in ids for (r,) in self.conn.execute(
+                "SELECT ref_id FROM citations WHERE paper_id = ?", (i,))]
+            self.conn.executemany("DELETE FROM citations WHERE paper_id = ?", [(i,) for i in ids])
+            self.conn.executemany("DELETE FROM papers WHERE id = ?", [(i,) for i in ids])
+            self._drop_orphans(cited_before)
+        return len(ids)
+
+    def _drop_orphans(self, ref_ids: Iterable[int]) -> None:
+        """Delete those of ref_ids that no paper cites any more (inside the caller's transaction)."""
+        self.conn.executemany(
+            "DELETE FROM refs WHERE id = ? AND NOT EXISTS (SELECT 1 FROM citations WHERE ref_id = ?)",
+            [(r, r) for r in set(ref_ids)],
+        )
+
+    def references(self, reviews_only: bool = True) -> Iterator[dict]:
+        """Unique references with their citation counts, most cited first."""
+        where = "WHERE r.is_review = 'yes'" if reviews_only else ""
+        cur = self.conn.execute(
+            "SELECT r.key, r.authors, r.year, r.title, r.journal, r.raw, r.is_review, COUNT(c.paper_id) AS n"
+            " FROM refs r JOIN citations c ON c.ref_id = r.id "
+            f"{where} GROUP BY r.id ORDER BY n DESC, r.id"
+        )
+        for key, authors, year, title, journal, raw, is_review, n in cur:
+            yield {'key': key, 'authors': authors, 'year': year, 'title': title, 'journal': journal,
+                   'raw': raw, 'is_review': is_review, 'cited_by': n}
+
+    def citing_papers(self, key: str) -> List[str]:
+        return [p for (p,) in self.conn.execute(
+            "SELECT p.path FROM refs r JOIN citations c ON c.ref_id = r.id"
+            " JOIN papers p ON p.id = c.paper_id WHERE r.key = ? ORDER BY p.path", (key,))]
+
+    def stats(self) -> dict:
+        papers, refs, reviews, citations = self.conn.execute(
+            "SELECT (SELECT COUNT(*) FROM papers), (SELECT COUNT(*) FROM refs),"
+            " (SELECT COUNT(*) FROM refs WHERE is_review = 'yes'), (SELECT COUNT(*) FROM citations)"
+        ).fetchone()
+        return {'papers': papers, 'unique_references': refs, 'unique_reviews': reviews,
+                'citations': citations, 'parser_version': self.parser_version()}
+
+
+def export_queue(index: ReferenceIndex, output_path: str, reviews_only: bool = True) -> int:
+    """Write unique references as a download queue CSV (see QUEUE_COLUMNS)."""
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    n = 0
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(QUEUE_COLUMNS)
+        for r in index.references(reviews_only):
+            writer.writerow([r['title'], r['authors'], r['raw'], r['journal'], r['year'], r['cited_by']])
+            n += 1
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['stats', 'export', 'citing'])
+    parser.add_argument('target', nargs='?', help="output CSV for export, reference key for citing")
+    parser.add_argument('--db', default=DEFAULT_INDEX, help="index database file")
+    parser.add_argument('--all', action='store_true', help="export all references, not only reviews")
+    args = parser.parse_args()
+
+    if args.command != 'stats' and not args.target:
+        parser.error(f"{args.command} needs a target")
+
+    with ReferenceIndex(args.db) as index:
+        if args.command == 'stats':
+            print(json.dumps(index.stats(), indent=2))
+        elif args.command == 'export':
+            n = export_queue(index, args.target, reviews_only=not args.all)
+            print(f"Wrote {n} unique references to {args.target}")
+        else:
+            for path in index.citing_papers(args.target):
+                print(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""
+Reference styles for extract_review_references.py.
+
+A References block is written in one citation style throughout, so the style
+is detected once per block (from a sample of its lines) and that style's
+splitter and parser handle every entry; no entry is tried against the
+patterns of the other styles.
+
+Built-in styles besides Nature (registered by extract_review_references.py):
+  cell       Cell Press article pages: a "12." line, then authors, title and
+             "Nat. Genet. 2015; 47:8-12" on separate lines, then Crossref/PubMed links
+  plos       author-year, as in PLOS and PMC exports:
+             "Smith J, Doe A (2020) Title. PLoS Genet 16(3): e1008. [[DOI](...)]"
+  vancouver  numbered: "1. Smith J, Doe A. Title. J Biol Chem. 2020;295(3):123-9."
+
+A new style is a ReferenceStyle(name, detect pattern, split, parse) passed to
+register_style(). split(block) returns the entries as strings, parse(entries)
+returns one (authors, title, journal, year) tuple per entry.
+"""
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+Parsed = Tuple[str, str, str, str]
+
+# How much of a block is sampled to detect its style
+DETECT_CHARS = 20000
+
+
+class ReferenceStyle:
+    """A citation style: how to recognise its lines, split a block, and parse entries."""
+
+    def __init__(self, name: str, detect: str,
+                 split: Callable[[str], List[str]],
+                 parse: Callable[[List[str]], List[Parsed]]):
+        self.name = name
+        self.detect = re.compile(detect)
+        self.split = split
+        self.parse = parse
+
+    def score(self, lines: List[str]) -> int:
+        """Number of sample lines that look like this style."""
+        search = self.detect.search
+        return sum(1 for line in lines if search(line))
+
+
+STYLES: Dict[str, ReferenceStyle] = {}
+
+
+def register_style(style: ReferenceStyle) -> ReferenceStyle:
+    STYLES[style.name] = style
+    return style
+
+
+def get_style(name: str) -> ReferenceStyle:
+    return STYLES[name]
+
+
+def detect_style(ref_block: str, default: ReferenceStyle) -> ReferenceStyle:
+    """
+    Pick the style whose pattern matches the most lines at the start of the
+    block. `default` wins ties (and is used when nothing matches), other ties
+    go to the style registered first.
+    """
+    lines = [line.strip() for line in ref_block[:DETECT_CHARS].splitlines()]
+    best, best_score = default, default.score(lines)
+    for style in STYLES.values():
+        score = style.score(lines)
+        if score > best_score:
+            best, best_score = style, score
+    return best
+
+
+def dedupe(entries: List[str]) -> List[str]:
+    """Drop repeated entries, keeping the first occurrence (dict keeps insertion order)."""
+    return list(dict.fromkeys(entries))
+
+
+ANY_YEAR_RE = re.compile(r"\b((?:19|20)\d{2})\b")
+VOLUME_RE = re.compile(r"\s+\d")
+
+
+def _journal_before_volume(text: str) -> str:
+    """'J Mol Biol 409 (1), 7–13.' -> 'J Mol Biol'; without a volume, up to the first '. '."""
+    m = VOLUME_RE.search(text, 1)
+    journal = text[:m.start()] if m else text.split('. ', 1)[0]
+    return journal.strip().rstrip('.,;:')
+
+
+# --- Cell Press article pages ---------------------------------------------
+
+CELL_NUMBER_RE = re.compile(r"^\d{1,4}\.$")
+CELL_LINK_RE = re.compile(r"^(?:Crossref|PubMed|Google Scholar|Full Text(?: \(PDF\))?|Scopus \(\d+\)|Abstract)$")
+CELL_JOURNAL_RE = re.compile(r"^(.*?)\.?\s+((?:19|20)\d{2})[a-z]?\s*;")
+
+
+def split_cell(ref_block: str) -> List[str]:
+    """
+    One entry per "N." line: the lines after it up to the first link line
+    (Crossref, PubMed, ...), joined with newlines so the parser still sees
+    authors / title / journal separately.
+    """
+    entries = []
+    current: Optional[List[str]] = None
+    for line in ref_block.splitlines():
+        line = line.strip()
+        if CELL_NUMBER_RE.match(line):
+            if current:
+                entries.append('\n'.join(current))
+            current = []
+        elif current is None:
+            continue
+        elif not line or CELL_LINK_RE.match(line):
+            if current:
+                entries.append('\n'.join(current))
+            current = None
+        else:
+            current.append(line)
+    if current:
+        entries.append('\n'.join(current))
+    return dedupe(entries)
+
+
+def parse_cell(entries: List[str]) -> List[Parsed]:
+    out = []
+    for e in entries:
+        lines = e.split('\n')
+        authors = lines[0].rstrip(' .')
+        title = lines[1].rstrip('.') if len(lines) > 1 else ""
+        source = ' '.join(lines[2:])
+        m = CELL_JOURNAL_RE.match(source)
+        if m:
+            journal, year = m.group(1), m.group(2)
+        else:
+            y = ANY_YEAR_RE.search(source)
+            journal, year = source.split(';', 1)[0], y.group(1) if y else ""
+        out.append((authors, title, journal.strip().rstrip('.'), year))
+    return out
+
+
+# --- Author-year (PLOS, PMC) ----------------------------------------------
+
+# Leading list markers / numbering as exported to markdown: "* **1.**", "- ", "1. ", "[1] "
+LIST_MARKER_RE = re.compile(r"^(?:[*-]\s+)?(?:\*\*)?(?:\[?\d{1,4}[.\]])?(?:\*\*)?\s*")
+AUTHOR_YEAR_RE = re.compile(r"[\w.]\s\(((?:19|20)\d{2})[a-z]?\)\s+(?=\S)")
+
+
+def split_author_year(ref_block: str) -> List[str]:
+    """One entry per line that has an author-year "(2020) " marker, list markers removed."""
+    entries = []
+    for line in ref_block.splitlines():
+        line = LIST_MARKER_RE.sub('', line.strip(), count=1)
+        if AUTHOR_YEAR_RE.search(line):
+            entries.append(line)
+    return dedupe(entries)
+
+
+def parse_author_year(entries: List[str]) -> List[Parsed]:
+    out = []
+    for e in entries:
+        m = AUTHOR_YEAR_RE.search(e)
+        if not m:
+            out.append((e, "", "", ""))
+            continue
+        authors = e[:m.start() + 1].strip()
+        # Markdown link lists ("[[DOI](...)] [[PubMed](...)]") trail the citation
+        rest = e[m.end():].split(' [[', 1)[0]
+        title, _, source = rest.partition('. ')
+        out.append((authors, title.strip().rstrip('.'), _journal_before_volume(source), m.group(1)))
+    return out
+
+
+# --- Numbered Vancouver ---------------------------------------------------
+
+VANCOUVER_NUMBER_RE = re.compile(r"^(?:\[\d{1,4}\]|\d{1,4}\.)\s+(?=\S)")
+VANCOUVER_DETECT = r"^(?:\[\d{1,4}\]|\d{1,4}\.)\s+\S.*\.\s+(?:19|20)\d{2}\b[^;]{0,20};"
+VANCOUVER_YEAR_RE = re.compile(r"^((?:19|20)\d{2})\b")
+
+
+def split_vancouver(ref_block: str) -> List[str]:
+    """One entry per numbered line; unnumbered lines continue the previous entry."""
+    entries = []
+    for line in ref_block.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        m = VANCOUVER_NUMBER_RE.match(line)
+        if m:
+            entries.append(line[m.end():])
+        elif entries:
+            entries[-1] += ' ' + line
+    return dedupe(entries)
+
+
+def parse_vancouver(entries: List[str]) -> List[Parsed]:
+    out = []
+    for e in entries:
+        segs = [s.strip() for s in e.split('. ', 3)]
+        authors = segs[0].rstrip('.')
+        title = segs[1].rstrip('.') if len(segs) > 1 else ""
+        journal = segs[2].rstrip('.') if len(segs) > 2 else ""
+        year = ""
+        if len(segs) > 3:
+            m = VANCOUVER_YEAR_RE.match(segs[3])
+            if m:
+                year = m.group(1)
+        if not year:
+            m = ANY_YEAR_RE.search(e)
+            year = m.group(1) if m else ""
+        out.append((authors, title, journal, year))
+    return out
+
+
+register_style(ReferenceStyle('cell', r"^\d{1,4}\.$", split_cell, parse_cell))
+register_style(ReferenceStyle('plos', AUTHOR_YEAR_RE.pattern, split_author_year, parse_author_year))
+register_style(ReferenceStyle('vancouver', VANCOUVER_DETECT, split_vancouver, parse_vancouver))
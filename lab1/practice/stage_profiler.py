@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Opt-in per-stage timing for the extraction pipeline
+(extract_review_references.py --profile). Same profiler as
+lab1/demo/stage_profiler.py, whose profile files it reads too.
+
+For every document one JSON line is appended to the profile file:
+
+    {"document": "...", "seconds": 0.012, "peak_bytes": 183204,
+     "counts": {"bytes": 98211, "block_chars": 30412, "style_nature": 1, "references": 98, "reviews": 9},
+     "stages": {"decode": {"seconds": ..., "calls": ..., "peak_bytes": ...},
+                "references_block": {...}, "detect_style": {...}, "split": {...},
+                "parse": {...}, "classify": {...}}}
+
+Stage seconds are self time: a stage nested in another (or pulling from
+another stage's iterator) does not count the inner stage's time.
+peak_bytes is only recorded with memory tracing on (tracemalloc, which makes
+everything several times slower) and is the peak allocation above what was
+in use when the stage/document started.
+
+Dump the slowest documents of a profile file:
+    python stage_profiler.py profile.jsonl --slowest 10
+"""
+
+import argparse
+import heapq
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class StageProfiler:
+    """Collects per-stage wall time, call counts and peak memory for one document at a time."""
+
+    def __init__(self, output_file, trace_memory=False):
+        self.output_file = output_file
+        self.trace_memory = trace_memory
+        self._out = open(output_file, 'a', encoding='utf-8')
+        self._stack = []  # open stages: [name, start time, child seconds, start bytes]
+        self.stages = {}
+        self.counts = {}
+
+    def close(self):
+        self._out.close()
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def _note_peak(self):
+        """Fold the tracemalloc peak since the last reset into every open stage."""
+        current, peak = tracemalloc.get_traced_memory()
+        for frame in self._stack:
+            stats = self.stages[frame[0]]
+            stats['peak_bytes'] = max(stats.get('peak_bytes', 0), peak - frame[3])
+        tracemalloc.reset_peak()
+        return current
+
+    def _enter(self, name):
+        if name not in self.stages:
+            self.stages[name] = {'seconds': 0.0, 'calls': 0}
+        start_bytes = self._note_peak() if self.trace_memory else 0
+        self._stack.append([name, time.perf_counter(), 0.0, start_bytes])
+
+    def _exit(self):
+        if self.trace_memory:
+            self._note_peak()
+        name, start, child_seconds, _ = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        stats = self.stages[name]
+        stats['seconds'] += elapsed - child_seconds
+        stats['calls'] += 1
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    @contextmanager
+    def stage(self, name):
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def iter(self, name, iterable):
+        """Yield from iterable, timing each step as one call of stage `name`."""
+        it = iter(iterable)
+        while True:
+            self._enter(name)
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                self._exit()
+            yield item
+
+    @contextmanager
+    def document(self, name):
+        """Profile one document; its JSON line is written when the block exits."""
+        self.stages = {}
+        self.counts = {}
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        error = None
+        start = time.perf_counter()
+        try:
+            with self.stage('document'):
+                yield self
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            total = self.stages.pop('document')
+            record = {'document': name, 'seconds': round(seconds, 6)}
+            if self.trace_memory:
+                record['peak_bytes'] = total.get('peak_bytes', 0)
+            record['counts'] = self.counts
+            record['stages'] = {}
+            for stage_name, stats in self.stages.items():
+                stats['seconds'] = round(stats['seconds'], 6)
+                record['stages'][stage_name] = stats
+            if error:
+                record['error'] = error
+            self._out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._out.flush()
+
+
+def slowest_documents(profile_file, n):
+    """Return the n slowest document records of a profile file, slowest first."""
+    with open(profile_file, 'r', encoding='utf-8') as f:
+        records = (json.loads(line) for line in f if line.strip())
+        return heapq.nlargest(n, records, key=lambda r: r['seconds'])
+
+
+def print_slowest(profile_file, n):
+    print(f"Slowest {n} documents in {profile_file}:")
+    for r in slowest_documents(profile_file, n):
+        worst = max(r['stages'].items(), key=lambda kv: kv[1]['seconds'], default=(None, None))[0]
+        refs = r['counts'].get('references', 0)
+        print(f"{r['seconds'] * 1000:10.2f} ms  {refs:6d} refs  slowest stage: {worst or '-':<16} {r['document']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('profile', help="JSON lines file written by extract_review_references.py --profile")
+    parser.add_argument('--slowest', type=int, default=10, metavar='N',
+                        help="how many documents to show (default: 10)")
+    args = parser.parse_args()
+    print_slowest(args.profile, args.slowest)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark + check of the concurrent downloader against a local stand-in server.
+
+Starts stand_in_server.StandInServer (every request takes --latency seconds,
+every new connection --handshake seconds), points download_reviews at it and
+downloads the same article list
+  - with one worker and a new session per strategy call (no connection reuse)
+  - with one worker and the shared pooled session
+  - with --workers workers and the shared pooled session
+Checks that every PDF arrived intact and that no more requests were in
+flight than workers x PROBE_WORKERS (each article probes its candidate PDF
+URLs concurrently).
+
+Usage: python benchmark_downloader.py [--articles 40] [--workers 16] [--latency 0.05] [--handshake 0.05]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import download_reviews
+from download_reviews import download_all, sanitize_filename
+from rate_limiter import HostRateLimiter
+from stand_in_server import StandInServer, make_articles
+
+
+shared_session = download_reviews.get_session
+
+
+def run(server, articles, workers, shared=True):
+    download_reviews.get_session = shared_session if shared else download_reviews.make_session
+    download_reviews.reset_session(pool_maxsize=workers)
+    server.reset_stats()
+    with tempfile.TemporaryDirectory() as out:
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            downloaded, failed = download_all(articles, out, workers=workers, delay=0)
+        elapsed = time.perf_counter() - t0
+        assert (downloaded, failed) == (len(articles), 0), (downloaded, failed)
+        for i, row in enumerate(articles):
+            with open(os.path.join(out, sanitize_filename(row['title']) + '.pdf'), 'rb') as f:
+                assert f.read() == server.papers[f"{i:05d}"], row['title']
+    assert server.max_in_flight <= workers * download_reviews.PROBE_WORKERS, server.max_in_flight
+    return elapsed, server.requests, server.connections, server.max_in_flight
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds per request")
+    parser.add_argument('--handshake', type=float, default=0.05, help="seconds per new connection")
+    args = parser.parse_args()
+
+    with StandInServer(latency=args.latency, handshake=args.handshake) as server:
+        server.point(download_reviews)
+        # Measure concurrency alone: no per-host throttling of the local server
+        download_reviews.RATE_LIMITER = HostRateLimiter(default_rate=None)
+        articles = make_articles(server, args.articles)
+        print(f"{args.articles} articles, {args.latency * 1000:.0f} ms per request, "
+              f"{args.handshake * 1000:.0f} ms per new connection ({server.url})")
+        print(f"{'workers':>8}{'session':>10}{'seconds':>10}{'requests':>10}{'connections':>13}{'max in flight':>15}")
+        results = []
+        for workers, shared in ((1, False), (1, True), (args.workers, True)):
+            elapsed, requests, connections, peak = run(server, articles, workers, shared)
+            results.append(elapsed)
+            print(f"{workers:>8}{'shared' if shared else 'per call':>10}{elapsed:>10.2f}"
+                  f"{requests:>10}{connections:>13}{peak:>15}")
+        print(f"shared session: {results[0] / results[1]:.1f}x, "
+              f"{args.workers} workers: {results[0] / results[2]:.1f}x in total, all PDFs intact")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark + check of hedged (raced) download strategies against the local
+stand-in server.
+
+Every article is open access through Semantic Scholar as well as available
+from its publisher via the DOI. Three situations, each downloaded with the
+strategies tried in turn and with --hedge:
+  - all sources fast: hedging should cost (almost) no extra requests
+  - slow publisher: landing page and PDF take --slow extra seconds each
+  - slow DOI resolver: doi.org takes --slow extra seconds
+Reports the median and slowest time per article and the requests made, and
+checks that every PDF is intact and no strategy files are left behind.
+
+Usage: python benchmark_hedging.py [--articles 16] [--slow 2] [--stagger 0.3]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+
+import download_reviews
+from download_reviews import download_all, sanitize_filename
+from rate_limiter import HostRateLimiter
+from stand_in_server import StandInServer, make_articles
+
+process_article = download_reviews.process_article
+article_times = []
+
+
+def timed_process_article(row, output_dir):
+    t0 = time.perf_counter()
+    try:
+        return process_article(row, output_dir)
+    finally:
+        article_times.append(time.perf_counter() - t0)
+
+
+def run(server, articles, stagger):
+    download_reviews.HEDGE_STAGGER = stagger
+    server.reset_stats()
+    article_times.clear()
+    with tempfile.TemporaryDirectory() as out:
+        with contextlib.redirect_stdout(io.StringIO()):
+            downloaded, failed = download_all(articles, out, workers=len(articles), delay=0)
+        requests = server.requests
+        assert (downloaded, failed) == (len(articles), 0), (downloaded, failed)
+        for i, row in enumerate(articles):
+            with open(os.path.join(out, sanitize_filename(row['title']) + '.pdf'), 'rb') as f:
+                assert f.read() == server.papers[f"{i:05d}"], row['title']
+        # Cancelled strategies stop at their next request or chunk; give them time to clean up
+        deadline = time.monotonic() + 30
+        while server.in_flight and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.2)
+        leftovers = [name for name in os.listdir(out) if not name.endswith(('.pdf', '.json'))]
+        assert not leftovers, leftovers
+    return statistics.median(article_times), max(article_times), requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=16)
+    parser.add_argument('--slow', type=float, default=2.0, help="extra seconds per request of the slow source")
+    parser.add_argument('--stagger', type=float, default=0.3, help="--hedge delay between strategies")
+    args = parser.parse_args()
+    download_reviews.RATE_LIMITER = HostRateLimiter(default_rate=None)
+    download_reviews.process_article = timed_process_article
+
+    with StandInServer(latency=0.02) as server:
+        server.point(download_reviews)
+        articles = make_articles(server, args.articles, size=200_000)
+        server.open_access.update(server.papers)
+        print(f"{args.articles} articles, slow source +{args.slow:.1f} s per request, hedge stagger {args.stagger} s")
+        print(f"{'situation':<20}{'mode':<10}{'median s':>9}{'max s':>8}{'requests':>10}")
+        results = {}
+        for situation, delays in (("all fast", {}), ("slow publisher", {'article': args.slow}),
+                                  ("slow DOI resolver", {'doi': args.slow})):
+            server.delays = delays
+            for mode, stagger in (("in turn", None), ("hedged", args.stagger)):
+                median, slowest, requests = run(server, articles, stagger)
+                results[situation, mode] = (median, slowest, requests)
+                print(f"{situation:<20}{mode:<10}{median:>9.2f}{slowest:>8.2f}{requests:>10}")
+        download_reviews.HEDGE_STAGGER = None
+        download_reviews.process_article = process_article
+
+    fast_in_turn, fast_hedged = results["all fast", "in turn"], results["all fast", "hedged"]
+    assert fast_hedged[2] <= fast_in_turn[2] * 1.1, "hedging launched strategies it did not need"
+    for situation in ("slow publisher", "slow DOI resolver"):
+        assert results[situation, "hedged"][1] < results[situation, "in turn"][1] / 2, situation
+    print("slowest article: " + ", ".join(
+        f"{s} {results[s, 'in turn'][1]:.2f} -> {results[s, 'hedged'][1]:.2f} s"
+        for s in ("slow publisher", "slow DOI resolver")) + "; all PDFs intact")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark + check of adaptive timeouts and circuit breakers (host_health.py)
+against the local stand-in server.
+
+The publisher (localhost) answers fast for a first batch of articles, then
+turns sick: its pages take --sick seconds. Every article is also available
+as an open access copy (on 127.0.0.1), so an article only has to get past
+the publisher to be downloaded. Compared:
+  - fixed timeouts, no breaker: each article waits for the sick publisher
+  - adaptive timeouts + breaker: the first requests to the sick publisher
+    time out after a few times its usual latency, then its circuit opens and
+    the remaining articles go straight to the open access copies
+Then the publisher recovers: after the cooldown one trial request closes the
+circuit and the next articles come from the publisher again. Last, a trial
+request whose redirect hop fails (the publisher's circuit is open) or is
+cancelled must not leave its own host blocked.
+
+Usage: python benchmark_host_health.py [--articles 32] [--workers 8] [--sick 2]
+"""
+
+import argparse
+import contextlib
+import io
+import tempfile
+import threading
+import time
+
+import download_reviews
+from download_reviews import Cancelled, download_all, make_session
+from host_health import HostHealth, HostUnavailable
+from metrics import Metrics
+from rate_limiter import HostRateLimiter
+from stand_in_server import DOI_PREFIX, StandInServer, make_articles
+
+COOLDOWN = 1.0
+
+
+def run(server, articles, workers):
+    server.reset_stats()
+    with tempfile.TemporaryDirectory() as out:
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            downloaded, failed = download_all(articles, out, workers=workers, delay=0)
+        elapsed = time.perf_counter() - t0
+    assert (downloaded, failed) == (len(articles), 0), (downloaded, failed)
+    return elapsed
+
+
+def open_circuit(health, host):
+    for _ in range(health.failure_threshold):
+        health.failure(host, False)
+    assert health.is_open(host)
+
+
+def check_trial_release(doi_url, oa_url):
+    """The trial request of 127.0.0.1 redirects to localhost; whatever happens there, 127.0.0.1 is free again."""
+    download_reviews.HOST_HEALTH = health = HostHealth(failure_threshold=1, cooldown=0.2)
+    session = make_session()
+
+    # The hop finds localhost's circuit open: 127.0.0.1 did answer, so its circuit closes
+    open_circuit(health, '127.0.0.1')
+    time.sleep(0.25)
+    open_circuit(health, 'localhost')
+    try:
+        session.get(doi_url, timeout=5)
+        raise AssertionError("the hop to localhost was sent")
+    except HostUnavailable:
+        pass
+    assert not health.is_open('127.0.0.1'), "127.0.0.1 stayed blocked after its trial's hop failed"
+
+    # The race is won while the hop is on its way: the next request is the trial
+    time.sleep(0.25)
+    open_circuit(health, '127.0.0.1')
+    time.sleep(0.25)
+    download_reviews._log_state.cancel = cancel = threading.Event()
+    try:
+        session.get(doi_url, timeout=5, hooks={'response': lambda r, **kwargs: cancel.set()})
+        raise AssertionError("the hop was not cancelled")
+    except Cancelled:
+        pass
+    finally:
+        download_reviews._log_state.cancel = None
+    assert session.get(oa_url, timeout=5).ok and not health.is_open('127.0.0.1'), \
+        "127.0.0.1 stayed blocked after its trial was cancelled"
+    download_reviews.HOST_HEALTH = HostHealth()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--sick', type=float, default=2.0, help="seconds the sick publisher takes per page")
+    args = parser.parse_args()
+    download_reviews.RATE_LIMITER = HostRateLimiter(default_rate=None)
+
+    with StandInServer(latency=0.02) as server:
+        server.point(download_reviews)
+        all_articles = make_articles(server, args.articles * 2, size=20_000)
+        server.open_access.update(server.papers)
+        healthy, sick = all_articles[:args.articles], all_articles[args.articles:]
+
+        print(f"{args.articles} articles while the publisher is healthy, then {args.articles} "
+              f"while its pages take {args.sick:.0f} s")
+        print(f"{'mode':<32}{'healthy s':>10}{'sick s':>8}{'publisher requests':>20}{'timeouts':>10}")
+        results = {}
+        modes = (("fixed timeouts, no breaker", HostHealth(failure_threshold=0, adaptive=False)),
+                 ("adaptive timeouts + breaker", HostHealth(cooldown=COOLDOWN, min_timeout=0.2)))
+        for name, health in modes:
+            download_reviews.HOST_HEALTH = health
+            download_reviews.METRICS = metrics = Metrics()
+            server.delays.pop('article', None)
+            fast = run(server, healthy, args.workers)
+            server.delays['article'] = args.sick
+            slow = run(server, sick, args.workers)
+            publisher = server.route_counts['article']
+            timeouts = metrics.timeouts['localhost']
+            results[name] = (fast, slow, publisher, timeouts, health, metrics)
+            print(f"{name:<32}{fast:>10.2f}{slow:>8.2f}{publisher:>20}{timeouts:>10}")
+
+        fixed, adaptive = results["fixed timeouts, no breaker"], results["adaptive timeouts + breaker"]
+        health, metrics = adaptive[4], adaptive[5]
+        assert fixed[3] == 0 and fixed[1] >= args.sick, fixed[:4]
+        # Only the requests before the circuit opened reached the sick publisher
+        assert adaptive[3] >= health.failure_threshold and adaptive[2] < args.articles, adaptive[:4]
+        assert metrics.breakers['localhost', 'opened'] >= 1 and health.is_open('localhost')
+        assert adaptive[1] < fixed[1] / 3, (adaptive[1], fixed[1])
+        print(f"sick publisher: {fixed[1]:.2f} -> {adaptive[1]:.2f} s for {args.articles} articles")
+
+        # Recovery: after the cooldown a trial request closes the circuit
+        server.delays.pop('article')
+        time.sleep(COOLDOWN)
+        run(server, healthy[:args.workers], 1)
+        assert not health.is_open('localhost') and metrics.breakers['localhost', 'closed'] == 1
+        assert server.route_counts['article'] >= args.workers, server.route_counts
+        print("publisher recovered: circuit closed, articles come from the publisher again")
+        download_reviews.METRICS = None
+        download_reviews.HOST_HEALTH = HostHealth()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            check_trial_release(f"{download_reviews.DOI_RESOLVER}/{DOI_PREFIX}00000", f"{server.url}/oa/00000")
+        print("a trial request whose redirect hop fails or is cancelled leaves its host free")
+
+
+if __name__ == '__main__':
+    main()
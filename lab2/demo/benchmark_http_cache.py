@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark + check of the HTTP cache (http_cache.py) against the local
+stand-in server.
+
+Downloads the same --articles three times into fresh folders, sharing one
+cache file:
+  - cold cache: every DOI goes through the redirect and the landing page
+  - warm cache: DOIs come from the DOI map, landing pages from the cache;
+    only the PDF requests reach the server
+  - expired pages (max_age 0): DOIs from the map, pages revalidated (304)
+Checks the request counts, the hit/miss statistics and that every PDF arrived.
+
+Usage: python benchmark_http_cache.py [--articles 40] [--workers 8] [--latency 0.05]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import download_reviews
+from download_reviews import download_all
+from http_cache import HttpCache
+from rate_limiter import HostRateLimiter
+from stand_in_server import StandInServer, make_articles
+
+
+def run(server, articles, workers, cache):
+    download_reviews.HTTP_CACHE = cache
+    server.reset_stats()
+    with tempfile.TemporaryDirectory() as out:
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            downloaded, failed = download_all(articles, out, workers=workers, delay=0)
+        elapsed = time.perf_counter() - t0
+    assert (downloaded, failed) == (len(articles), 0), (downloaded, failed)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds per request")
+    args = parser.parse_args()
+    download_reviews.RATE_LIMITER = HostRateLimiter(default_rate=None)
+    n = args.articles
+
+    with StandInServer(latency=args.latency) as server, tempfile.TemporaryDirectory() as cache_dir:
+        server.point(download_reviews)
+        articles = make_articles(server, n, size=20_000)
+        cache_path = os.path.join(cache_dir, 'cache.sqlite')
+        print(f"{n} articles, {args.latency * 1000:.0f} ms per request")
+        print(f"{'cache':<16}{'seconds':>9}{'requests':>10}{'doi.org':>9}{'304s':>6}  hits / misses")
+        results = {}
+        for name, max_age in (("cold", 3600), ("warm", 3600), ("pages expired", 0)):
+            with HttpCache(cache_path, max_age=max_age) as cache:
+                elapsed = run(server, articles, args.workers, cache)
+                # The stand-in's "doi.org" is 127.0.0.1, the publisher is localhost
+                doi_requests = len(server.host_times['127.0.0.1'])
+                results[name] = (server.requests, doi_requests, server.statuses[304], dict(cache.stats))
+                print(f"{name:<16}{elapsed:>9.2f}{server.requests:>10}{doi_requests:>9}"
+                      f"{server.statuses[304]:>6}  {cache.summary()}")
+        download_reviews.HTTP_CACHE = None
+
+    cold, warm, expired = results["cold"], results["warm"], results["pages expired"]
+    assert cold[3]['doi miss'] == n and warm[3]['doi hit'] == n and expired[3]['doi hit'] == n
+    assert warm[3]['page fresh'] == n and expired[3]['page revalidated'] == n
+    assert warm[1] == expired[1] == 0, "cached DOIs still went to the resolver"
+    assert expired[2] == n
+    print(f"warm cache: {cold[0]} -> {warm[0]} requests, no DOI resolutions or page fetches")
+
+
+if __name__ == '__main__':
+    main()
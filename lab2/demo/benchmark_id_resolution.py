@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark + check of the batch identifier lookup (id_resolver.py) against
+the local stand-in server, whose /s2/batch and /idconv routes answer in the
+formats of Semantic Scholar's paper/batch and NCBI's PMC ID converter.
+
+1. Downloads --articles review-list rows, a third each:
+   - paywalled at the publisher, open access copy known to Semantic Scholar
+   - paywalled at the publisher, in PubMed Central (the citation has a DOI only)
+   - PDF at the publisher
+   once article by article (a Semantic Scholar search per paywalled article)
+   and once with the batch lookup first. Compares the metadata requests and
+   checks that the batch run also finds the PubMed Central copies.
+2. Runs only the lookup for larger lists and checks that it takes
+   ceil(n / S2_BATCH_SIZE) + ceil(n / IDCONV_BATCH_SIZE) requests.
+
+Usage: python benchmark_id_resolution.py [--articles 60] [--workers 8] [--latency 0.05]
+"""
+
+import argparse
+import contextlib
+import io
+import math
+import tempfile
+import time
+
+import download_reviews
+from download_reviews import download_all
+from id_resolver import IDCONV_BATCH_SIZE, S2_BATCH_SIZE
+from rate_limiter import HostRateLimiter
+from stand_in_server import StandInServer, make_articles
+
+METADATA_ROUTES = ('s2', 'idconv')
+
+
+def run(server, articles, workers, resolve):
+    download_reviews.RESOLVED.clear()
+    server.reset_stats()
+    with tempfile.TemporaryDirectory() as out:
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            downloaded, failed = download_all(articles, out, workers=workers, delay=0, resolve=resolve)
+        elapsed = time.perf_counter() - t0
+    metadata = sum(server.route_counts[route] for route in METADATA_ROUTES)
+    return downloaded, metadata, server.requests, elapsed
+
+
+def lookup_only(server, n):
+    articles = make_articles(server, n, size=10)
+    download_reviews.RESOLVED.clear()
+    server.reset_stats()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        download_reviews.resolve_articles(articles)
+    elapsed = time.perf_counter() - t0
+    assert len(download_reviews.RESOLVED) == n
+    return server.requests, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=60)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds per request")
+    args = parser.parse_args()
+    download_reviews.RATE_LIMITER = HostRateLimiter(default_rate=None)
+    n = args.articles
+
+    with StandInServer(latency=args.latency) as server:
+        server.point(download_reviews)
+        articles = make_articles(server, n, size=20_000)
+        for i in range(n):
+            paper_id = f"{i:05d}"
+            if i % 3 == 0:
+                server.paywalled.add(paper_id)
+                server.open_access.add(paper_id)
+            elif i % 3 == 1:
+                server.paywalled.add(paper_id)
+                server.pmc.add(paper_id)
+        paywalled = len(server.paywalled)
+
+        print(f"{n} articles, {paywalled} paywalled at the publisher, {args.latency * 1000:.0f} ms per request")
+        print(f"{'lookup':<20}{'PDFs':>6}{'metadata requests':>19}{'requests':>10}{'seconds':>9}")
+        results = {}
+        for name, resolve in (("per article", False), ("batch", True)):
+            results[name] = run(server, articles, args.workers, resolve)
+            downloaded, metadata, requests, elapsed = results[name]
+            print(f"{name:<20}{downloaded:>6}{metadata:>19}{requests:>10}{elapsed:>9.2f}")
+
+        per_article, batch = results["per article"], results["batch"]
+        # Article by article, every paywalled article needs its own search, and
+        # the PubMed Central copies of DOI-only citations are never found
+        assert per_article[1] == paywalled, per_article
+        assert per_article[0] == n - len(server.pmc)
+        assert batch[1] == math.ceil(n / S2_BATCH_SIZE) + math.ceil(n / IDCONV_BATCH_SIZE), batch
+        assert batch[0] == n, batch
+        print(f"metadata requests {per_article[1]} -> {batch[1]}, PDFs {per_article[0]} -> {batch[0]}")
+
+        print(f"\n{'lookup only, ids':<20}{'requests':>10}{'seconds':>9}")
+        for size in (1_000, 5_000):
+            requests, elapsed = lookup_only(server, size)
+            print(f"{size:<20}{requests:>10}{elapsed:>9.2f}")
+            assert requests == math.ceil(size / S2_BATCH_SIZE) + math.ceil(size / IDCONV_BATCH_SIZE), requests
+        download_reviews.RESOLVED.clear()
+    print("batch lookup checks passed")
+
+
+if __name__ == '__main__':
+    main()
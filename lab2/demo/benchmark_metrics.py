@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Check of the download metrics (metrics.py) against the local stand-in server.
+
+Downloads --articles rows with a slow publisher (the 'article' routes on
+localhost get --slow seconds extra) and a few articles only available as
+open access copies, with the event log and the Prometheus endpoint on, then
+checks that
+  - the event log has one article event per article, and replaying it gives
+    the same totals as the live counters
+  - the PDF bytes counted equal the bytes the server sent
+  - the slow publisher host shows up with the higher latency
+  - strategy success rates match what was downloaded where
+  - /metrics serves a Prometheus text page with the same request counts
+  - a request that runs into its timeout is counted as a timeout
+and compares the run time with metrics off.
+
+Usage: python benchmark_metrics.py [--articles 40] [--workers 8] [--slow 0.2]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import tempfile
+import time
+
+import requests
+
+import download_reviews
+from download_reviews import download_all
+from metrics import LOG_NAME, Metrics
+from rate_limiter import HostRateLimiter
+from stand_in_server import StandInServer, make_articles
+
+
+def run(server, articles, workers, metrics):
+    download_reviews.METRICS = metrics
+    server.reset_stats()
+    with tempfile.TemporaryDirectory() as out:
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            downloaded, failed = download_all(articles, out, workers=workers, delay=0)
+        elapsed = time.perf_counter() - t0
+    download_reviews.METRICS = None
+    return downloaded, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--slow', type=float, default=0.2, help="extra seconds per publisher page request")
+    args = parser.parse_args()
+    download_reviews.RATE_LIMITER = HostRateLimiter(default_rate=None)
+    n = args.articles
+    n_open_access = max(1, n // 4)
+
+    with StandInServer(latency=0.01) as server, tempfile.TemporaryDirectory() as log_dir:
+        server.point(download_reviews)
+        articles = make_articles(server, n, size=100_000)
+        for i in range(n_open_access):
+            server.paywalled.add(f"{i:05d}")
+            server.open_access.add(f"{i:05d}")
+        server.delays['article'] = args.slow
+
+        downloaded, plain = run(server, articles, args.workers, None)
+        assert downloaded == n, downloaded
+
+        log_path = os.path.join(log_dir, LOG_NAME)
+        with Metrics(log_path) as metrics:
+            url = metrics.serve(0)
+            downloaded, timed = run(server, articles, args.workers, metrics)
+            served = server.requests
+            page = requests.get(f"{url}/metrics", timeout=5).text
+            summary = requests.get(f"{url}/", timeout=5).text
+
+            # A request that runs into its timeout
+            download_reviews.METRICS = metrics
+            server.delays['pubmed'] = 0.5
+            with contextlib.suppress(requests.exceptions.Timeout):
+                download_reviews.get_session().get(f"{server.url}/pubmed/1/", timeout=0.1)
+            download_reviews.METRICS = None
+            server.delays.pop('pubmed')
+
+        print(f"{n} articles ({n_open_access} only open access), publisher pages +{args.slow * 1000:.0f} ms")
+        print(f"metrics off {plain:.2f} s, on {timed:.2f} s")
+        print(summary)
+
+        with open(log_path, encoding='utf-8') as f:
+            events = [json.loads(line) for line in f]
+        replayed = Metrics.from_log(log_path)
+        articles_done = [e for e in events if e['event'] == 'article']
+        assert downloaded == n and len(articles_done) == n
+        assert replayed.articles == metrics.articles == {'downloaded': n}, metrics.articles
+        assert replayed.requests == metrics.requests and replayed.bytes == metrics.bytes
+        assert {e['source'] for e in articles_done} == {'DOI', 'Semantic Scholar'}
+
+        # Every PDF body byte the server sent was counted as a transfer
+        transferred = sum(e['bytes'] for e in events if e['event'] == 'transfer')
+        assert transferred == sum(len(server.papers[f"{i:05d}"]) for i in range(n)), transferred
+
+        # The slow publisher (localhost) is slower than the fast services (127.0.0.1)
+        slow, fast = metrics.latency['localhost'], metrics.latency['127.0.0.1']
+        assert slow.sum / slow.count > fast.sum / fast.count
+        assert summary.index('localhost') < summary.index('127.0.0.1'), "hosts not sorted by p95"
+
+        # Strategies: the DOI gets every article but the open access ones
+        assert metrics.strategies['DOI', 'downloaded'] == n - n_open_access
+        assert metrics.strategies['Semantic Scholar', 'downloaded'] == n_open_access
+        assert metrics.strategies['DOI', 'no pdf'] == n_open_access
+
+        # Prometheus page: request counters add up to the server's count
+        counted = sum(int(v) for v in re.findall(r'^download_requests_total\{.*\} (\d+)$', page, re.M))
+        assert counted == served, (counted, served)
+        assert '# TYPE download_request_seconds histogram' in page
+        assert re.search(r'download_request_seconds_bucket\{host="localhost",le="\+Inf"\} \d+', page)
+        assert metrics.timeouts['127.0.0.1'] == 1, metrics.timeouts
+    print("metrics checks passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark + check of PDF URL probing in download_from_doi against the local
+stand-in server.
+
+The stand-in publisher uses the 'full' layout: landing pages at /full/<id>,
+PDFs at /pdf/<id>, so the "+ .pdf" guess fails and only the "/full/ -> /pdf/"
+template works. It is slow to reject guessed URLs (every 404 takes
+--slow-404 seconds). The same articles are downloaded one at a time with:
+  - sequential probing, nothing remembered (how download_from_doi used to work)
+  - concurrent probing, nothing remembered
+  - concurrent probing with the per-publisher template memory
+Reports the time per article and the requests that reached the publisher,
+and checks that every PDF arrived.
+
+Usage: python benchmark_pdf_probing.py [--articles 20] [--slow-404 0.5]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import download_reviews
+from download_reviews import download_all, sanitize_filename
+from rate_limiter import HostRateLimiter
+from stand_in_server import StandInServer, make_articles
+
+remember_pdf_template = download_reviews.remember_pdf_template
+
+
+def run(server, articles, probe_workers, remember):
+    download_reviews.PROBE_WORKERS = probe_workers
+    download_reviews.remember_pdf_template = remember_pdf_template if remember else (lambda host, template: None)
+    download_reviews._template_wins.clear()
+    server.reset_stats()
+    with tempfile.TemporaryDirectory() as out:
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            downloaded, failed = download_all(articles, out, workers=1, delay=0)
+        elapsed = time.perf_counter() - t0
+        assert (downloaded, failed) == (len(articles), 0), (downloaded, failed)
+        for i, row in enumerate(articles):
+            with open(os.path.join(out, sanitize_filename(row['title']) + '.pdf'), 'rb') as f:
+                assert f.read() == server.papers[f"{i:05d}"], row['title']
+    # The stand-in publisher is reached as localhost
+    return elapsed / len(articles), len(server.host_times['localhost'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=20)
+    parser.add_argument('--slow-404', type=float, default=0.5, help="seconds the publisher takes to answer 404")
+    args = parser.parse_args()
+    download_reviews.RATE_LIMITER = HostRateLimiter(default_rate=None)
+
+    with StandInServer(latency=0.02) as server:
+        server.point(download_reviews)
+        server.landing = 'full'
+        server.slow_404 = args.slow_404
+        articles = make_articles(server, args.articles, size=50_000)
+        print(f"{args.articles} articles, publisher answers 404 after {args.slow_404} s")
+        print(f"{'probing':<34}{'s/article':>10}{'publisher requests':>20}")
+        results = {}
+        for name, workers, remember in (("sequential, nothing remembered", 1, False),
+                                        ("concurrent, nothing remembered", 8, False),
+                                        ("concurrent, templates remembered", 8, True)):
+            per_article, requests = run(server, articles, workers, remember)
+            results[name] = (per_article, requests)
+            print(f"{name:<34}{per_article:>10.3f}{requests:>20}")
+        download_reviews.PROBE_WORKERS = 8
+        download_reviews.remember_pdf_template = remember_pdf_template
+        download_reviews._template_wins.clear()
+
+    old = results["sequential, nothing remembered"]
+    new = results["concurrent, templates remembered"]
+    assert results["concurrent, nothing remembered"][0] < old[0]
+    # Only the first article probes; the others go straight to /pdf/<id>
+    assert new[1] <= 2 * args.articles + 3, new
+    print(f"{old[0] / new[0]:.1f}x faster per article, {old[1]} -> {new[1]} publisher requests, all PDFs intact")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Check + benchmark of the content-addressed PDF store (pdf_store.py).
+
+1. Against the local stand-in server, downloads a review list containing
+   - a paper listed twice under the same DOI (other title casing): the second
+     row is served from the store without any request
+   - a paper reachable under a second DOI (same PDF bytes): downloaded, then
+     recognised by its hash and stored once
+   - two different papers whose titles only differ after 200 characters:
+     both keep a readable file name
+   and checks the blobs, the readable names and their bytes.
+2. Creates --files empty files in one flat folder and in the sharded blob
+   layout, and times listing the folder a file is in and looking files up.
+
+Usage: python benchmark_pdf_store.py [--files 200000]
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import random
+import tempfile
+import time
+
+import download_reviews
+from download_reviews import download_all
+from pdf_store import PdfStore
+from rate_limiter import HostRateLimiter
+from stand_in_server import DOI_PREFIX, StandInServer, make_articles
+
+
+def row(title, paper_id):
+    return {'title': title, 'authors': 'Someone, A', 'journal': 'Trends Test', 'year': '2024',
+            'full_citation': f"Someone, A. {title}. Trends Test. https://doi.org/{DOI_PREFIX}{paper_id} (2024)."}
+
+
+def check_store(server):
+    articles = make_articles(server, 10, size=30_000)
+    # Same DOI, other title casing
+    articles.append(row(articles[0]['title'].upper(), '00000'))
+    # Same PDF under a second DOI
+    server.papers['00100'] = server.papers['00001']
+    articles.append(row("Stand-in review number 1, as reprinted", '00100'))
+    # Different papers, titles equal for their first 200 characters
+    long_title = "A very long review title " * 10
+    for paper_id, suffix in (('00200', 'part one'), ('00201', 'part two')):
+        server.add_paper(paper_id, 30_000)
+        articles.append(row(long_title + suffix, paper_id))
+
+    with tempfile.TemporaryDirectory() as out:
+        download_reviews.PDF_STORE = store = PdfStore(out)
+        try:
+            server.reset_stats()
+            with contextlib.redirect_stdout(io.StringIO()):
+                downloaded, failed = download_all(articles, out, workers=1, delay=0)
+            requests = server.requests
+            blobs, size, names = store.stats()
+            duplicates = store.duplicates
+            readable = sorted(name for name in os.listdir(out) if name.endswith('.pdf'))
+            unique = {hashlib.sha256(pdf).hexdigest() for pdf in server.papers.values()}
+            readable_hashes = set()
+            for name in readable:
+                with open(os.path.join(out, name), 'rb') as f:
+                    readable_hashes.add(hashlib.sha256(f.read()).hexdigest())
+            assert not store.verify()
+        finally:
+            store.close()
+            download_reviews.PDF_STORE = None
+
+    print(f"{len(articles)} rows -> {downloaded} PDFs, {blobs} blobs stored ({size / 1e6:.2f} MB), "
+          f"{duplicates} duplicate download, {requests} requests, {len(readable)} readable names")
+    assert (downloaded, failed) == (len(articles), 0), (downloaded, failed)
+    assert blobs == len(unique) == 12, blobs
+    assert duplicates == 1, duplicates
+    assert readable_hashes == unique
+    assert sum(name.startswith('A_very_long') for name in readable) == 2, readable
+
+
+def time_layouts(n):
+    names = [hashlib.sha256(str(i).encode()).hexdigest() + '.pdf' for i in range(n)]
+    sample = random.Random(0).sample(names, 1000)
+    print(f"\n{n} files{'create s':>14}{'list folder s':>15}{'1000 lookups s':>16}")
+    with tempfile.TemporaryDirectory() as root:
+        layouts = {
+            'flat': lambda name: os.path.join(root, 'flat', name),
+            'sharded': lambda name: os.path.join(root, 'sharded', name[:2], name[2:4], name),
+        }
+        for layout, path_of in layouts.items():
+            t0 = time.perf_counter()
+            made = set()
+            for name in names:
+                path = path_of(name)
+                folder = os.path.dirname(path)
+                if folder not in made:
+                    os.makedirs(folder, exist_ok=True)
+                    made.add(folder)
+                open(path, 'wb').close()
+            created = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            for name in sample[:20]:
+                os.listdir(os.path.dirname(path_of(name)))
+            listed = (time.perf_counter() - t0) / 20
+            t0 = time.perf_counter()
+            assert all(os.path.exists(path_of(name)) for name in sample)
+            looked_up = time.perf_counter() - t0
+            print(f"{layout:<12}{created:>14.2f}{listed:>15.5f}{looked_up:>16.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=200_000, help="files for the layout timing")
+    args = parser.parse_args()
+    download_reviews.RATE_LIMITER = HostRateLimiter(default_rate=None)
+
+    with StandInServer(latency=0.01) as server:
+        server.point(download_reviews)
+        check_store(server)
+    print("store checks passed")
+    time_layouts(args.files)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark + check of the streamed PDF download in download_reviews.py.
+
+Downloads --concurrent PDFs of --size bytes at the same time from the local
+stand-in server, once buffered in memory (response.content, then written out,
+as download_pdf used to) and once with download_pdf, which streams chunks to
+a temporary file. Reports the peak Python memory (tracemalloc) of each.
+
+Also checks that a response that is not a PDF (an HTML page served as
+application/pdf) is dropped and leaves neither a PDF nor a .part file behind.
+
+Usage: python benchmark_pdf_streaming.py [--concurrent 16] [--size 8000000]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import download_reviews
+from download_reviews import download_pdf, make_session
+from rate_limiter import HostRateLimiter
+from stand_in_server import StandInServer
+
+
+def buffered_download(url, pdf_file, session):
+    """The old download_pdf: whole body in memory, then written."""
+    response = session.get(url, stream=True, timeout=30)
+    if response.status_code == 200:
+        content = response.content
+        with open(pdf_file, 'wb') as f:
+            f.write(content)
+        return pdf_file
+    return None
+
+
+def run(server, download, ids, out):
+    session = make_session(pool_maxsize=len(ids))
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(ids)) as pool:
+        results = list(pool.map(
+            lambda i: download(f"{server.url}/article/pdf/{i}", os.path.join(out, f"{i}.pdf"), session), ids))
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    session.close()
+    for i, result in zip(ids, results):
+        assert result, i
+        with open(os.path.join(out, f"{i}.pdf"), 'rb') as f:
+            assert f.read() == server.papers[i], i
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrent', type=int, default=16)
+    parser.add_argument('--size', type=int, default=8_000_000, help="bytes per PDF")
+    args = parser.parse_args()
+    download_reviews.RATE_LIMITER = HostRateLimiter(default_rate=None)
+
+    with StandInServer(latency=0.01) as server, tempfile.TemporaryDirectory() as out:
+        ids = [f"{i:05d}" for i in range(args.concurrent)]
+        for paper_id in ids:
+            server.add_paper(paper_id, args.size)
+        print(f"{args.concurrent} concurrent downloads of {args.size / 1e6:.1f} MB")
+        print(f"{'download':<12}{'seconds':>9}{'peak MB':>10}")
+        peaks = {}
+        for name, download in (("buffered", buffered_download), ("streamed", download_pdf)):
+            elapsed, peak = run(server, download, ids, out)
+            peaks[name] = peak
+            print(f"{name:<12}{elapsed:>9.2f}{peak / 1e6:>10.1f}")
+        assert peaks["streamed"] < args.size, "streamed download held a whole PDF in memory"
+        print(f"peak memory: {peaks['buffered'] / peaks['streamed']:.0f}x lower when streamed")
+
+        # An HTML login page served as application/pdf must not end up as a PDF
+        server.papers['login'] = b"<html><body>Please sign in</body></html>" * 50_000
+        pdf_file = os.path.join(out, 'login.pdf')
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert download_pdf(f"{server.url}/article/pdf/login", pdf_file) is None
+        leftovers = [name for name in os.listdir(out) if name.endswith('.part')]
+        assert not os.path.exists(pdf_file) and not leftovers, leftovers
+        print("non-PDF response dropped, no partial files left")
+
+
+if __name__ == '__main__':
+    main()
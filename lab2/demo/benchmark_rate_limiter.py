@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the per-host rate limiter against a rate-limited stand-in server.
+
+The stand-in server allows each host (127.0.0.1 for "doi.org", localhost for
+the "publisher") --server-rate requests per second and answers 429 with
+Retry-After: 1 beyond that. The same article list is downloaded with:
+  - no client-side limit: the server has to push back with 429s
+  - one shared bucket for all hosts: the old global throttle, no 429s but
+    the two hosts take turns
+  - a bucket per host: both hosts busy at their own rate, no 429s
+Every run must end with all PDFs downloaded.
+
+Usage: python benchmark_rate_limiter.py [--articles 40] [--workers 16] [--server-rate 20]
+"""
+
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+
+import download_reviews
+from download_reviews import download_all
+from rate_limiter import HostRateLimiter
+from stand_in_server import StandInServer, make_articles
+
+
+class SharedRateLimiter(HostRateLimiter):
+    """Every host draws from one bucket (a global throttle)."""
+
+    def acquire(self, host):
+        return super().acquire('*')
+
+    def pause(self, host, seconds):
+        super().pause('*', seconds)
+
+
+def run(server, articles, workers, limiter):
+    download_reviews.RATE_LIMITER = limiter
+    server.reset_stats()
+    with tempfile.TemporaryDirectory() as out:
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            downloaded, failed = download_all(articles, out, workers=workers, delay=0)
+        elapsed = time.perf_counter() - t0
+    assert (downloaded, failed) == (len(articles), 0), (downloaded, failed)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--server-rate', type=float, default=20, help="requests/s the server allows per host")
+    args = parser.parse_args()
+    rate = args.server_rate
+
+    with StandInServer(latency=0.02, host_rate=rate) as server:
+        server.point(download_reviews)
+        articles = make_articles(server, args.articles, size=20_000)
+        runs = [
+            ("no client limit", HostRateLimiter(default_rate=None)),
+            ("one global bucket", SharedRateLimiter(default_rate=rate * 0.9, default_burst=1)),
+            ("bucket per host", HostRateLimiter(default_rate=rate * 0.9, default_burst=1)),
+        ]
+        print(f"{args.articles} articles, {args.workers} workers, server allows {rate:.0f} req/s per host")
+        print(f"{'client limiter':<20}{'seconds':>9}{'429s':>7}{'peak req/s 127.0.0.1':>22}{'localhost':>11}")
+        results = {}
+        for name, limiter in runs:
+            elapsed = run(server, articles, args.workers, limiter)
+            results[name] = (elapsed, server.statuses[429])
+            print(f"{name:<20}{elapsed:>9.2f}{server.statuses[429]:>7}"
+                  f"{server.peak_rate('127.0.0.1'):>22.0f}{server.peak_rate('localhost'):>11.0f}")
+
+    assert results["bucket per host"][1] == 0, "per-host limiter still got 429s"
+    assert results["bucket per host"][0] < results["one global bucket"][0]
+    print(f"per-host vs global bucket: {results['one global bucket'][0] / results['bucket per host'][0]:.1f}x faster, "
+          f"no 429s")
+
+
+if __name__ == '__main__':
+    main()
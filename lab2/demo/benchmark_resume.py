@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Check of resumable download runs (job ledger + HTTP Range) against the local
+stand-in server.
+
+--articles review-list rows: a few have no PDF anywhere (paywalled), and for
+a few others the first PDF transfer is cut off halfway (failed). Runs:
+  1. first run: everything is tried once, outcomes go to the ledger
+  2. rerun straight away: the failures are still in their backoff, nothing to do
+  3. rerun after the backoff: only the failures are retried, and their PDFs
+     continue from the .part file with a Range request
+  4. rerun: nothing left to do
+  5. without the ledger (--no-ledger): every article is fetched again
+Checks the ledger states, that every PDF is intact and that the resumed
+transfers only sent the missing half.
+
+Usage: python benchmark_resume.py [--articles 40] [--workers 8]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import download_reviews
+from download_reviews import download_all, sanitize_filename
+from job_ledger import JobLedger
+from rate_limiter import HostRateLimiter
+from stand_in_server import StandInServer, make_articles
+
+
+def run(server, articles, out, workers, ledger):
+    server.reset_stats()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        downloaded, failed = download_all(articles, out, workers=workers, delay=0, ledger=ledger)
+    return downloaded + failed, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+    download_reviews.RATE_LIMITER = HostRateLimiter(default_rate=None)
+    n_paywalled = n_cut = max(1, args.articles // 8)
+
+    with StandInServer(latency=0.01) as server, tempfile.TemporaryDirectory() as out:
+        server.point(download_reviews)
+        articles = make_articles(server, args.articles, size=1_000_000)
+        paper_ids = [f"{i:05d}" for i in range(args.articles)]
+        paywalled = paper_ids[:n_paywalled]
+        cut = paper_ids[n_paywalled:n_paywalled + n_cut]
+        for paper_id in paywalled:
+            del server.papers[paper_id]
+        for paper_id in cut:
+            server.interrupt[paper_id] = 1
+        ledger_path = os.path.join(out, 'ledger.sqlite')
+
+        print(f"{args.articles} articles: {n_paywalled} without a PDF, {n_cut} cut off on the first try")
+        print(f"{'run':<28}{'processed':>10}{'requests':>10}{'body MB':>9}{'206s':>6}{'seconds':>9}")
+        runs = [("1 first run", 60), ("2 rerun, in backoff", 60), ("3 rerun after backoff", 0),
+                ("4 rerun", 0), ("5 rerun without ledger", None)]
+        for name, backoff in runs:
+            ledger = None if backoff is None else JobLedger(ledger_path, backoff=backoff)
+            processed, elapsed = run(server, articles, out, args.workers, ledger)
+            print(f"{name:<28}{processed:>10}{server.requests:>10}{server.bytes_sent / 1e6:>9.1f}"
+                  f"{server.statuses[206]:>6}{elapsed:>9.2f}")
+            if name.startswith("1"):
+                assert ledger.counts() == {'pending': 0, 'downloaded': args.articles - n_paywalled - n_cut,
+                                           'paywalled': n_paywalled, 'failed': n_cut}, ledger.counts()
+                assert all(os.path.exists(os.path.join(out, sanitize_filename(articles[int(i)]['title']) + '.pdf.part'))
+                           for i in cut)
+            elif name.startswith("2") or name.startswith("4"):
+                assert processed == 0 and server.requests == 0
+            elif name.startswith("3"):
+                assert processed == n_cut and server.statuses[206] == n_cut
+                # Only about the missing halves of the cut PDFs were sent again (the
+                # client loses the chunk it was reading when the connection broke)
+                assert server.bytes_sent < n_cut * 0.6 * len(server.papers[cut[0]]), server.bytes_sent
+                assert ledger.counts()['downloaded'] == args.articles - n_paywalled
+            if ledger:
+                ledger.close()
+
+        for i, row in enumerate(articles):
+            path = os.path.join(out, sanitize_filename(row['title']) + '.pdf')
+            if f"{i:05d}" in paywalled:
+                assert not os.path.exists(path), path
+            else:
+                with open(path, 'rb') as f:
+                    assert f.read() == server.papers[f"{i:05d}"], row['title']
+        assert not [name for name in os.listdir(out) if '.part' in name]
+        print("ledger states right, all PDFs intact, no .part files left")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Benchmark + check of the distributed work queue (work_queue.py, --queue)
+against the local stand-in server.
+
+1. Scaling: --articles jobs in one queue file, drained by 1, 2 and 4 worker
+   processes. Every process keeps to its own politeness budget (--rate
+   requests per second per host, like one machine with one IP), so the
+   throughput grows with the number of processes. Checks that every job was
+   done exactly once, the manifest lists all of them, and the PDFs are intact.
+2. Crash: a worker process claims jobs, keeps their leases alive with its
+   heartbeat while the publisher hangs, and is then killed (SIGKILL). A
+   second worker takes over the jobs once their leases run out.
+3. Shared lookup: 4 worker processes starting together do the batch lookup
+   of the queue's DOIs once between them, not once each. While one worker
+   is on a slow lookup, the others' claims and heartbeats go through at once,
+   and a lookup whose worker died is taken over when its mark runs out.
+4. Errors: a job whose outcome can't be recorded is failed and retried, and
+   the worker thread goes on with the next jobs.
+
+Usage: python benchmark_work_queue.py [--articles 80] [--rate 20] [--threads 4]
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import types
+
+from stand_in_server import StandInServer, make_articles
+
+LEASE = 1.0  # seconds, for the crash check
+
+
+def worker_process(queue_path, out, urls, rate, threads, lease, ready, start, resolve=False):
+    """One queue worker, as a separate process would run download_reviews.py --queue."""
+    import download_reviews
+    from rate_limiter import HostRateLimiter
+    from work_queue import WorkQueue
+
+    for name, url in urls.items():
+        setattr(download_reviews, name, url)
+    download_reviews.RATE_LIMITER = HostRateLimiter(default_rate=rate, default_burst=2)
+    with WorkQueue(queue_path, lease=lease) as queue, contextlib.redirect_stdout(io.StringIO()):
+        ready.set()
+        start.wait()
+        download_reviews.work_from_queue(queue, out, workers=threads, poll=0.1, resolve=resolve)
+
+
+def start_workers(ctx, n, queue_path, out, urls, rate, threads, lease, resolve=False):
+    start = ctx.Event()
+    processes = []
+    for _ in range(n):
+        ready = ctx.Event()
+        p = ctx.Process(target=worker_process,
+                        args=(queue_path, out, urls, rate, threads, lease, ready, start, resolve))
+        p.start()
+        ready.wait(60)
+        processes.append(p)
+    return processes, start
+
+
+def service_urls(server):
+    target = types.SimpleNamespace()
+    server.point(target)
+    return vars(target)
+
+
+def check_scaling(ctx, server, n, rate, threads):
+    from work_queue import WorkQueue
+
+    articles = make_articles(server, n, size=50_000)
+    urls = service_urls(server)
+    print(f"{n} jobs, each worker process {threads} threads and {rate:g} requests/s per host")
+    print(f"{'processes':<12}{'seconds':>9}{'articles/s':>12}{'workers seen':>14}")
+    rates = {}
+    for n_processes in (1, 2, 4):
+        with tempfile.TemporaryDirectory() as out:
+            queue_path = os.path.join(out, 'queue.sqlite')
+            with WorkQueue(queue_path) as queue:
+                queue.enqueue(articles)
+            processes, start = start_workers(ctx, n_processes, queue_path, out, urls, rate, threads, 30)
+            t0 = time.perf_counter()
+            start.set()
+            for p in processes:
+                p.join()
+            elapsed = time.perf_counter() - t0
+            with WorkQueue(queue_path) as queue:
+                assert queue.counts()['downloaded'] == n, queue.counts()
+                manifest = os.path.join(out, 'manifest.csv')
+                queue.write_manifest(manifest)
+            with open(manifest, newline='', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+            assert len(rows) == n and {r['attempts'] for r in rows} == {'1'}, "a job was done twice"
+            for row in rows:
+                paper_id = row['title'].rsplit(' ', 1)[1].zfill(5)
+                with open(os.path.join(out, row['pdf_file']), 'rb') as f:
+                    assert f.read() == server.papers[paper_id], row['title']
+            workers = {r['worker'] for r in rows}
+            rates[n_processes] = n / elapsed
+            print(f"{n_processes:<12}{elapsed:>9.2f}{n / elapsed:>12.1f}{len(workers):>14}")
+            assert len(workers) == n_processes
+    assert rates[4] > 2.5 * rates[1], rates
+    print(f"4 processes: {rates[4] / rates[1]:.1f}x the articles per second of one")
+
+
+def check_crash(ctx, server, threads):
+    from work_queue import WorkQueue
+
+    articles = make_articles(server, 3 * threads, size=50_000)
+    urls = service_urls(server)
+    with tempfile.TemporaryDirectory() as out:
+        queue_path = os.path.join(out, 'queue.sqlite')
+        with WorkQueue(queue_path, lease=LEASE) as queue:
+            queue.enqueue(articles)
+        conn = sqlite3.connect(queue_path)
+
+        # Worker A claims jobs and hangs on the publisher
+        server.delays['article'] = 30
+        (a,), start = start_workers(ctx, 1, queue_path, out, urls, None, threads, LEASE)
+        start.set()
+        deadline = time.monotonic() + 10
+        while conn.execute("SELECT COUNT(*) FROM jobs WHERE state = 'leased'").fetchone()[0] < threads:
+            assert time.monotonic() < deadline, "worker A claimed nothing"
+            time.sleep(0.05)
+        time.sleep(3 * LEASE)
+        # Its heartbeat kept its leases alive well past LEASE
+        leased = conn.execute("SELECT key, lease_until FROM jobs WHERE state = 'leased'").fetchall()
+        assert len(leased) == threads and all(until > time.time() for _, until in leased), leased
+        a.kill()
+        a.join()
+        server.delays.pop('article')
+
+        # Worker B gets A's jobs once their leases expire
+        t0 = time.perf_counter()
+        (b,), start = start_workers(ctx, 1, queue_path, out, urls, None, threads, LEASE)
+        start.set()
+        b.join()
+        elapsed = time.perf_counter() - t0
+        with WorkQueue(queue_path) as queue:
+            counts = queue.counts()
+        attempts = dict(conn.execute("SELECT key, attempts FROM jobs"))
+        workers = {w for (w,) in conn.execute("SELECT DISTINCT worker FROM jobs")}
+        conn.close()
+    print(f"\ncrash: worker A killed holding {len(leased)} leases; worker B finished all "
+          f"{len(articles)} jobs in {elapsed:.2f} s")
+    assert counts['downloaded'] == len(articles), counts
+    assert all(attempts[key] == 2 for key, _ in leased), "A's jobs were not handed over"
+    assert sum(attempts.values()) == len(articles) + threads
+    assert len(workers) == 1, workers
+
+
+def check_shared_lookup(ctx, server, n, threads):
+    from work_queue import WorkQueue
+
+    articles = make_articles(server, n, size=20_000)
+    urls = service_urls(server)
+    with tempfile.TemporaryDirectory() as out:
+        queue_path = os.path.join(out, 'queue.sqlite')
+        with WorkQueue(queue_path) as queue:
+            queue.enqueue(articles)
+        server.reset_stats()
+        processes, start = start_workers(ctx, 4, queue_path, out, urls, None, threads, 30, resolve=True)
+        start.set()
+        for p in processes:
+            p.join()
+        with WorkQueue(queue_path) as queue:
+            assert queue.counts()['downloaded'] == n, queue.counts()
+    lookups = server.route_counts['idconv']
+    print(f"\nshared lookup: 4 processes, {n} jobs, {lookups} ID converter request(s)")
+    assert lookups == 1, server.route_counts
+
+
+def check_lookup_lock(server):
+    from work_queue import WorkQueue
+
+    articles = make_articles(server, 20, size=1_000)
+    with tempfile.TemporaryDirectory() as out:
+        queue_path = os.path.join(out, 'queue.sqlite')
+        with WorkQueue(queue_path, lease=LEASE) as a, WorkQueue(queue_path, lease=LEASE) as b:
+            a.enqueue(articles)
+            looked_up = []
+
+            def slow_lookup(rows):
+                looked_up.append(len(rows))
+                time.sleep(3 * LEASE)
+                return {}
+
+            lookup = threading.Thread(target=a.shared_lookup, args=(slow_lookup, 'a', 0.05))
+            lookup.start()
+            while not looked_up:
+                time.sleep(0.01)
+            t0 = time.perf_counter()
+            b.heartbeat('b')
+            job = b.claim('b')
+            blocked = time.perf_counter() - t0
+            lookup.join()
+            assert job is not None and blocked < 0.5, (job, blocked)
+
+            # A lookup mark whose worker died runs out and another worker takes the chunk over
+            a._execute("UPDATE jobs SET looked_up = 0, lookup_by = 'dead', lookup_until = ?",
+                        (time.time() + LEASE,))
+            looked_up.clear()
+            t0 = time.perf_counter()
+            b.shared_lookup(lambda rows: looked_up.append(len(rows)) or {}, 'b', 0.05)
+            waited = time.perf_counter() - t0
+    print(f"lookup lock: a claim and a heartbeat during a {3 * LEASE:.0f} s lookup took {blocked * 1000:.0f} ms; "
+          f"a dead worker's lookup was taken over after {waited:.2f} s")
+    assert looked_up == [len(articles)] and LEASE * 0.9 < waited < LEASE + 1, (looked_up, waited)
+
+
+def check_job_error(server, threads):
+    import download_reviews
+    from work_queue import WorkQueue
+
+    articles = make_articles(server, 4 * threads, size=20_000)
+    server.point(download_reviews)
+    with tempfile.TemporaryDirectory() as out:
+        with WorkQueue(os.path.join(out, 'queue.sqlite'), backoff=0) as queue:
+            queue.enqueue(articles)
+            complete, broken = queue.complete, []
+
+            def complete_once_broken(key, *args, **kwargs):
+                if not broken:
+                    broken.append(key)
+                    raise RuntimeError("disk full")
+                return complete(key, *args, **kwargs)
+
+            queue.complete = complete_once_broken
+            with contextlib.redirect_stdout(io.StringIO()):
+                download_reviews.work_from_queue(queue, out, workers=threads, poll=0.1)
+            counts = queue.counts()
+            [(attempts,)] = queue._execute("SELECT attempts FROM jobs WHERE key = ?", (broken[0],))
+    print(f"errors: a job whose outcome could not be recorded was retried; "
+          f"all {len(articles)} jobs downloaded")
+    assert counts['downloaded'] == len(articles) and attempts == 2, (counts, attempts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=80)
+    parser.add_argument('--rate', type=float, default=20, help="requests per second per host, per worker process")
+    parser.add_argument('--threads', type=int, default=4, help="worker threads per process")
+    args = parser.parse_args()
+    ctx = multiprocessing.get_context('spawn')
+
+    with StandInServer(latency=0.01) as server:
+        check_scaling(ctx, server, args.articles, args.rate, args.threads)
+        check_crash(ctx, server, args.threads)
+        check_shared_lookup(ctx, server, args.articles, args.threads)
+        check_lookup_lock(server)
+        check_job_error(server, args.threads)
+    print("work queue checks passed")
+
+
+if __name__ == '__main__':
+    main()
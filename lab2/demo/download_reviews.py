@@ -6,14 +6,96 @@ Web Crawler for Downloading Review Article Full Texts
 This script reads a CSV file of review articles and attempts to download
 full texts from various sources including DOI links, PubMed Central, and
 publisher websites.
+
+Articles are downloaded by a pool of worker threads (--workers, default
+MAX_WORKERS), so many articles are in flight at once instead of one after
+another. Politeness is per host: every request waits for its host's token
+bucket (HOST_RATES, --host-rate), so different hosts are fetched in parallel
+while none of them sees more than its own rate, and 429 / Retry-After answers
+hold back further requests to that host. All strategies and workers share
+one pooled keep-alive session (get_session), so hosts that were contacted
+before cost no new TCP/TLS handshake. PDFs are streamed to a .part file in
+chunks and renamed into place once complete, so memory per download stays at
+one chunk and a failed download never leaves a partial PDF behind.
+
+Runs are resumable: a job ledger in the output folder (job_ledger.py) records
+each article as downloaded, paywalled or failed, so a rerun after a crash or
+Ctrl-C skips finished articles and retries failures once their backoff has
+passed. A PDF cut off by a network error is continued with an HTTP Range
+request instead of being fetched again from the start. An HTTP cache in the
+output folder (http_cache.py) remembers where every DOI resolved to and keeps
+the landing pages, so repeated runs skip doi.org and the page downloads.
+On a publisher page the guessed PDF URLs (PDF_URL_TEMPLATES) and the page's
+PDF links are probed concurrently; the template that worked is remembered
+per publisher host (in the cache too), and later articles from that
+publisher go straight to it.
+
+PDFs go into a content-addressed store (pdf_store.py): each PDF is kept once,
+named by its sha256 in a sharded folder tree, and Reviews/<title>.pdf is a
+hard link to it. An article whose DOI is already in the store is not
+downloaded again, and a download whose bytes are already stored (the same
+paper under another title or DOI) is recognised by its hash and dropped.
+
+By default the strategies (DOI, PubMed, Semantic Scholar) are tried one after
+another. With --hedge they race: the next strategy starts after a short
+stagger (or as soon as the running ones have failed), the first PDF wins and
+the others are cancelled, so a slow or dead source no longer delays an
+article that another source has.
+
+Before the downloads start, the DOIs and PubMed IDs of the whole list are
+looked up in batches (id_resolver.py: Semantic Scholar's paper/batch and
+NCBI's PMC ID converter, hundreds of IDs per request), which gives the open
+access PDFs and PMC IDs without a Semantic Scholar search per article
+(--no-batch-lookup: search per article as before).
+
+Every request, PDF transfer, strategy attempt and article outcome goes to a
+JSON-lines event log in the output folder (metrics.py); the run ends with
+latency, throughput and timeouts per host and the success rate of each
+strategy, and --metrics-port serves the same live in Prometheus format.
+
+Timeouts adapt to each host: once a host has answered often enough, its
+requests wait a few times its usual (95th percentile) latency instead of the
+fixed 30 s, and a host that keeps failing (timeouts, connection errors, 5xx)
+is left alone for a while by a circuit breaker (host_health.py), so one sick
+publisher or API cannot stall the whole run.
+
+With --queue PATH the run becomes one worker of many: any number of
+processes, on this machine or others (each with its own IP and its own
+politeness budget), pull article jobs from one shared SQLite queue
+(work_queue.py). Jobs are leased and the leases renewed by a heartbeat, so
+the jobs of a worker that crashes go back to the others, and every worker
+writes the outcome of all jobs to one manifest.csv.
+
+    python download_reviews.py [review_articles.csv] [Reviews/] [--workers 16]
+    python download_reviews.py review_articles.csv Reviews/ --retry-paywalled
+    python download_reviews.py review_articles.csv Reviews/ --hedge 1.5
+    python download_reviews.py review_articles.csv Reviews/ --metrics-port 9108
+    python download_reviews.py review_articles.csv Reviews/ --queue /shared/reviews_queue.sqlite
+    python download_reviews.py --host-rate www.nature.com=0.5 --default-rate 2
 """
 
+import argparse
 import os
 import csv
+import queue
 import re
+import socket
+import sqlite3
+import threading
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
 from urllib.parse import urlparse, unquote
+
+from host_health import HostHealth, HostUnavailable
+from http_cache import HttpCache
+from id_resolver import resolve_identifiers
+from metrics import LOG_NAME as METRICS_LOG_NAME, Metrics
+from job_ledger import JobLedger, article_key
+from pdf_store import PdfStore, doi_key
+from rate_limiter import HostRateLimiter, parse_retry_after
+from work_queue import LEASE as QUEUE_LEASE, WorkQueue
 from pathlib import Path
 import json
 import sys
@@ -27,10 +109,72 @@ except ImportError:
     print("Warning: BeautifulSoup4 not installed. Some PDF link extraction features may be limited.")
     print("Install with: pip install beautifulsoup4")
 
+# pyarrow is only needed to read columnar (.arrow/.feather/.parquet) input
+try:
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
 # Configuration
 INPUT_CSV = "/Users/simonwang/Documents/Usage/AIagent4bio/lab2/data/review_articles.csv"
 OUTPUT_DIR = "/Users/simonwang/Documents/Usage/AIagent4bio/lab2/demo/Reviews"
-DELAY_BETWEEN_REQUESTS = 2  # seconds to wait between requests
+DELAY_BETWEEN_REQUESTS = 0  # extra seconds each worker waits between articles (HOST_RATES does the throttling)
+MAX_WORKERS = 8  # articles downloaded at the same time
+HEDGE_STAGGER = None  # seconds between starting racing strategies (--hedge); None tries them in turn
+DEFAULT_HEDGE_STAGGER = 2.0  # --hedge without a value
+
+# Requests per second and burst size allowed per host; other hosts (publishers)
+# get DEFAULT_HOST_RATE
+HOST_RATES = {
+    'doi.org': (5, 5),
+    'www.ncbi.nlm.nih.gov': (3, 3),  # NCBI's limit without an API key
+    'pubmed.ncbi.nlm.nih.gov': (3, 3),
+    'api.semanticscholar.org': (1, 1),
+}
+DEFAULT_HOST_RATE = (1, 2)
+# Connection pool of the shared session: hosts kept, and connections kept per
+# host (main() raises the latter to --workers so no worker has to reconnect)
+POOL_CONNECTIONS = 64
+POOL_MAXSIZE = MAX_WORKERS
+PDF_CHUNK_SIZE = 64 * 1024  # bytes read from the network and written to disk at a time
+PDF_SNIFF_BYTES = 1024  # the %PDF header must start within this many bytes
+
+# Where publishers put the PDF of a landing page URL: (template name, guess)
+PDF_URL_TEMPLATES = [
+    ('/article/ -> /article/pdf/', lambda url: url.replace('/article/', '/article/pdf/')),
+    ('/abs/ -> /pdf/', lambda url: url.replace('/abs/', '/pdf/')),
+    ('+ .pdf', lambda url: url + '.pdf'),
+    ('/full/ -> /pdf/', lambda url: url.replace('/full/', '/pdf/')),
+]
+PAGE_LINK = 'link on the page'  # template name of a PDF link found in the landing page HTML
+MAX_PAGE_LINKS = 8  # PDF links of a page probed at most
+PROBE_WORKERS = 8  # candidate URLs of one article probed at the same time
+MAX_RETRIES = 3  # times a request answered with 429 (or 503 + Retry-After) is retried
+RETRY_BACKOFF = 5  # seconds to wait after a 429 without Retry-After, doubled on every retry
+MAX_RETRY_AFTER = 120  # give up on a request instead of waiting longer than this
+RATE_LIMITER = HostRateLimiter(*DEFAULT_HOST_RATE, HOST_RATES)
+HOST_HEALTH = HostHealth()  # adaptive timeouts + circuit breakers per host (host_health.py)
+HTTP_CACHE = None  # HttpCache of DOI targets and landing pages; main() opens one in the output folder
+PDF_STORE = None  # PdfStore the PDFs are filed in; main() opens one in the output folder (--no-store: plain files)
+METRICS = None  # Metrics (metrics.py) of requests, strategies and articles; main() logs to the output folder
+MANIFEST_NAME = 'manifest.csv'  # outcome of every job of a --queue run, written to the output folder
+QUEUE_POLL = 5.0  # seconds a queue worker with nothing to claim waits for other workers' leases
+RESOLVED = {}  # 'doi:...' / 'pmid:...' -> what the batch lookup found (id_resolver.py); see resolve_articles
+
+# Services the downloader talks to (benchmark_downloader.py points these at a local server)
+DOI_RESOLVER = "https://doi.org"
+PMC_ARTICLES_URL = "https://www.ncbi.nlm.nih.gov/pmc/articles"
+PUBMED_URL = "https://pubmed.ncbi.nlm.nih.gov"
+SEMANTIC_SCHOLAR_SEARCH_URL = "https://api.semanticscholar.org/graph/v1/paper/search"
+SEMANTIC_SCHOLAR_BATCH_URL = "https://api.semanticscholar.org/graph/v1/paper/batch"
+PMC_IDCONV_URL = "https://www.ncbi.nlm.nih.gov/pmc/utils/idconv/v1.0/"
+
+# Columns process_article uses; columnar input is read with only these
+ARTICLE_COLUMNS = ['title', 'authors', 'full_citation', 'journal', 'year']
+# Other names of those columns: lab1/practice/extract_review_references.py calls the citation raw_reference
+COLUMN_ALIASES = {'full_citation': 'raw_reference'}
 
 # Headers to mimic a browser
 HEADERS = {
@@ -41,6 +185,188 @@ HEADERS = {
     'Connection': 'keep-alive',
 }
 
+# Messages of the article a worker is processing are collected and printed in
+# one block when it is done, so parallel downloads don't interleave their output
+_log_state = threading.local()
+_print_lock = threading.Lock()
+
+def log(*args):
+    """print(), or buffer the message if this thread is processing an article."""
+    lines = getattr(_log_state, 'lines', None)
+    if lines is None:
+        print(*args)
+    else:
+        lines.append(' '.join(str(a) for a in args))
+
+class Cancelled(Exception):
+    """Raised in a racing strategy once another strategy has got the PDF."""
+
+def check_cancelled():
+    """Raise Cancelled if this thread runs a strategy whose race is already won."""
+    cancel = getattr(_log_state, 'cancel', None)
+    if cancel is not None and cancel.is_set():
+        raise Cancelled("another strategy got the PDF first")
+
+def note_error(message):
+    """log() an error and keep it as the article's last error; an article
+    that ends without a PDF but with an error is retried by the next run."""
+    log(message)
+    _log_state.error = message.strip()
+
+# The caller's timeout while a send() follows redirects, for the hops' own send()
+_send_state = threading.local()
+
+class PoliteSession(requests.Session):
+    """
+    Session that sends every request, redirect hops included, through the
+    per-host rate limiter, and waits out 429 / 503 answers that carry
+    Retry-After (pausing the whole host) before retrying. The timeout of each
+    request is adapted to its host's latency, and hosts whose circuit breaker
+    is open are not contacted at all (HOST_HEALTH).
+    """
+
+    def send(self, request, **kwargs):
+        host = urlparse(request.url).hostname or ''
+        # Redirect hops arrive with the first hop's adapted timeout; they adapt
+        # the caller's own timeout to their host instead
+        outer = getattr(_send_state, 'timeout', None)
+        timeout = kwargs.pop('timeout', None)
+        if outer is not None:
+            timeout = outer[0]
+        for attempt in range(MAX_RETRIES + 1):
+            check_cancelled()
+            # Raises HostUnavailable (a ConnectionError) while the host's circuit is open
+            adapted, trial = HOST_HEALTH.before(host, timeout)
+            RATE_LIMITER.acquire(host)
+            started = time.perf_counter()
+            _send_state.timeout = (timeout,)
+            try:
+                response = super().send(request, timeout=adapted, **kwargs)
+            except requests.exceptions.RequestException as e:
+                if getattr(e, 'host_counted', False) or isinstance(e, HostUnavailable):
+                    # A redirect hop failed (and was counted for the hop's host
+                    # already, or contacted nobody): host itself did answer
+                    note_host_success(host)
+                else:
+                    e.host_counted = True
+                    timed_out = isinstance(e, requests.exceptions.Timeout)
+                    if METRICS:
+                        METRICS.request(host, 'timeout' if timed_out else 'error', time.perf_counter() - started)
+                    note_host_failure(host, trial, adapted if timed_out else None)
+                raise
+            except BaseException:
+                # Cancelled (or anything else) mid-request: the next request is the trial
+                if trial:
+                    HOST_HEALTH.abort_trial(host)
+                raise
+            finally:
+                _send_state.timeout = outer
+            if METRICS:
+                record_request(host, response, kwargs.get('stream'), time.perf_counter() - started)
+            first = response.history[0] if response.history else response
+            if first.status_code >= 500:
+                note_host_failure(host, trial)
+            else:
+                note_host_success(host, first.elapsed.total_seconds())
+            # Redirect hops went through send() themselves and did their own retries
+            if response.history or response.status_code not in (429, 503) or attempt == MAX_RETRIES:
+                return response
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is None:
+                if response.status_code == 503:
+                    return response
+                retry_after = RETRY_BACKOFF * 2 ** attempt
+            if retry_after > MAX_RETRY_AFTER:
+                return response
+            log(f"    {host} answered {response.status_code}, retrying in {retry_after:.1f}s")
+            RATE_LIMITER.pause(host, retry_after)
+            response.close()
+
+def note_host_failure(host, trial, timed_out_after=None):
+    """Count a failed request to host in HOST_HEALTH; say so if it opened the host's circuit."""
+    cooldown = HOST_HEALTH.failure(host, trial, timed_out_after)
+    if cooldown:
+        log(f"    {host} keeps failing; not contacted for {cooldown:.0f}s")
+        if METRICS:
+            METRICS.breaker(host, 'opened')
+
+def note_host_success(host, seconds=None):
+    """Count an answer of host in HOST_HEALTH; say so if it closed the host's circuit."""
+    if HOST_HEALTH.success(host, seconds):
+        log(f"    {host} answers again")
+        if METRICS:
+            METRICS.breaker(host, 'closed')
+
+def record_request(host, response, stream, total_seconds):
+    """Count a response in METRICS; latency is the time to its headers."""
+    if response.history:
+        # Only the first hop: the later ones went through send() themselves
+        first = response.history[0]
+        METRICS.request(host, first.status_code, first.elapsed.total_seconds())
+    elif stream:
+        # The body is read later (download_pdf reports it as a transfer)
+        METRICS.request(host, response.status_code, response.elapsed.total_seconds())
+    else:
+        METRICS.request(host, response.status_code, response.elapsed.total_seconds(),
+                        len(response.content), total_seconds)
+
+def make_session(headers=HEADERS, pool_maxsize=None):
+    session = PoliteSession()
+    session.headers.update(headers)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_CONNECTIONS,
+                                            pool_maxsize=pool_maxsize or POOL_MAXSIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+# One session for every strategy and every worker thread: its connection pool
+# keeps the connections to doi.org, NCBI and the publishers alive between articles
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """The shared session, created on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+def reset_session(pool_maxsize=None):
+    """Close the shared session; the next get_session() opens a new one with this pool size."""
+    global _session, POOL_MAXSIZE
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        if pool_maxsize:
+            POOL_MAXSIZE = pool_maxsize
+
+def get_page(session, url, **kwargs):
+    """GET a landing page, through HTTP_CACHE when there is one."""
+    if HTTP_CACHE is None:
+        return session.get(url, **kwargs)
+    return HTTP_CACHE.get(session, url, **kwargs)
+
+# PDF URL templates that worked, per publisher host. Loaded from HTTP_CACHE
+# (which keeps them across runs) the first time a host comes up.
+_template_wins = {}
+_template_lock = threading.Lock()
+
+def pdf_template_wins(host):
+    """template name -> how often it gave the PDF on this host."""
+    with _template_lock:
+        wins = _template_wins.get(host)
+        if wins is None:
+            wins = _template_wins[host] = Counter(HTTP_CACHE.pdf_template_wins(host) if HTTP_CACHE else {})
+        return dict(wins)
+
+def remember_pdf_template(host, template):
+    with _template_lock:
+        _template_wins.setdefault(host, Counter())[template] += 1
+    if HTTP_CACHE:
+        HTTP_CACHE.add_pdf_template_win(host, template)
+
 def extract_doi(citation):
     """Extract DOI from citation string."""
     # Pattern 1: https://doi.org/10.xxxx/xxxxx
@@ -74,82 +400,203 @@ def sanitize_filename(filename):
     filename = filename[:200]  # Limit length
     return filename
 
-def download_from_doi(doi):
-    """Attempt to download PDF from DOI."""
+def download_from_doi(doi, pdf_file):
+    """Attempt to download PDF from DOI into pdf_file; returns pdf_file or None."""
     try:
         # Try direct DOI resolution
-        doi_url = f"https://doi.org/{doi}"
-        print(f"  Attempting DOI resolution: {doi_url}")
+        doi_url = f"{DOI_RESOLVER}/{doi}"
+        log(f"  Attempting DOI resolution: {doi_url}")
         
-        session = requests.Session()
-        session.headers.update(HEADERS)
+        session = get_session()
         
-        # Follow redirects to get the actual publisher page
-        response = session.get(doi_url, allow_redirects=True, timeout=30)
+        # A DOI resolved before goes straight to its (cached) publisher page
+        cached_url = HTTP_CACHE.doi_url(doi) if HTTP_CACHE else None
+        if cached_url:
+            log(f"  Resolved (cached) to: {cached_url}")
+            if 'pdf' in cached_url.lower():
+                return download_pdf(cached_url, pdf_file, session)
+            response = get_page(session, cached_url, timeout=30)
+        else:
+            # Follow redirects to get the actual publisher page
+            response = session.get(doi_url, allow_redirects=True, timeout=30)
+            if response.status_code == 200 and HTTP_CACHE:
+                HTTP_CACHE.set_doi_url(doi, response.url)
+                HTTP_CACHE.store(response.url, response)
+        if response.status_code == 429 or response.status_code >= 500:
+            note_error(f"  DOI resolution answered {response.status_code}: {response.url}")
         
         if response.status_code == 200:
             final_url = response.url
-            print(f"  Resolved to: {final_url}")
+            if not cached_url:
+                log(f"  Resolved to: {final_url}")
             
             # Try to find PDF link on the page
             if 'pdf' in final_url.lower() or final_url.endswith('.pdf'):
-                return download_pdf(final_url, session)
-            
-            # Try common PDF URL patterns
-            pdf_urls = [
-                final_url.replace('/article/', '/article/pdf/'),
-                final_url.replace('/abs/', '/pdf/'),
-                final_url + '.pdf',
-                final_url.replace('/full/', '/pdf/'),
-            ]
+                return download_pdf(final_url, pdf_file, session)
             
-            for pdf_url in pdf_urls:
-                try:
-                    pdf_response = session.head(pdf_url, timeout=10)
-                    if pdf_response.status_code == 200 and 'pdf' in pdf_response.headers.get('content-type', '').lower():
-                        return download_pdf(pdf_url, session)
-                except:
-                    continue
-            
-            # Try to extract PDF link from HTML
-            if HAS_BS4:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                # Look for PDF links
-                pdf_links = soup.find_all('a', href=re.compile(r'\.pdf|pdf', re.I))
-                for link in pdf_links:
-                    href = link.get('href', '')
-                    if href:
-                        if not href.startswith('http'):
-                            href = requests.compat.urljoin(final_url, href)
-                        try:
-                            return download_pdf(href, session)
-                        except:
-                            continue
+            return find_publisher_pdf(response, pdf_file, session)
         
         return None
     except Exception as e:
-        print(f"  Error downloading from DOI: {e}")
+        note_error(f"  Error downloading from DOI: {e}")
+        return None
+
+def find_publisher_pdf(page, pdf_file, session):
+    """
+    Find and download the PDF of a publisher landing page (a Response).
+
+    Two groups of candidates: the PDF_URL_TEMPLATES guesses, then the PDF
+    links on the page (parsed only if the guesses fail). The group and the
+    candidates that worked most often on this host come first. The best
+    candidate is downloaded straight away if it has worked on this host
+    before; the rest are probed with concurrent HEAD requests, and the first
+    to answer as a PDF is downloaded without waiting for the slower ones.
+    """
+    final_url = page.url
+    host = urlparse(final_url).hostname or ''
+    wins = pdf_template_wins(host)
+    guesses = pdf_url_candidates(final_url)
+    groups = [guesses, None]  # None: the page links, looked up when their turn comes
+    if wins.get(PAGE_LINK, 0) > max((wins.get(name, 0) for name, _ in guesses), default=0):
+        groups.reverse()
+    
+    tried = set()
+    for candidates in groups:
+        if candidates is None:
+            candidates = [(PAGE_LINK, url) for url in page_pdf_links(page, final_url)]
+        candidates = [(name, url) for name, url in candidates if url not in tried]
+        candidates.sort(key=lambda c: -wins.get(c[0], 0))
+        tried.update(url for _, url in candidates)
+        
+        if candidates and wins.get(candidates[0][0]):
+            name, pdf_url = candidates.pop(0)
+            log(f"  Trying the PDF location that worked for {host} before ({name})")
+            if download_pdf(pdf_url, pdf_file, session):
+                remember_pdf_template(host, name)
+                return pdf_file
+        
+        for name, pdf_url in probe_pdf_urls(session, candidates):
+            if download_pdf(pdf_url, pdf_file, session):
+                remember_pdf_template(host, name)
+                return pdf_file
+    return None
+
+def pdf_url_candidates(final_url):
+    """(template name, URL) of every PDF_URL_TEMPLATES guess that differs from the page URL."""
+    seen = {final_url}
+    candidates = []
+    for name, guess in PDF_URL_TEMPLATES:
+        url = guess(final_url)
+        if url not in seen:
+            seen.add(url)
+            candidates.append((name, url))
+    return candidates
+
+def page_pdf_links(page, base_url):
+    """Absolute URLs of the PDF-looking links of a landing page, in page order (MAX_PAGE_LINKS at most)."""
+    if not HAS_BS4:
+        return []
+    soup = BeautifulSoup(page.text, 'html.parser')
+    links = []
+    for link in soup.find_all('a', href=re.compile(r'\.pdf|pdf', re.I)):
+        href = link.get('href', '')
+        if href and not href.startswith('#'):
+            if not href.startswith('http'):
+                href = requests.compat.urljoin(base_url, href)
+            if href not in links:
+                links.append(href)
+    return links[:MAX_PAGE_LINKS]
+
+def probe_pdf_url(session, url):
+    """
+    HEAD url: 'pdf' (200 with a PDF content-type), 'maybe' (HEAD not allowed,
+    or 200 with an unhelpful content-type; download_pdf sniffs these) or None.
+    """
+    try:
+        response = session.head(url, timeout=10, allow_redirects=True)
+    except Exception:
         return None
+    content_type = response.headers.get('content-type', '').lower()
+    if response.status_code == 200 and 'pdf' in content_type:
+        return 'pdf'
+    if response.status_code in (405, 501) or (response.status_code == 200 and 'html' not in content_type):
+        return 'maybe'
+    return None
 
-def download_from_pubmed(pubmed_id):
-    """Attempt to download from PubMed Central if available."""
+def _probe_for(session, url, cancel):
+    """
+    probe_pdf_url on a probe thread, for a caller whose race may be cancelled:
+    returns (verdict, the messages it logged) for the caller to log itself.
+    """
+    _log_state.lines = []
+    _log_state.cancel = cancel
     try:
-        # Check if paper is in PubMed Central (open access)
-        pmc_url = f"https://www.ncbi.nlm.nih.gov/pmc/articles/PMC{pubmed_id}/"
-        session = requests.Session()
-        session.headers.update(HEADERS)
+        return probe_pdf_url(session, url), _log_state.lines
+    finally:
+        _log_state.lines = _log_state.cancel = None
+
+def probe_pdf_urls(session, candidates):
+    """
+    Probe the (name, URL) candidates, PROBE_WORKERS at a time, and yield them
+    in the order to download them: each one that answers as a PDF as soon as
+    it does, then the 'maybe' ones in rank order. The probes stop when the
+    caller's race is won, and their messages go into the caller's log;
+    probes still running when the caller stops are left to finish in the
+    background.
+    """
+    if not candidates:
+        return
+    cancel = getattr(_log_state, 'cancel', None)
+    pool = ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, len(candidates)))
+    try:
+        futures = {pool.submit(_probe_for, session, url, cancel): (name, url) for name, url in candidates}
+        maybe = set()
+        for future in as_completed(futures):
+            verdict, lines = future.result()
+            for line in lines:
+                log(line)
+            if verdict == 'pdf':
+                yield futures[future]
+            elif verdict == 'maybe':
+                maybe.add(futures[future])
+        for candidate in candidates:
+            if candidate in maybe:
+                yield candidate
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def download_from_pmc(pmcid, pdf_file):
+    """Attempt to download from PubMed Central (open access); returns pdf_file or None."""
+    try:
+        pmc_url = f"{PMC_ARTICLES_URL}/{pmcid}/"
+        session = get_session()
         
-        response = session.get(pmc_url, timeout=30)
+        response = get_page(session, pmc_url, timeout=30)
         if response.status_code == 200:
             # Try to get PDF
-            pdf_url = f"https://www.ncbi.nlm.nih.gov/pmc/articles/PMC{pubmed_id}/pdf/"
+            pdf_url = f"{PMC_ARTICLES_URL}/{pmcid}/pdf/"
             pdf_response = session.head(pdf_url, timeout=10)
             if pdf_response.status_code == 200:
-                return download_pdf(pdf_url, session)
+                return download_pdf(pdf_url, pdf_file, session)
+        return None
+    except Exception as e:
+        note_error(f"  Error downloading from PubMed Central: {e}")
+        return None
+
+def download_from_pubmed(pubmed_id, pdf_file):
+    """Attempt to download from PubMed Central if available, then via PubMed; returns pdf_file or None."""
+    try:
+        # Check if paper is in PubMed Central (open access). When the batch
+        # lookup answered for this PubMed ID, its PMC ID (if any) has been
+        # tried by the PMC strategy already; otherwise guess it
+        if 'pmcid' not in RESOLVED.get(f"pmid:{pubmed_id}", {}):
+            if download_from_pmc(f"PMC{pubmed_id}", pdf_file):
+                return pdf_file
+        session = get_session()
         
         # Try regular PubMed
-        pubmed_url = f"https://pubmed.ncbi.nlm.nih.gov/{pubmed_id}/"
-        response = session.get(pubmed_url, timeout=30)
+        pubmed_url = f"{PUBMED_URL}/{pubmed_id}/"
+        response = get_page(session, pubmed_url, timeout=30)
         if response.status_code == 200 and HAS_BS4:
             soup = BeautifulSoup(response.text, 'html.parser')
             # Look for full text links
@@ -159,49 +606,136 @@ def download_from_pubmed(pubmed_id):
                 if href and 'pdf' in href.lower():
                     if not href.startswith('http'):
                         href = requests.compat.urljoin(pubmed_url, href)
-                    return download_pdf(href, session)
+                    if download_pdf(href, pdf_file, session):
+                        return pdf_file
         
         return None
     except Exception as e:
-        print(f"  Error downloading from PubMed: {e}")
+        note_error(f"  Error downloading from PubMed: {e}")
         return None
 
-def download_pdf(url, session=None):
-    """Download PDF from URL."""
+def download_pdf(url, pdf_file, session=None):
+    """
+    Stream the PDF at url into pdf_file; returns pdf_file or None.
+
+    The body is read PDF_CHUNK_SIZE bytes at a time into pdf_file + '.part',
+    which replaces pdf_file only once the download is complete.
+    Whatever the content-type says, the first bytes must contain the %PDF
+    header, otherwise (login page, HTML error page, ...) the download is
+    dropped before the rest of the body is read.
+
+    When the connection breaks mid-body the .part file is kept, with the URL
+    and the server's ETag / Last-Modified in a .part.json next to it. The next
+    attempt at the same URL asks only for the missing bytes (Range, guarded by
+    If-Range so a changed file is sent whole) and appends them.
+    """
+    part_file = pdf_file + '.part'
+    info_file = part_file + '.json'
+    writing = False
+    received = 0
+    body_started = None
     try:
         if session is None:
-            session = requests.Session()
-            session.headers.update(HEADERS)
+            session = get_session()
         
-        response = session.get(url, stream=True, timeout=30)
-        if response.status_code == 200:
-            content_type = response.headers.get('content-type', '').lower()
-            if 'pdf' in content_type:
-                return response.content
-            # Sometimes PDFs are served with wrong content-type
-            if len(response.content) > 1000:  # Reasonable size for PDF
-                return response.content
+        headers = {}
+        offset = 0
+        info = read_part_info(info_file)
+        if info.get('url') == url and os.path.exists(part_file):
+            offset = os.path.getsize(part_file)
+            headers['Range'] = f"bytes={offset}-"
+            if info.get('validator'):
+                headers['If-Range'] = info['validator']
+        
+        with session.get(url, stream=True, timeout=30, headers=headers) as response:
+            chunks = response.iter_content(PDF_CHUNK_SIZE)
+            body_started = time.perf_counter()
+            head = b''
+            if offset and response.status_code == 206 and content_range_start(response) == offset:
+                log(f"    Resuming at byte {offset}: {url}")
+                mode = 'ab'
+            elif response.status_code == 200:
+                for chunk in chunks:
+                    check_cancelled()
+                    received += len(chunk)
+                    head += chunk
+                    if len(head) >= PDF_SNIFF_BYTES:
+                        break
+                if b'%PDF' not in head[:PDF_SNIFF_BYTES]:
+                    log(f"    Not a PDF ({response.headers.get('content-type', 'no content-type')}): {url}")
+                    return None
+                mode = 'wb'
+            else:
+                if response.status_code in (206, 416):
+                    # The server can't continue this .part; start over next time
+                    remove_partial(part_file)
+                if response.status_code in (206, 416, 429) or response.status_code >= 500:
+                    note_error(f"    PDF request answered {response.status_code}: {url}")
+                return None
+            
+            # A strong ETag, else Last-Modified, lets a later attempt resume safely
+            etag = response.headers.get('ETag', '')
+            validator = etag if etag and not etag.startswith('W/') else response.headers.get('Last-Modified')
+            with open(info_file, 'w', encoding='utf-8') as f:
+                json.dump({'url': url, 'validator': validator}, f)
+            writing = True
+            with open(part_file, mode) as f:
+                f.write(head)
+                for chunk in chunks:
+                    check_cancelled()
+                    received += len(chunk)
+                    f.write(chunk)
+        os.replace(part_file, pdf_file)
+        os.remove(info_file)
+        writing = False
+        return pdf_file
+    except requests.exceptions.RequestException as e:
+        # Network trouble: whatever reached the .part file is kept for a resume
+        writing = False
+        note_error(f"    Error downloading PDF: {e}")
         return None
     except Exception as e:
-        print(f"    Error downloading PDF: {e}")
+        note_error(f"    Error downloading PDF: {e}")
         return None
+    finally:
+        if writing:
+            remove_partial(part_file)
+        if METRICS and received:
+            METRICS.transfer(urlparse(url).hostname or '', received, time.perf_counter() - body_started)
 
-def download_from_semantic_scholar(title, authors):
-    """Attempt to download from Semantic Scholar (for open access papers)."""
+def read_part_info(info_file):
+    """URL and validator saved next to a .part file ({} if there is none)."""
+    try:
+        with open(info_file, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def content_range_start(response):
+    """First byte position of a 206 response ('bytes 500-999/1000' -> 500)."""
+    m = re.match(r"bytes (\d+)-", response.headers.get('Content-Range', ''))
+    return int(m.group(1)) if m else None
+
+def remove_partial(part_file):
+    for path in (part_file, part_file + '.json'):
+        if os.path.exists(path):
+            os.remove(path)
+
+def download_from_semantic_scholar(title, authors, pdf_file):
+    """Attempt to download from Semantic Scholar (for open access papers); returns pdf_file or None."""
     try:
         # Search Semantic Scholar API
         search_query = f"{title} {authors}".strip()
-        api_url = "https://api.semanticscholar.org/graph/v1/paper/search"
+        api_url = SEMANTIC_SCHOLAR_SEARCH_URL
         
         params = {
             'query': search_query[:100],  # Limit query length
             'limit': 1
         }
         
-        session = requests.Session()
-        session.headers.update({'User-Agent': HEADERS['User-Agent']})
+        session = get_session()
         
-        response = session.get(api_url, params=params, timeout=30)
+        response = session.get(api_url, params=params, headers={'Accept': 'application/json'}, timeout=30)
         if response.status_code == 200:
             data = response.json()
             if data.get('data') and len(data['data']) > 0:
@@ -210,13 +744,49 @@ def download_from_semantic_scholar(title, authors):
                 if 'openAccessPdf' in paper and paper['openAccessPdf']:
                     pdf_url = paper['openAccessPdf'].get('url')
                     if pdf_url:
-                        print(f"  Found open access PDF on Semantic Scholar")
-                        return download_pdf(pdf_url, session)
+                        log(f"  Found open access PDF on Semantic Scholar")
+                        return download_pdf(pdf_url, pdf_file, session)
         return None
     except Exception as e:
-        print(f"  Error searching Semantic Scholar: {e}")
+        note_error(f"  Error searching Semantic Scholar: {e}")
         return None
 
+def resolve_articles(articles):
+    """
+    Look up the DOIs and PubMed IDs of all articles in a few batch requests
+    (id_resolver.py) and add what is found to RESOLVED, so process_article
+    does not have to search for every article on its own. Returns the
+    records found.
+    """
+    dois, pmids = set(), set()
+    for row in articles:
+        citation = row.get('full_citation', '')
+        doi = extract_doi(citation)
+        pubmed_id = extract_pubmed_id(citation)
+        if doi and doi_key(doi) not in RESOLVED:
+            dois.add(doi)
+        if pubmed_id and f"pmid:{pubmed_id}" not in RESOLVED:
+            pmids.add(pubmed_id)
+    if not dois and not pmids:
+        return {}
+    records = resolve_identifiers(get_session(), dois, pmids, SEMANTIC_SCHOLAR_BATCH_URL, PMC_IDCONV_URL)
+    RESOLVED.update(records)
+    open_access = sum(1 for record in records.values()
+                      if ((record.get('s2') or {}).get('openAccessPdf') or {}).get('url'))
+    in_pmc = sum(1 for record in records.values() if record.get('pmcid'))
+    print(f"Batch lookup of {len(dois)} DOIs and {len(pmids)} PubMed IDs: "
+          f"{open_access} open access PDFs, {in_pmc} in PubMed Central")
+    return records
+
+def resolved_info(doi, pubmed_id):
+    """What the batch lookup found for an article: the records of its DOI and PubMed ID merged."""
+    info = {}
+    for key in ([doi_key(doi)] if doi else []) + ([f"pmid:{pubmed_id}"] if pubmed_id else []):
+        for field, value in RESOLVED.get(key, {}).items():
+            if info.get(field) is None:
+                info[field] = value
+    return info
+
 def save_article_metadata(row, output_dir):
     """Save article metadata as JSON."""
     metadata_file = os.path.join(output_dir, f"{sanitize_filename(row.get('title', 'unknown'))}_metadata.json")
@@ -232,61 +802,73 @@ def process_article(row, output_dir):
     journal = row.get('journal', '')
     year = row.get('year', '')
     
-    print(f"\nProcessing: {title[:80]}...")
-    print(f"  Authors: {authors[:60]}...")
-    print(f"  Journal: {journal}, Year: {year}")
+    log(f"\nProcessing: {title[:80]}...")
+    log(f"  Authors: {authors[:60]}...")
+    log(f"  Journal: {journal}, Year: {year}")
     
     # Create safe filename
     safe_title = sanitize_filename(title or f"{authors}_{year}")
     if not safe_title or safe_title == 'Unknown_Title':
         safe_title = f"article_{hash(citation) % 10000}"
     
-    downloaded = False
-    
-    # Try DOI first
+    pdf_file = os.path.join(output_dir, f"{safe_title}.pdf")
     doi = extract_doi(citation)
-    if doi:
-        print(f"  Found DOI: {doi}")
-        pdf_content = download_from_doi(doi)
-        if pdf_content:
-            pdf_file = os.path.join(output_dir, f"{safe_title}.pdf")
-            with open(pdf_file, 'wb') as f:
-                f.write(pdf_content)
-            print(f"  ✓ Downloaded PDF: {pdf_file}")
-            downloaded = True
-            time.sleep(DELAY_BETWEEN_REQUESTS)
+    pubmed_id = extract_pubmed_id(citation)
     
-    # Try PubMed if not downloaded
-    if not downloaded:
-        pubmed_id = extract_pubmed_id(citation)
-        if pubmed_id:
-            print(f"  Found PubMed ID: {pubmed_id}")
-            pdf_content = download_from_pubmed(pubmed_id)
-            if pdf_content:
-                pdf_file = os.path.join(output_dir, f"{safe_title}.pdf")
-                with open(pdf_file, 'wb') as f:
-                    f.write(pdf_content)
-                print(f"  ✓ Downloaded PDF: {pdf_file}")
-                downloaded = True
-                time.sleep(DELAY_BETWEEN_REQUESTS)
+    # With the PDF store, downloads go to its incoming folder and are filed by hash
+    download_file = pdf_file
+    stored = None
+    if PDF_STORE:
+        store_keys = ([doi_key(doi)] if doi else []) + ['article:' + article_key(row)]
+        stored = PDF_STORE.lookup(store_keys)
+        download_file = PDF_STORE.incoming_path(store_keys[-1])
+    
+    # Strategies in order of preference: DOI, then PubMed Central / PubMed, then
+    # Semantic Scholar for open access. Each is (name, message when it starts,
+    # function, arguments). What the batch lookup found (resolve_articles) adds
+    # a PMC ID and replaces the Semantic Scholar search with its answer.
+    info = resolved_info(doi, pubmed_id)
+    pmcid = info.get('pmcid')
+    open_access_pdf = ((info.get('s2') or {}).get('openAccessPdf') or {}).get('url')
+    strategies = []
+    if doi:
+        strategies.append(('DOI', f"  Found DOI: {doi}", download_from_doi, (doi,)))
+    if pmcid:
+        strategies.append(('PMC', f"  Found PMC ID: {pmcid}", download_from_pmc, (pmcid,)))
+    if pubmed_id:
+        strategies.append(('PubMed', f"  Found PubMed ID: {pubmed_id}", download_from_pubmed, (pubmed_id,)))
+    if open_access_pdf:
+        strategies.append(('Semantic Scholar', "  Open access PDF listed by Semantic Scholar",
+                           download_pdf, (open_access_pdf,)))
+    elif title and info.get('s2') is None:
+        # Not in the batch lookup (no DOI / PubMed ID, or unknown to S2 by its
+        # IDs); a paper S2 knows without an open access PDF needs no search
+        strategies.append(('Semantic Scholar', "  Searching Semantic Scholar...",
+                           download_from_semantic_scholar, (title, authors)))
     
-    # Try Semantic Scholar for open access
-    if not downloaded and title:
-        print(f"  Searching Semantic Scholar...")
-        pdf_content = download_from_semantic_scholar(title, authors)
-        if pdf_content:
-            pdf_file = os.path.join(output_dir, f"{safe_title}.pdf")
-            with open(pdf_file, 'wb') as f:
-                f.write(pdf_content)
-            print(f"  ✓ Downloaded PDF from Semantic Scholar: {pdf_file}")
-            downloaded = True
-            time.sleep(DELAY_BETWEEN_REQUESTS)
+    if stored:
+        source = 'the PDF store'
+        pdf_file = PDF_STORE.link(stored, store_keys, title, os.path.basename(pdf_file))
+        log(f"  ✓ Already in the PDF store: {pdf_file}")
+    elif HEDGE_STAGGER is None:
+        source = try_in_turn(strategies, download_file)
+    else:
+        source = race_strategies(strategies, download_file, HEDGE_STAGGER)
+    downloaded = source is not None
+    if downloaded and PDF_STORE and not stored:
+        sha256, pdf_file, duplicate = PDF_STORE.add(download_file, store_keys, title, os.path.basename(pdf_file))
+        if duplicate:
+            log(f"  Same PDF as an earlier download (sha256 {sha256[:12]}), stored once")
+    if downloaded and not stored:
+        log(f"  ✓ Downloaded PDF from {source}: {pdf_file}")
+    _log_state.source = source
+    _log_state.pdf_file = pdf_file if downloaded else None
     
     # Save metadata regardless
     save_article_metadata(row, output_dir)
     
     if not downloaded:
-        print(f"  ✗ Could not download full text (may be behind paywall or not available)")
+        log(f"  ✗ Could not download full text (may be behind paywall or not available)")
         # Save citation info as text file
         citation_file = os.path.join(output_dir, f"{safe_title}_citation.txt")
         with open(citation_file, 'w', encoding='utf-8') as f:
@@ -299,53 +881,442 @@ def process_article(row, output_dir):
                 f.write(f"\nDOI: {doi}\n")
             if pubmed_id:
                 f.write(f"PubMed ID: {pubmed_id}\n")
-        print(f"  ✓ Saved citation info: {citation_file}")
+            if pmcid:
+                f.write(f"PMC ID: {pmcid}\n")
+        log(f"  ✓ Saved citation info: {citation_file}")
     
     return downloaded
 
+def run_strategy(name, func, args, pdf_file):
+    """func(*args, pdf_file), with its outcome and time counted in METRICS."""
+    if METRICS is None:
+        return func(*args, pdf_file)
+    # The article's last error is put back unless this strategy notes its own
+    earlier_error, _log_state.error = getattr(_log_state, 'error', None), None
+    started = time.perf_counter()
+    ok = None
+    try:
+        ok = func(*args, pdf_file)
+        return ok
+    finally:
+        cancel = getattr(_log_state, 'cancel', None)
+        if ok:
+            result = 'downloaded'
+        elif cancel is not None and cancel.is_set():
+            result = 'cancelled'
+        elif _log_state.error or sys.exc_info()[0]:
+            result = 'error'
+        else:
+            result = 'no pdf'
+        METRICS.strategy(name, result, time.perf_counter() - started)
+        if _log_state.error is None:
+            _log_state.error = earlier_error
+
+def try_in_turn(strategies, pdf_file):
+    """Try the strategies one after another; returns the name of the one that got the PDF, or None."""
+    for name, message, func, args in strategies:
+        log(message)
+        if run_strategy(name, func, args, pdf_file):
+            return name
+    return None
+
+def race_strategies(strategies, pdf_file, stagger):
+    """
+    Hedged download: start the first strategy, then the next one every
+    `stagger` seconds, or at once when all running ones have failed. Each
+    strategy downloads to its own file next to pdf_file; the first complete
+    PDF is renamed to pdf_file and the others are cancelled (they stop at
+    their next request or chunk and remove their partial files).
+    Returns the name of the winning strategy, or None.
+    """
+    cancel = threading.Event()
+    finished = queue.Queue()
+    won = threading.Lock()
+    winner = []
+
+    def attempt(name, message, func, args):
+        _log_state.lines = [message]
+        _log_state.error = None
+        _log_state.cancel = cancel
+        own_file = f"{pdf_file}.{name.split()[0].lower()}"
+        ok = False
+        try:
+            ok = run_strategy(name, func, args, own_file)
+        except Exception as e:
+            note_error(f"  Error in {name}: {e}")
+        with won:
+            if ok and not winner:
+                os.replace(own_file, pdf_file)
+                winner.append(name)
+                cancel.set()
+            elif ok:
+                os.remove(own_file)
+        finished.put((ok, _log_state.lines, _log_state.error))
+
+    waiting = list(strategies)
+    running = 0
+    while waiting or running:
+        if waiting:
+            threading.Thread(target=attempt, args=waiting.pop(0), daemon=True).start()
+            running += 1
+        try:
+            ok, lines, error = finished.get(timeout=stagger if waiting else None)
+        except queue.Empty:
+            continue  # the running strategies are slow: start the next one too
+        running -= 1
+        for line in lines:
+            log(line)
+        if ok:
+            if running:
+                log(f"  ({running} slower strategies cancelled)")
+            return winner[0]
+        if error:
+            _log_state.error = error
+    return None
+
+def read_articles(path):
+    """
+    Read the review list as a list of dicts.
+
+    CSV is read in full. Columnar files written by the lab1 extractors
+    (.arrow/.feather/.parquet) are memory-mapped and only ARTICLE_COLUMNS
+    are loaded, which skips parsing the quoted full_citation CSV fields.
+    A column found under its COLUMN_ALIASES name is renamed; a missing one
+    is reported and left empty.
+    """
+    lower = path.lower()
+    if lower.endswith(('.arrow', '.feather', '.parquet')):
+        if not HAS_PYARROW:
+            raise RuntimeError("reading columnar input needs pyarrow (pip install pyarrow)")
+        if lower.endswith('.parquet'):
+            names = pq.read_schema(path).names
+        else:
+            table = feather.read_table(path, memory_map=True)
+            names = table.column_names
+        columns = input_columns(names, path)
+        if lower.endswith('.parquet'):
+            table = pq.read_table(path, columns=list(columns.values()), memory_map=True)
+        else:
+            table = table.select(list(columns.values()))
+        return table.rename_columns(list(columns)).to_pylist()
+
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        columns = input_columns(reader.fieldnames or [], path)
+        renamed = {name: column for column, name in columns.items() if name != column}
+        rows = list(reader)
+    for row in rows:
+        for name, column in renamed.items():
+            row[column] = row.pop(name)
+    return rows
+
+def input_columns(names, path):
+    """ARTICLE_COLUMNS -> the name each has in the input (via COLUMN_ALIASES); warns about missing ones."""
+    columns = {}
+    for column in ARTICLE_COLUMNS:
+        for name in (column, COLUMN_ALIASES.get(column)):
+            if name in names:
+                columns[column] = name
+                break
+        else:
+            print(f"Warning: {path} has no {column} column; it is left empty")
+    return columns
+
+def run_article(i, total, row, output_dir, delay):
+    """
+    Worker: process one article, print its messages as one block, then pause.
+    Returns (downloaded, last error or None).
+    """
+    _log_state.lines = [f"\n{'='*80}", f"Article {i}/{total}", '=' * 80]
+    _log_state.error = None
+    _log_state.source = None
+    _log_state.pdf_file = None
+    title = row.get('title', '')
+    if METRICS:
+        METRICS.article_started(title)
+    started = time.perf_counter()
+    downloaded = False
+    try:
+        downloaded = process_article(row, output_dir)
+        return downloaded, _log_state.error
+    except Exception as e:
+        note_error(f"  ✗ Error processing article: {e}")
+        return False, _log_state.error
+    finally:
+        if METRICS:
+            result = 'downloaded' if downloaded else 'error' if _log_state.error else 'not available'
+            METRICS.article(title, result, _log_state.source, time.perf_counter() - started)
+        lines, _log_state.lines = _log_state.lines, None
+        with _print_lock:
+            print('\n'.join(lines))
+        # Be respectful with rate limiting
+        if delay:
+            time.sleep(delay)
+
+def download_all(articles, output_dir, workers=MAX_WORKERS, delay=DELAY_BETWEEN_REQUESTS,
+                 ledger=None, retry_paywalled=False, resolve=False):
+    """
+    Process all articles with at most `workers` in flight at once.
+    Returns (downloaded, failed) counts of the articles processed.
+
+    With a JobLedger only the articles it says are due are processed (each
+    citation once), and every outcome is recorded in it as soon as it is known.
+    With resolve, the identifiers of those articles are first looked up in
+    batches (resolve_articles).
+    """
+    if ledger is not None:
+        keys = ledger.add(articles)
+        due = set(ledger.due(keys, retry_paywalled=retry_paywalled))
+        jobs = []
+        for key, row in zip(keys, articles):
+            if key in due:
+                jobs.append((key, row))
+                due.discard(key)
+        if len(jobs) < len(articles):
+            print(f"Job ledger: {len(articles) - len(jobs)} articles done or waiting for a retry, "
+                  f"{len(jobs)} to process")
+    else:
+        jobs = [(None, row) for row in articles]
+    if resolve:
+        resolve_articles([row for _, row in jobs])
+
+    downloaded_count = 0
+    failed_count = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_article, i, len(jobs), row, output_dir, delay): key
+                   for i, (key, row) in enumerate(jobs, 1)}
+        for future in as_completed(futures):
+            downloaded, error = future.result()
+            if downloaded:
+                downloaded_count += 1
+            else:
+                failed_count += 1
+            if ledger is not None:
+                state = 'downloaded' if downloaded else 'failed' if error else 'paywalled'
+                ledger.record(futures[future], state, error)
+    return downloaded_count, failed_count
+
+def worker_name():
+    """This process's name in a work queue: host and process id."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def work_from_queue(work_queue, output_dir, workers=MAX_WORKERS, delay=DELAY_BETWEEN_REQUESTS,
+                    worker=None, resolve=False, poll=QUEUE_POLL):
+    """
+    Queue worker: `workers` threads claim jobs from the WorkQueue one at a
+    time, process them and record the outcome, until no job is left that
+    could still be claimed (jobs leased by other workers are waited for, in
+    case their worker dies and the lease runs out). A heartbeat thread renews
+    this worker's leases (and its marks on jobs it is looking up) every
+    lease / 3 seconds.
+    Returns (downloaded, failed) counts of the jobs this worker processed.
+    """
+    worker = worker or worker_name()
+    work_queue.register(worker)
+    stop = threading.Event()
+    counts = Counter()
+    counts_lock = threading.Lock()
+    active = set()  # keys of the jobs this worker's threads are on; only their leases are renewed
+
+    def heartbeat():
+        while not stop.wait(work_queue.lease / 3):
+            with counts_lock:
+                keys = list(active)
+            try:
+                work_queue.heartbeat(worker, keys)
+            except sqlite3.Error as e:
+                print(f"Work queue heartbeat failed: {e}")
+
+    def work():
+        while True:
+            try:
+                job = work_queue.claim(worker)
+                if job is None:
+                    if not work_queue.open_jobs():
+                        return
+                    time.sleep(poll)  # other workers hold the rest
+                    continue
+            except sqlite3.Error as e:
+                print(f"Work queue unavailable ({e}), retrying in {poll:.0f}s")
+                time.sleep(poll)
+                continue
+            key, row = job
+            with counts_lock:
+                active.add(key)
+                counts['claimed'] += 1
+                i = counts['claimed']
+            downloaded = False
+            try:
+                downloaded, error = run_article(i, f"{total} queued", row, output_dir, delay)
+                state = 'downloaded' if downloaded else 'failed' if error else 'paywalled'
+                pdf_file = _log_state.pdf_file
+                work_queue.complete(key, worker, state, error, _log_state.source,
+                                    os.path.relpath(pdf_file, output_dir) if pdf_file else None)
+            except Exception as e:
+                # Record the job as failed (retried after the backoff) and go on; if
+                # even that fails, its lease runs out as it is no longer renewed
+                print(f"Work queue job {row.get('title', key)[:60]!r} failed: {e}")
+                try:
+                    work_queue.complete(key, worker, 'failed', f"worker error: {e}")
+                except Exception as e:
+                    print(f"Work queue: could not record the failure ({e}); the job's lease will run out")
+            finally:
+                with counts_lock:
+                    active.discard(key)
+            with counts_lock:
+                counts['downloaded' if downloaded else 'failed'] += 1
+
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    try:
+        if resolve:
+            # Each job is looked up once per queue, by whichever worker marks it first
+            # (the heartbeat keeps this worker's marks)
+            RESOLVED.update(work_queue.shared_lookup(resolve_articles, worker, poll))
+        total = sum(work_queue.counts().values())
+        threads = [threading.Thread(target=work, daemon=True) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        stop.set()
+    return counts['downloaded'], counts['failed']
+
 def main():
     """Main function to process all articles."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', nargs='?', default=INPUT_CSV,
+                        help="review list: .csv, or .arrow/.feather/.parquet")
+    parser.add_argument('output_dir', nargs='?', default=OUTPUT_DIR, help="folder for the PDFs")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS,
+                        help=f"articles downloaded at the same time (default: {MAX_WORKERS})")
+    parser.add_argument('--delay', type=float, default=DELAY_BETWEEN_REQUESTS,
+                        help=f"extra seconds each worker waits between articles (default: {DELAY_BETWEEN_REQUESTS})")
+    parser.add_argument('--host-rate', action='append', default=[], metavar='HOST=RATE',
+                        help="requests per second allowed to HOST (repeatable), e.g. www.cell.com=0.5")
+    parser.add_argument('--default-rate', type=float, default=DEFAULT_HOST_RATE[0],
+                        help=f"requests per second for hosts without their own rate (default: {DEFAULT_HOST_RATE[0]})")
+    parser.add_argument('--no-ledger', action='store_true',
+                        help="process every article, without reading or writing the job ledger")
+    parser.add_argument('--retry-paywalled', action='store_true',
+                        help="also retry articles an earlier run found no PDF for")
+    parser.add_argument('--hedge', nargs='?', type=float, const=DEFAULT_HEDGE_STAGGER, metavar='SECONDS',
+                        help="race the download strategies, starting the next one every SECONDS "
+                             f"(default: {DEFAULT_HEDGE_STAGGER}) until one has the PDF")
+    parser.add_argument('--no-store', action='store_true',
+                        help="save PDFs as plain <title>.pdf files instead of in the content-addressed store")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="resolve every DOI and fetch every landing page again, without the HTTP cache")
+    parser.add_argument('--no-metrics', action='store_true',
+                        help="don't write the metrics event log (.download_metrics.jsonl in the output folder)")
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help="serve live metrics on http://127.0.0.1:PORT/metrics (Prometheus) and / (summary)")
+    parser.add_argument('--fixed-timeouts', action='store_true',
+                        help="always wait the full 30 s / 10 s instead of timeouts adapted to each host's latency")
+    parser.add_argument('--breaker-failures', type=int, default=HOST_HEALTH.failure_threshold, metavar='N',
+                        help="failures in a row after which a host is left alone for a while "
+                             f"(default: {HOST_HEALTH.failure_threshold}; 0: never)")
+    parser.add_argument('--breaker-cooldown', type=float, default=HOST_HEALTH.cooldown, metavar='SECONDS',
+                        help=f"how long such a host is left alone at first (default: {HOST_HEALTH.cooldown:.0f})")
+    parser.add_argument('--queue', metavar='PATH',
+                        help="work as one of several processes / machines on the shared job queue at PATH "
+                             "(created if missing; the input's articles are added to it)")
+    parser.add_argument('--queue-lease', type=float, default=QUEUE_LEASE, metavar='SECONDS',
+                        help=f"seconds before a silent worker's jobs go to others (default: {QUEUE_LEASE})")
+    parser.add_argument('--queue-network-fs', action='store_true',
+                        help="the queue file is on a network file system shared by several machines")
+    parser.add_argument('--no-batch-lookup', action='store_true',
+                        help="search Semantic Scholar article by article instead of looking up all "
+                             "DOIs / PubMed IDs in batches first")
+    args = parser.parse_args()
+
+    if not args.default_rate > 0:
+        parser.error(f"--default-rate must be more than 0, got {args.default_rate:g}")
+    RATE_LIMITER.default_rate = args.default_rate
+    HOST_HEALTH.adaptive = not args.fixed_timeouts
+    HOST_HEALTH.failure_threshold = args.breaker_failures
+    HOST_HEALTH.cooldown = args.breaker_cooldown
+    for spec in args.host_rate:
+        host, _, rate = spec.partition('=')
+        try:
+            rate = float(rate)
+        except ValueError:
+            parser.error(f"--host-rate expects HOST=RATE, got {spec!r}")
+        try:
+            RATE_LIMITER.set_rate(host.strip(), rate)
+        except ValueError as e:
+            parser.error(f"--host-rate {spec!r}: {e}")
+    input_file = args.input
+    output_dir = args.output_dir
+
     print("=" * 80)
     print("Review Article Full Text Downloader")
     print("=" * 80)
     
     # Create output directory
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    print(f"Output directory: {OUTPUT_DIR}")
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Output directory: {output_dir}")
     
     # Read CSV file
-    print(f"\nReading CSV file: {INPUT_CSV}")
+    print(f"\nReading input file: {input_file}")
     articles = []
     try:
-        with open(INPUT_CSV, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            articles = list(reader)
+        articles = read_articles(input_file)
         print(f"Found {len(articles)} articles to process")
     except Exception as e:
-        print(f"Error reading CSV: {e}")
-        return
-    
-    # Process each article
-    downloaded_count = 0
-    failed_count = 0
+        if not args.queue:
+            print(f"Error reading input: {e}")
+            return
+        print(f"No input read ({e}); working on the jobs already in the queue")
     
-    for i, row in enumerate(articles, 1):
-        print(f"\n{'='*80}")
-        print(f"Article {i}/{len(articles)}")
-        print(f"{'='*80}")
-        
+    # Process the articles, several at a time
+    print(f"Downloading with {args.workers} workers")
+    reset_session(pool_maxsize=max(args.workers, POOL_MAXSIZE))
+    # With a work queue, the queue keeps the state of every article instead of the ledger
+    ledger = None if args.no_ledger or args.queue else JobLedger.for_output_dir(output_dir)
+    work_queue = None
+    if args.queue:
+        work_queue = WorkQueue(args.queue, lease=args.queue_lease, network_fs=args.queue_network_fs)
+    global HTTP_CACHE, HEDGE_STAGGER, PDF_STORE, METRICS
+    HEDGE_STAGGER = args.hedge
+    METRICS = Metrics(None if args.no_metrics else os.path.join(output_dir, METRICS_LOG_NAME))
+    if args.metrics_port is not None:
         try:
-            if process_article(row, OUTPUT_DIR):
-                downloaded_count += 1
-            else:
-                failed_count += 1
-        except Exception as e:
-            print(f"  ✗ Error processing article: {e}")
-            failed_count += 1
-        
-        # Be respectful with rate limiting
-        if i < len(articles):
-            time.sleep(DELAY_BETWEEN_REQUESTS)
+            print(f"Live metrics: {METRICS.serve(args.metrics_port)}/metrics")
+        except OSError as e:
+            print(f"Could not serve metrics on port {args.metrics_port}: {e}")
+    HTTP_CACHE = None if args.no_cache else HttpCache.for_output_dir(output_dir)
+    PDF_STORE = None if args.no_store else PdfStore(output_dir)
+    try:
+        if work_queue:
+            added = work_queue.enqueue(articles) if articles else 0
+            if args.retry_paywalled:
+                work_queue.retry_paywalled()
+            print(f"Work queue {args.queue}: {added} new jobs; working as {worker_name()}")
+            downloaded_count, failed_count = work_from_queue(work_queue, output_dir, args.workers, args.delay,
+                                                             resolve=not args.no_batch_lookup)
+            counts = work_queue.counts()
+            manifest = os.path.join(output_dir, MANIFEST_NAME)
+            work_queue.write_manifest(manifest)
+        else:
+            downloaded_count, failed_count = download_all(articles, output_dir, args.workers, args.delay,
+                                                          ledger, args.retry_paywalled,
+                                                          resolve=not args.no_batch_lookup)
+            counts = ledger.counts() if ledger else None
+        store_stats = PDF_STORE.stats() if PDF_STORE else None
+    finally:
+        reset_session()
+        if ledger:
+            ledger.close()
+        if work_queue:
+            work_queue.close()
+        if HTTP_CACHE:
+            HTTP_CACHE.close()
+        if PDF_STORE:
+            PDF_STORE.close()
+        METRICS.close()
     
     # Summary
     print(f"\n{'='*80}")
@@ -354,7 +1325,21 @@ def main():
     print(f"Total articles: {len(articles)}")
     print(f"Successfully downloaded: {downloaded_count}")
     print(f"Not available/failed: {failed_count}")
-    print(f"\nOutput directory: {OUTPUT_DIR}")
+    if counts:
+        print(("Work queue (all workers): " if work_queue else "Job ledger: ")
+              + ", ".join(f"{n} {state}" for state, n in counts.items()))
+    if work_queue:
+        print(f"Manifest of every job: {manifest}")
+    if HTTP_CACHE:
+        print(f"HTTP cache: {HTTP_CACHE.summary()}")
+    if store_stats:
+        blobs, size, _ = store_stats
+        print(f"PDF store: {blobs} PDFs ({size / 1e6:.1f} MB), "
+              f"{PDF_STORE.duplicates} duplicate downloads this run stored once")
+    print(f"\n{METRICS.summary()}")
+    if not args.no_metrics:
+        print(f"Event log: {os.path.join(output_dir, METRICS_LOG_NAME)} (python metrics.py {output_dir})")
+    print(f"\nOutput directory: {output_dir}")
 
 if __name__ == "__main__":
     main()
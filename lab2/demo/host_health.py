@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Adaptive timeouts and circuit breakers per host, for download_reviews.py.
+
+Timeouts: the time to the response headers of the last LATENCY_WINDOW
+answers of each host is kept. Once a host has MIN_SAMPLES of them, its
+requests wait TIMEOUT_FACTOR x their 95th percentile (at least MIN_TIMEOUT,
+at most the timeout the caller asked for) instead of the fixed 30 s / 10 s,
+so a publisher that normally answers in half a second no longer holds an
+article for 30 s when it hangs. A request that times out counts as a sample
+of the timeout it ran into, so a host that gets slower also gets longer
+timeouts instead of timing out for good.
+
+Circuit breaker: after FAILURE_THRESHOLD failures in a row (timeouts,
+connection errors, 5xx answers) a host's circuit opens: its requests fail at
+once with HostUnavailable for COOLDOWN seconds, and the strategies move on
+to other sources. Then a single trial request is let through, with the
+caller's full timeout: if it is answered the circuit closes, otherwise it
+opens again for twice as long (up to MAX_COOLDOWN).
+"""
+
+import threading
+import time
+from collections import deque
+
+import requests
+
+LATENCY_WINDOW = 100  # latest answers per host the percentile is taken over
+MIN_SAMPLES = 20  # answers needed before a host's timeout adapts
+TIMEOUT_FACTOR = 4  # timeout = this x the host's 95th percentile latency
+MIN_TIMEOUT = 5.0  # seconds; adapted timeouts never go below this
+FAILURE_THRESHOLD = 5  # failures in a row that open a host's circuit
+COOLDOWN = 60.0  # seconds an opened circuit stays open the first time
+MAX_COOLDOWN = 900.0
+
+
+class HostUnavailable(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request to a host whose circuit is open."""
+
+
+class _Host:
+    def __init__(self, cooldown):
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.failures = 0  # in a row
+        self.open_until = 0.0  # monotonic time; 0 while the circuit is closed
+        self.cooldown = cooldown
+        self.trial = False  # the trial request of an open circuit is running
+
+
+class HostHealth:
+    """Per-host latency percentiles and circuit breakers; thread-safe."""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN, max_cooldown=MAX_COOLDOWN,
+                 adaptive=True, min_timeout=MIN_TIMEOUT, factor=TIMEOUT_FACTOR):
+        self.failure_threshold = failure_threshold  # 0: never open a circuit
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.adaptive = adaptive
+        self.min_timeout = min_timeout
+        self.factor = factor
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _Host(self.cooldown)
+        return state
+
+    def before(self, host, timeout):
+        """
+        Call before sending a request to host with the caller's timeout.
+        Returns (timeout to use, True if this is the trial request of an open
+        circuit); raises HostUnavailable while the circuit is open.
+        """
+        with self._lock:
+            state = self._host(host)
+            if state.open_until:
+                wait = state.open_until - time.monotonic()
+                if wait > 0 or state.trial:
+                    raise HostUnavailable(f"{host} keeps failing; not contacted for another {max(wait, 0):.0f}s")
+                state.trial = True
+                return timeout, True
+            return self._adapted(state, timeout), False
+
+    def _adapted(self, state, timeout):
+        # Only plain numbers are adapted, not None or (connect, read) pairs
+        if not self.adaptive or not isinstance(timeout, (int, float)) or len(state.latencies) < MIN_SAMPLES:
+            return timeout
+        latencies = sorted(state.latencies)
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        return min(timeout, max(self.min_timeout, p95 * self.factor))
+
+    def timeout(self, host, timeout):
+        """The timeout a request to host would get now."""
+        with self._lock:
+            return self._adapted(self._host(host), timeout)
+
+    def success(self, host, seconds=None):
+        """host answered after seconds (None: unknown). Returns True if that closed its circuit."""
+        with self._lock:
+            state = self._host(host)
+            if seconds is not None:
+                state.latencies.append(seconds)
+            state.failures = 0
+            if not state.open_until:
+                return False
+            state.open_until = 0.0
+            state.trial = False
+            state.cooldown = self.cooldown
+            return True
+
+    def failure(self, host, trial, timed_out_after=None):
+        """
+        A request to host failed (timed_out_after: the timeout it ran into).
+        Returns the seconds the circuit is now open for if this opened it, else None.
+        """
+        with self._lock:
+            state = self._host(host)
+            if isinstance(timed_out_after, (int, float)):
+                state.latencies.append(timed_out_after)
+            state.failures += 1
+            if trial:
+                # The host is still sick: stay away twice as long
+                state.trial = False
+                state.cooldown = min(state.cooldown * 2, self.max_cooldown)
+            elif state.open_until or not self.failure_threshold or state.failures < self.failure_threshold:
+                return None
+            state.open_until = time.monotonic() + state.cooldown
+            return state.cooldown
+
+    def abort_trial(self, host):
+        """The trial request of host's open circuit ended without telling either way (cancelled): let the next one try."""
+        with self._lock:
+            self._host(host).trial = False
+
+    def is_open(self, host):
+        with self._lock:
+            return bool(self._host(host).open_until)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+On-disk HTTP cache for download_reviews.py.
+
+Three tables in one SQLite file (.http_cache.sqlite in the output folder):
+    doi_urls   DOI -> the URL its redirect chain ended at. Kept for good:
+               DOIs are permanent, so a cached DOI skips doi.org entirely.
+    pages      landing pages (HTML, up to PAGE_MAX_BYTES, body zlib-compressed)
+               with their ETag / Last-Modified.
+    pdf_templates  publisher host -> how often each PDF URL template of
+               download_reviews.py found the PDF there.
+
+A cached page younger than PAGE_MAX_AGE is used without any request. An
+older one is revalidated with If-None-Match / If-Modified-Since, and a 304
+answer only refreshes its timestamp. Responses marked Cache-Control: no-store
+are never kept. PDFs are never cached here; they are saved as files.
+
+hits / misses are counted per kind (see summary()) and reported by
+download_reviews.py at the end of a run.
+
+Usage:
+    python http_cache.py Reviews/            # entries in the cache
+    python http_cache.py Reviews/ --clear    # drop the cached pages (keeps the DOI map)
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+CACHE_NAME = '.http_cache.sqlite'
+PAGE_MAX_AGE = 7 * 24 * 3600  # seconds a cached page is used without asking the server
+PAGE_MAX_BYTES = 2_000_000  # larger responses are not cached
+CACHED_TYPES = ('text/html', 'application/xhtml+xml', 'text/xml', 'application/xml', 'application/json')
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class HttpCache:
+    """Thread-safe SQLite cache of DOI targets, landing pages and PDF URL templates; use as a context manager."""
+
+    def __init__(self, path, max_age=PAGE_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS doi_urls ("
+            " doi TEXT PRIMARY KEY,"
+            " url TEXT NOT NULL,"
+            " stored REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY,"
+            " final_url TEXT NOT NULL,"
+            " headers TEXT NOT NULL,"
+            " encoding TEXT,"
+            " body BLOB NOT NULL,"
+            " stored REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS pdf_templates ("
+            " host TEXT NOT NULL,"
+            " template TEXT NOT NULL,"
+            " wins INTEGER NOT NULL,"
+            " PRIMARY KEY (host, template));"
+        )
+        self.conn.commit()
+
+    @classmethod
+    def for_output_dir(cls, output_dir, **kwargs):
+        return cls(os.path.join(output_dir, CACHE_NAME), **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _count(self, what):
+        with self._lock:
+            self.stats[what] += 1
+
+    # --- DOI -> URL -----------------------------------------------------------
+
+    def doi_url(self, doi):
+        """The URL doi resolved to before, or None."""
+        with self._lock:
+            row = self.conn.execute("SELECT url FROM doi_urls WHERE doi = ?", (doi.lower(),)).fetchone()
+            self.stats['doi hit' if row else 'doi miss'] += 1
+        return row[0] if row else None
+
+    def set_doi_url(self, doi, url):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO doi_urls VALUES (?, ?, ?)",
+                              (doi.lower(), url, time.time()))
+
+    # --- PDF URL templates per publisher -------------------------------------
+
+    def pdf_template_wins(self, host):
+        """template -> wins on host."""
+        with self._lock:
+            return dict(self.conn.execute("SELECT template, wins FROM pdf_templates WHERE host = ?", (host,)))
+
+    def add_pdf_template_win(self, host, template):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO pdf_templates VALUES (?, ?, 1)"
+                " ON CONFLICT (host, template) DO UPDATE SET wins = wins + 1", (host, template))
+
+    # --- Pages ----------------------------------------------------------------
+
+    def get(self, session, url, **kwargs):
+        """
+        session.get(url, **kwargs) through the cache. Returns a requests.Response;
+        one served from the cache has from_cache = True.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT final_url, headers, encoding, body, stored FROM pages WHERE url = ?", (url,)).fetchone()
+        if row and time.time() - row[4] < self.max_age:
+            self._count('page fresh')
+            return self._response(*row[:4])
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if row:
+            cached_headers = json.loads(row[1])
+            if cached_headers.get('ETag'):
+                headers['If-None-Match'] = cached_headers['ETag']
+            if cached_headers.get('Last-Modified'):
+                headers['If-Modified-Since'] = cached_headers['Last-Modified']
+        response = session.get(url, headers=headers, **kwargs)
+        if row and response.status_code == 304:
+            self._count('page revalidated')
+            with self._lock, self.conn:
+                self.conn.execute("UPDATE pages SET stored = ? WHERE url = ?", (time.time(), url))
+            return self._response(*row[:4])
+        self._count('page miss')
+        self.store(url, response)
+        return response
+
+    def store(self, url, response):
+        """Keep a 200 HTML/XML/JSON response under url (the URL that was requested)."""
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if (response.status_code != 200 or content_type not in CACHED_TYPES
+                or 'no-store' in response.headers.get('Cache-Control', '')
+                or len(response.content) > PAGE_MAX_BYTES):
+            return False
+        headers = {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers}
+        # The encoding requests settles on (possibly by guessing) is kept so the
+        # cached page decodes the same way without guessing again
+        encoding = response.encoding or response.apparent_encoding
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                              (url, response.url, json.dumps(headers), encoding,
+                               zlib.compress(response.content), time.time()))
+        return True
+
+    @staticmethod
+    def _response(final_url, headers, encoding, body):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = final_url
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response.encoding = encoding
+        response._content = zlib.decompress(body)
+        response.from_cache = True
+        return response
+
+    # --- Reporting --------------------------------------------------------------
+
+    def summary(self):
+        """One line of hit/miss counts, e.g. for the end of a run."""
+        s = self.stats
+        return (f"DOI map {s['doi hit']} hits / {s['doi miss']} misses; "
+                f"pages {s['page fresh']} fresh, {s['page revalidated']} revalidated (304), "
+                f"{s['page miss']} fetched")
+
+    def sizes(self):
+        """(DOIs mapped, pages cached, compressed page bytes)."""
+        (dois,) = self.conn.execute("SELECT COUNT(*) FROM doi_urls").fetchone()
+        pages, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM pages").fetchone()
+        return dois, pages, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output_dir', help="output folder of download_reviews.py")
+    parser.add_argument('--clear', action='store_true', help="drop the cached pages")
+    args = parser.parse_args()
+
+    path = os.path.join(args.output_dir, CACHE_NAME)
+    if not os.path.exists(path):
+        print(f"No HTTP cache in {args.output_dir}")
+        return
+    with HttpCache(path) as cache:
+        if args.clear:
+            with cache.conn:
+                cache.conn.execute("DELETE FROM pages")
+            cache.conn.execute("VACUUM")
+        dois, pages, size = cache.sizes()
+        print(f"{dois} DOIs mapped, {pages} pages cached ({size / 1e6:.1f} MB compressed)")
+
+
+if __name__ == '__main__':
+    main()
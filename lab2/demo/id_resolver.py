@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Batch identifier lookup for download_reviews.py.
+
+Instead of one Semantic Scholar search per article, the DOIs and PubMed IDs
+of the whole review list are looked up before the downloads start, many per
+request:
+    Semantic Scholar paper/batch   POST, up to S2_BATCH_SIZE ids ("DOI:...",
+                                   "PMID:...") -> open access PDF, external ids
+    NCBI PMC ID converter          GET, up to IDCONV_BATCH_SIZE DOIs or PMIDs
+                                   -> PMC ID
+so n articles cost about n / 500 + n / 200 metadata requests instead of n.
+
+resolve_identifiers() returns key -> record, the key being 'doi:<doi in
+lower case>' or 'pmid:<id>'. A record only has the fields of the services
+that answered for it:
+    's2'     the Semantic Scholar paper (dict), or None: S2 does not know the id
+    'pmcid'  e.g. 'PMC1234567', or None: not in PubMed Central
+A missing field means the lookup failed, and download_reviews.py falls back
+to its per-article requests for that article.
+
+Usage (prints what the lookup finds for a review list):
+    python id_resolver.py review_articles.csv
+"""
+
+import argparse
+import csv
+
+import requests
+
+S2_BATCH_SIZE = 500  # ids per paper/batch request (the API's maximum)
+IDCONV_BATCH_SIZE = 200  # ids per ID converter request (the API's maximum)
+S2_FIELDS = 'externalIds,openAccessPdf'
+IDCONV_TOOL = 'download_reviews'  # NCBI asks callers of its E-utilities to name their tool
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def s2_batch(session, url, ids, batch_size=S2_BATCH_SIZE):
+    """{id: paper dict or None} for Semantic Scholar ids; ids of failed requests are left out."""
+    found = {}
+    for batch in chunks(ids, batch_size):
+        try:
+            response = session.post(url, params={'fields': S2_FIELDS}, json={'ids': batch}, timeout=60)
+            response.raise_for_status()
+            papers = response.json()
+        except (requests.RequestException, ValueError) as e:
+            print(f"  Semantic Scholar batch lookup of {len(batch)} ids failed: {e}")
+            continue
+        # One answer per id, in order; null for ids S2 does not know
+        found.update(zip(batch, papers))
+    return found
+
+
+def pmc_ids(session, url, ids, idtype, batch_size=IDCONV_BATCH_SIZE):
+    """{id: PMC ID or None} for DOIs or PubMed IDs (idtype 'doi' / 'pmid'); ids of failed requests are left out."""
+    found = {}
+    for batch in chunks(ids, batch_size):
+        params = {'ids': ','.join(batch), 'idtype': idtype, 'format': 'json', 'tool': IDCONV_TOOL}
+        try:
+            response = session.get(url, params=params, timeout=60)
+            response.raise_for_status()
+            records = response.json().get('records', [])
+        except (requests.RequestException, ValueError) as e:
+            print(f"  PMC ID converter lookup of {len(batch)} ids failed: {e}")
+            continue
+        # Unknown ids come back as records with "status": "error" and no pmcid
+        answers = {value.lower(): None for value in batch}
+        for record in records:
+            requested = str(record.get('requested-id', '')).lower()
+            if requested in answers:
+                answers[requested] = record.get('pmcid')
+        found.update((value, answers[value.lower()]) for value in batch)
+    return found
+
+
+def resolve_identifiers(session, dois, pmids, s2_url, idconv_url):
+    """Look up dois and pmids in batches; returns key -> record (see the module docstring)."""
+    dois = sorted({doi.lower() for doi in dois})
+    pmids = sorted(set(pmids))
+    records = {}
+
+    s2_ids = [f"DOI:{doi}" for doi in dois] + [f"PMID:{pmid}" for pmid in pmids]
+    keys = [f"doi:{doi}" for doi in dois] + [f"pmid:{pmid}" for pmid in pmids]
+    papers = s2_batch(session, s2_url, s2_ids)
+    for s2_id, key in zip(s2_ids, keys):
+        if s2_id in papers:
+            records.setdefault(key, {})['s2'] = papers[s2_id]
+
+    for idtype, values in (('doi', dois), ('pmid', pmids)):
+        for value, pmcid in pmc_ids(session, idconv_url, values, idtype).items():
+            records.setdefault(f"{idtype}:{value}", {})['pmcid'] = pmcid
+    return records
+
+
+def main():
+    import download_reviews
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="review list (.csv)")
+    args = parser.parse_args()
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        articles = list(csv.DictReader(f))
+    download_reviews.resolve_articles(articles)
+    for key, record in sorted(download_reviews.RESOLVED.items()):
+        pdf = ((record.get('s2') or {}).get('openAccessPdf') or {}).get('url')
+        print(f"{key}: {record.get('pmcid') or '-'} {pdf or ''}")
+
+
+if __name__ == '__main__':
+    main()
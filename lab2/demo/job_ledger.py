@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Persistent job ledger for download_reviews.py.
+
+One row per article (keyed by a hash of its citation) with its state:
+    pending     not tried yet
+    downloaded  PDF saved; never fetched again
+    paywalled   every strategy ran without an error but found no PDF; not
+                retried (pass --retry-paywalled to try these again)
+    failed      a strategy hit an error (timeout, 5xx, connection reset, ...);
+                retried by a later run once its backoff has passed
+                (LEDGER_BACKOFF seconds after the last attempt, doubled per
+                attempt; MAX_ATTEMPTS at most)
+plus the attempt count and the last error. A rerun after a crash or Ctrl-C
+only processes pending articles and due failures.
+
+The ledger is an SQLite file in the output folder (.download_ledger.sqlite),
+written only from the thread that runs download_all().
+
+Usage:
+    python job_ledger.py Reviews/                # counts per state
+    python job_ledger.py Reviews/ --failed       # failed articles with their last error
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+
+LEDGER_NAME = '.download_ledger.sqlite'
+STATES = ('pending', 'downloaded', 'paywalled', 'failed')
+MAX_ATTEMPTS = 5  # a failed article is given up on after this many attempts
+LEDGER_BACKOFF = 60  # seconds before the first retry of a failed article, doubled per attempt
+
+
+def article_key(row):
+    """Stable identity of a review-list row: hash of its citation (or title)."""
+    text = row.get('full_citation') or row.get('title') or ''
+    return hashlib.sha1(text.strip().encode('utf-8')).hexdigest()
+
+
+class JobLedger:
+    """SQLite-backed state of every article of a download run; use as a context manager."""
+
+    def __init__(self, path, max_attempts=MAX_ATTEMPTS, backoff=LEDGER_BACKOFF):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " key TEXT PRIMARY KEY,"
+            " title TEXT,"
+            " state TEXT NOT NULL DEFAULT 'pending',"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " last_error TEXT,"
+            " updated REAL)"
+        )
+        self.conn.commit()
+
+    @classmethod
+    def for_output_dir(cls, output_dir, **kwargs):
+        return cls(os.path.join(output_dir, LEDGER_NAME), **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def add(self, articles):
+        """Register the articles (rows) not in the ledger yet as pending; returns their keys in order."""
+        keys = [article_key(row) for row in articles]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO jobs (key, title, updated) VALUES (?, ?, ?)",
+                [(key, row.get('title', ''), time.time()) for key, row in zip(keys, articles)])
+        return keys
+
+    def due(self, keys, now=None, retry_paywalled=False):
+        """
+        The subset of keys that should be processed now, in the given order:
+        pending articles, and failed ones whose backoff (counted with this
+        ledger's backoff, from their last attempt) has passed.
+        """
+        now = time.time() if now is None else now
+        due = set()
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            for key, state, attempts, updated in self.conn.execute(
+                    "SELECT key, state, attempts, updated FROM jobs"
+                    f" WHERE key IN ({','.join('?' * len(chunk))})", chunk):
+                if state == 'pending' or (state == 'paywalled' and retry_paywalled):
+                    due.add(key)
+                elif state == 'failed' and attempts < self.max_attempts and self.next_attempt(attempts, updated) <= now:
+                    due.add(key)
+        return [key for key in keys if key in due]
+
+    def next_attempt(self, attempts, updated):
+        """When an article that failed `attempts` times, last at `updated`, may be retried."""
+        return updated + self.backoff * 2 ** (attempts - 1)
+
+    def record(self, key, state, error=None):
+        """Store the outcome of one attempt."""
+        now = time.time()
+        with self.conn:
+            (attempts,) = self.conn.execute(
+                "SELECT attempts + 1 FROM jobs WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "UPDATE jobs SET state = ?, attempts = ?, last_error = ?, updated = ?"
+                " WHERE key = ?", (state, attempts, error, now, key))
+
+    def counts(self):
+        """state -> number of articles."""
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"))
+        return counts
+
+    def failures(self):
+        """(title, attempts, last_error, next attempt time) of every failed article, next to retry first."""
+        rows = self.conn.execute(
+            "SELECT title, attempts, last_error, updated FROM jobs WHERE state = 'failed'")
+        failures = [(title, attempts, error, self.next_attempt(attempts, updated))
+                    for title, attempts, error, updated in rows]
+        return sorted(failures, key=lambda f: f[3])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output_dir', help="output folder of download_reviews.py")
+    parser.add_argument('--failed', action='store_true', help="list failed articles")
+    args = parser.parse_args()
+
+    path = os.path.join(args.output_dir, LEDGER_NAME)
+    if not os.path.exists(path):
+        print(f"No ledger in {args.output_dir}")
+        return
+    with JobLedger(path) as ledger:
+        for state, n in ledger.counts().items():
+            print(f"{state:<12}{n:>8}")
+        if args.failed:
+            now = time.time()
+            for title, attempts, error, next_attempt in ledger.failures():
+                if attempts >= ledger.max_attempts:
+                    when = "given up"
+                else:
+                    when = f"retry in {max(0, next_attempt - now):.0f}s"
+                print(f"\n{title[:80]}\n  {attempts} attempts, {when}: {error}")
+
+
+if __name__ == '__main__':
+    main()
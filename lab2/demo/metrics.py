@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Download metrics for download_reviews.py.
+
+Every request, PDF transfer, strategy attempt and article outcome is
+ - appended as one JSON object per line to an event log
+   (.download_metrics.jsonl in the output folder), e.g.
+       {"t": 1760000000.123, "event": "request", "host": "doi.org", "status": 302, "seconds": 0.21, "bytes": 0}
+       {"t": ..., "event": "transfer", "host": "www.nature.com", "bytes": 2403911, "seconds": 1.9}
+       {"t": ..., "event": "strategy", "strategy": "DOI", "result": "downloaded", "seconds": 3.4}
+       {"t": ..., "event": "article", "result": "downloaded", "source": "DOI", "seconds": 3.5}
+ - added up in memory: request latency histograms per host, requests per
+   host and status, bytes and bytes/s per host, timeouts and circuit breaker
+   openings per host, attempts and success rate per strategy, articles per result.
+
+With --metrics-port the running downloader serves the totals over HTTP:
+    /metrics   Prometheus text format (to scrape, or just curl)
+    /          the same human-readable summary this script prints
+
+Usage (summary of a finished or running download from its event log):
+    python metrics.py Reviews/
+    python metrics.py Reviews/.download_metrics.jsonl
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOG_NAME = '.download_metrics.jsonl'
+# Upper bounds (seconds) of the latency histogram buckets; the last one is +Inf
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def labels(**kwargs):
+    return '{' + ','.join(f'{name}="{label_value(value)}"' for name, value in kwargs.items()) + '}'
+
+
+class Histogram:
+    """Latency histogram with fixed LATENCY_BUCKETS, Prometheus style."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                break
+        else:
+            i = len(LATENCY_BUCKETS)
+        self.counts[i] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket the q-quantile falls in (inf if past the last bound)."""
+        if not self.count:
+            return 0.0
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS + (float('inf'),), self.counts):
+            seen += n
+            if seen >= q * self.count:
+                return bound
+        return float('inf')
+
+
+class Metrics:
+    """Thread-safe event log + running totals; use as a context manager."""
+
+    def __init__(self, log_path=None):
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._log = open(log_path, 'a', encoding='utf-8') if log_path else None
+        self.latency = defaultdict(Histogram)  # host -> request latency
+        self.requests = Counter()  # (host, status) -> requests; status 'timeout' / 'error' without an answer
+        self.bytes = Counter()  # host -> body bytes received
+        self.transfer_seconds = Counter()  # host -> seconds spent receiving those bytes
+        self.timeouts = Counter()  # host -> requests that timed out
+        self.strategies = Counter()  # (strategy, result) -> attempts
+        self.strategy_seconds = Counter()  # strategy -> seconds spent in it
+        self.articles = Counter()  # result -> articles
+        self.breakers = Counter()  # (host, 'opened' / 'closed') -> circuit breaker changes
+        self.in_progress = 0  # articles being processed right now
+        self.started = time.time()
+        self._server = None
+
+    @classmethod
+    def for_output_dir(cls, output_dir):
+        return cls(os.path.join(output_dir, LOG_NAME))
+
+    @classmethod
+    def from_log(cls, path):
+        """Totals of an event log written by an earlier (or still running) download."""
+        metrics = cls()
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue  # a line still being written
+                metrics.started = min(metrics.started, event.get('t', metrics.started))
+                metrics._apply(event)
+        return metrics
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._log:
+            self._log.close()
+            self._log = None
+
+    # --- Recording ------------------------------------------------------------
+
+    def _record(self, event, **fields):
+        fields = {'t': round(time.time(), 3), 'event': event, **fields}
+        with self._lock:
+            self._apply(fields)
+            if self._log:
+                self._log.write(json.dumps(fields, ensure_ascii=False) + '\n')
+                self._log.flush()
+
+    def _apply(self, event):
+        kind = event.get('event')
+        if kind == 'request':
+            host = event['host']
+            self.latency[host].observe(event['seconds'])
+            self.requests[host, event['status']] += 1
+            if event['status'] == 'timeout':
+                self.timeouts[host] += 1
+            if event.get('bytes'):
+                self.bytes[host] += event['bytes']
+                self.transfer_seconds[host] += event.get('total_seconds', event['seconds'])
+        elif kind == 'transfer':
+            self.bytes[event['host']] += event['bytes']
+            self.transfer_seconds[event['host']] += event['seconds']
+        elif kind == 'strategy':
+            self.strategies[event['strategy'], event['result']] += 1
+            self.strategy_seconds[event['strategy']] += event['seconds']
+        elif kind == 'breaker':
+            self.breakers[event['host'], event['state']] += 1
+        elif kind == 'article_start':
+            self.in_progress += 1
+        elif kind == 'article':
+            self.articles[event['result']] += 1
+            self.in_progress = max(0, self.in_progress - 1)
+
+    def request(self, host, status, seconds, size=0, total_seconds=None):
+        """
+        A request got an answer (status code) after seconds, or none ('timeout' /
+        'error'). size = body bytes if the body was read, total_seconds = time
+        including the body.
+        """
+        fields = {'bytes': size}
+        if total_seconds is not None:
+            fields['total_seconds'] = round(total_seconds, 4)
+        self._record('request', host=host, status=status, seconds=round(seconds, 4), **fields)
+
+    def transfer(self, host, size, seconds):
+        """A streamed body (a PDF) was read: size bytes in seconds."""
+        self._record('transfer', host=host, bytes=size, seconds=round(seconds, 4))
+
+    def strategy(self, strategy, result, seconds):
+        """A strategy attempt ended: result 'downloaded', 'no pdf', 'error' or 'cancelled'."""
+        self._record('strategy', strategy=strategy, result=result, seconds=round(seconds, 4))
+
+    def breaker(self, host, state):
+        """host's circuit breaker 'opened' or 'closed'."""
+        self._record('breaker', host=host, state=state)
+
+    def article_started(self, title):
+        self._record('article_start', title=title)
+
+    def article(self, title, result, source, seconds):
+        """An article is done: result 'downloaded', 'not available' or 'error'."""
+        self._record('article', title=title, result=result, source=source, seconds=round(seconds, 4))
+
+    # --- Reporting --------------------------------------------------------------
+
+    def prometheus(self):
+        """The totals in the Prometheus text exposition format."""
+        out = []
+        with self._lock:
+            out += ["# HELP download_request_seconds Time until a request was answered, per host.",
+                    "# TYPE download_request_seconds histogram"]
+            for host, hist in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, n in zip(LATENCY_BUCKETS + ('+Inf',), hist.counts):
+                    cumulative += n
+                    out.append(f"download_request_seconds_bucket{labels(host=host, le=bound)} {cumulative}")
+                out.append(f"download_request_seconds_sum{labels(host=host)} {hist.sum:.4f}")
+                out.append(f"download_request_seconds_count{labels(host=host)} {hist.count}")
+            for name, help_text, kind, values in (
+                    ('download_requests_total', "Requests per host and status.", 'counter',
+                     {labels(host=h, status=s): n for (h, s), n in self.requests.items()}),
+                    ('download_timeouts_total', "Requests that timed out, per host.", 'counter',
+                     {labels(host=h): n for h, n in self.timeouts.items()}),
+                    ('download_received_bytes_total', "Body bytes received per host.", 'counter',
+                     {labels(host=h): n for h, n in self.bytes.items()}),
+                    ('download_transfer_seconds_total', "Seconds spent receiving bodies, per host.", 'counter',
+                     {labels(host=h): round(n, 4) for h, n in self.transfer_seconds.items()}),
+                    ('download_strategy_attempts_total', "Strategy attempts per result.", 'counter',
+                     {labels(strategy=st, result=r): n for (st, r), n in self.strategies.items()}),
+                    ('download_strategy_seconds_total', "Seconds spent in each strategy.", 'counter',
+                     {labels(strategy=st): round(n, 4) for st, n in self.strategy_seconds.items()}),
+                    ('download_circuit_changes_total', "Circuit breakers opened / closed, per host.", 'counter',
+                     {labels(host=h, state=st): n for (h, st), n in self.breakers.items()}),
+                    ('download_articles_total', "Articles processed, per result.", 'counter',
+                     {labels(result=r): n for r, n in self.articles.items()}),
+                    ('download_articles_in_progress', "Articles being processed.", 'gauge',
+                     {'': self.in_progress})):
+                out += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                out += [f"{name}{key} {value}" for key, value in sorted(values.items())]
+        return '\n'.join(out) + '\n'
+
+    def summary(self):
+        """Human-readable tables: hosts by latency, strategies by success rate, articles."""
+        with self._lock:
+            elapsed = time.time() - self.started
+            done = sum(self.articles.values())
+            lines = [f"{done} articles done ({dict(self.articles)}), {self.in_progress} in progress, "
+                     f"{elapsed:.0f} s"]
+            lines.append(f"\n{'host':<36}{'requests':>9}{'errors':>7}{'timeouts':>9}"
+                         f"{'p50 s':>7}{'p95 s':>7}{'MB':>8}{'MB/s':>7}{'breaker':>8}")
+            hosts = sorted(self.latency, key=lambda h: self.latency[h].quantile(0.95), reverse=True)
+            for host in hosts:
+                hist = self.latency[host]
+                errors = sum(n for (h, status), n in self.requests.items()
+                             if h == host and (not isinstance(status, int) or status >= 400))
+                seconds = self.transfer_seconds[host]
+                rate = self.bytes[host] / seconds / 1e6 if seconds else 0.0
+                lines.append(f"{host[:35]:<36}{hist.count:>9}{errors:>7}{self.timeouts[host]:>9}"
+                             f"{hist.quantile(0.5):>7g}{hist.quantile(0.95):>7g}"
+                             f"{self.bytes[host] / 1e6:>8.1f}{rate:>7.2f}{self.breakers[host, 'opened']:>8}")
+            lines.append(f"\n{'strategy':<20}{'attempts':>9}{'PDFs':>6}{'success':>9}{'mean s':>8}")
+            for name in sorted({name for name, _ in self.strategies}):
+                attempts = sum(n for (st, _), n in self.strategies.items() if st == name)
+                won = self.strategies[name, 'downloaded']
+                lines.append(f"{name:<20}{attempts:>9}{won:>6}{won / attempts:>9.0%}"
+                             f"{self.strategy_seconds[name] / attempts:>8.2f}")
+        return '\n'.join(lines)
+
+    # --- HTTP endpoint ----------------------------------------------------------
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serve /metrics (Prometheus) and / (summary) on port from a background thread; returns the URL."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = metrics.prometheus(), 'text/plain; version=0.0.4'
+                elif self.path == '/':
+                    body, content_type = metrics.summary() + '\n', 'text/plain; charset=utf-8'
+                else:
+                    self.send_error(404)
+                    return
+                body = body.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help="output folder of download_reviews.py, or its event log")
+    parser.add_argument('--prometheus', action='store_true', help="print the Prometheus text format instead")
+    args = parser.parse_args()
+
+    path = os.path.join(args.path, LOG_NAME) if os.path.isdir(args.path) else args.path
+    if not os.path.exists(path):
+        print(f"No event log at {path}")
+        return
+    metrics = Metrics.from_log(path)
+    print(metrics.prometheus() if args.prometheus else metrics.summary())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Content-addressed PDF store for download_reviews.py.
+
+Every downloaded PDF is stored once, named by the sha256 of its bytes, in a
+sharded tree under the output folder:
+
+    Reviews/.pdf_store/blobs/3f/a2/3fa2...e9.pdf     (two levels of 256 folders)
+    Reviews/.pdf_store/index.sqlite                  DOI / article -> sha256
+    Reviews/.pdf_store/incoming/                     downloads in progress
+
+so a folder never holds more than a few files even with hundreds of
+thousands of PDFs, and the same paper downloaded twice (another title, other
+casing, a second DOI for the same file) is recognised by its hash and not
+stored again. The readable Reviews/<title>.pdf names are hard links to the
+blobs (copies where the file system has no hard links). Two different PDFs
+whose titles give the same file name (e.g. cut at 200 characters) both keep
+a name: the second one gets the start of its hash appended.
+
+Usage:
+    python pdf_store.py Reviews/ stats
+    python pdf_store.py Reviews/ verify     # re-hash every blob
+    python pdf_store.py Reviews/ find 10.1038/nrg.2016.4
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+STORE_DIR = '.pdf_store'
+HASH_CHUNK = 1024 * 1024
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def doi_key(doi):
+    return 'doi:' + doi.lower()
+
+
+class PdfStore:
+    """sha256-named PDF blobs plus an index of which article/DOI has which blob; thread-safe."""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.root = os.path.join(output_dir, STORE_DIR)
+        self.blob_dir = os.path.join(self.root, 'blobs')
+        self.incoming = os.path.join(self.root, 'incoming')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.incoming, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(self.root, 'index.sqlite'), timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " sha256 TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " stored REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS names ("
+            " key TEXT PRIMARY KEY,"
+            " sha256 TEXT NOT NULL,"
+            " title TEXT,"
+            " file_name TEXT);"
+            "CREATE INDEX IF NOT EXISTS names_sha256 ON names (sha256);"
+        )
+        self.conn.commit()
+        self.duplicates = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def blob_path(self, sha256):
+        return os.path.join(self.blob_dir, sha256[:2], sha256[2:4], sha256 + '.pdf')
+
+    def incoming_path(self, key):
+        """Where a download for `key` is written before add() files it."""
+        return os.path.join(self.incoming, key.replace(':', '_').replace('/', '_') + '.pdf')
+
+    def lookup(self, keys):
+        """The sha256 stored under the first of keys that is known, else None."""
+        with self._lock:
+            for key in keys:
+                row = self.conn.execute("SELECT sha256 FROM names WHERE key = ?", (key,)).fetchone()
+                if row and os.path.exists(self.blob_path(row[0])):
+                    return row[0]
+        return None
+
+    def add(self, path, keys, title, file_name):
+        """
+        File the PDF at path (which is moved or removed) under its hash, record
+        keys -> hash, and give it the readable name file_name in the output
+        folder. Returns (sha256, readable path, True if the blob was already stored).
+        """
+        sha256 = file_sha256(path)
+        blob = self.blob_path(sha256)
+        with self._lock:
+            duplicate = os.path.exists(blob)
+            if duplicate:
+                os.remove(path)
+                self.duplicates += 1
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                os.replace(path, blob)
+            readable = self._link(sha256, file_name)
+            with self.conn:
+                self.conn.execute("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?)",
+                                  (sha256, os.path.getsize(blob), time.time()))
+                self.conn.executemany("INSERT OR REPLACE INTO names VALUES (?, ?, ?, ?)",
+                                      [(key, sha256, title, os.path.basename(readable)) for key in keys])
+        return sha256, readable, duplicate
+
+    def link(self, sha256, keys, title, file_name):
+        """Record more keys for a stored blob and make sure it has a readable name; returns the path."""
+        with self._lock:
+            readable = self._link(sha256, file_name)
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO names VALUES (?, ?, ?, ?)",
+                                      [(key, sha256, title, os.path.basename(readable)) for key in keys])
+        return readable
+
+    def _link(self, sha256, file_name):
+        """Hard-link the blob as file_name in the output folder (or file_name_<hash>.pdf if taken)."""
+        blob = self.blob_path(sha256)
+        stem, ext = os.path.splitext(file_name)
+        for name in (file_name, f"{stem}_{sha256[:12]}{ext}"):
+            readable = os.path.join(self.output_dir, name)
+            # Taken already (maybe by another process just now): fine if it is this PDF
+            if self._create(blob, readable) or self._holds(readable, sha256, blob):
+                return readable
+        return blob
+
+    @staticmethod
+    def _create(blob, readable):
+        """Make readable a hard link to blob, or a copy where there are none; False if readable exists."""
+        try:
+            os.link(blob, readable)
+            return True
+        except FileExistsError:
+            return False
+        except OSError:
+            pass
+        try:
+            # 'x': never overwrite a name another process has just made
+            with open(blob, 'rb') as src, open(readable, 'xb') as dst:
+                shutil.copyfileobj(src, dst)
+            return True
+        except FileExistsError:
+            return False
+
+    @staticmethod
+    def _holds(readable, sha256, blob):
+        """Whether readable is the blob: the same file, or (a copy) the same bytes."""
+        try:
+            if os.path.samefile(readable, blob):
+                return True
+            return os.path.getsize(readable) == os.path.getsize(blob) and file_sha256(readable) == sha256
+        except OSError:
+            return False
+
+    def stats(self):
+        """(blobs, bytes, names)."""
+        blobs, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        (names,) = self.conn.execute("SELECT COUNT(*) FROM names").fetchone()
+        return blobs, size, names
+
+    def verify(self):
+        """sha256 of every blob that is missing or whose bytes no longer match its name."""
+        bad = []
+        for (sha256,) in self.conn.execute("SELECT sha256 FROM blobs"):
+            path = self.blob_path(sha256)
+            if not os.path.exists(path) or file_sha256(path) != sha256:
+                bad.append(sha256)
+        return bad
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output_dir', help="output folder of download_reviews.py")
+    parser.add_argument('command', choices=['stats', 'verify', 'find'])
+    parser.add_argument('doi', nargs='?', help="DOI for find")
+    args = parser.parse_args()
+
+    if not os.path.isdir(os.path.join(args.output_dir, STORE_DIR)):
+        print(f"No PDF store in {args.output_dir}")
+        return
+    with PdfStore(args.output_dir) as store:
+        if args.command == 'stats':
+            blobs, size, names = store.stats()
+            print(f"{blobs} PDFs ({size / 1e6:.1f} MB) under {names} DOIs/articles")
+        elif args.command == 'verify':
+            bad = store.verify()
+            print(f"{len(bad)} missing or damaged blobs")
+            for sha256 in bad:
+                print(f"  {store.blob_path(sha256)}")
+        elif args.command == 'find':
+            if not args.doi:
+                parser.error("find needs a DOI")
+            sha256 = store.lookup([doi_key(args.doi)])
+            print(store.blob_path(sha256) if sha256 else "not in the store")
+
+
+if __name__ == '__main__':
+    main()
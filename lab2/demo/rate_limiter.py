@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Per-host token-bucket rate limiting for download_reviews.py.
+
+Every host gets its own bucket: `rate` requests per second on average, with
+bursts of up to `burst` requests. Requests to different hosts never wait for
+each other, so doi.org, NCBI and the publishers are all fetched in parallel
+while each stays within its own rate. When a host answers 429 (or 503 with
+Retry-After), pause() stops all requests to that host until the time it
+asked for has passed.
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+class TokenBucket:
+    """rate tokens per second up to burst tokens; rate None never runs out."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def take(self, now):
+        """Take a token; return 0 on success, else how long to wait before trying again."""
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.rate is None:
+            return 0
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class HostRateLimiter:
+    """
+    Token bucket per host. host_rates maps a host name to (rate, burst);
+    other hosts get (default_rate, default_burst). A rate of None means no limit.
+    """
+
+    def __init__(self, default_rate=1.0, default_burst=2, host_rates=None):
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.host_rates = dict(host_rates or {})
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.waited = {}  # host -> total seconds requests spent waiting for it
+
+    def set_rate(self, host, rate, burst=None):
+        if rate is not None and not rate > 0:
+            raise ValueError(f"rate must be more than 0 requests per second, got {rate:g}")
+        with self._lock:
+            self.host_rates[host] = (rate, burst or max(1, int(rate or 1)))
+            self._buckets.pop(host, None)
+
+    def _bucket(self, host):
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            rate, burst = self.host_rates.get(host, (self.default_rate, self.default_burst))
+            bucket = self._buckets[host] = TokenBucket(rate, burst)
+        return bucket
+
+    def acquire(self, host):
+        """Block until a request to host is allowed; returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                wait = self._bucket(host).take(time.monotonic())
+                if not wait:
+                    if waited:
+                        self.waited[host] = self.waited.get(host, 0) + waited
+                    return waited
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, host, seconds):
+        """Hold back every request to host for `seconds` (e.g. after a 429)."""
+        with self._lock:
+            bucket = self._bucket(host)
+            bucket.paused_until = max(bucket.paused_until, time.monotonic() + seconds)
+
+
+def parse_retry_after(value, default=None):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return default
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
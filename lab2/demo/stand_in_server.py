@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the web services download_reviews.py talks to.
+
+Serves, on 127.0.0.1 with an artificial per-request latency:
+    GET  /doi/<doi>              302 redirect to the "publisher" host, which is
+                                 the same server reached as localhost (like doi.org)
+    GET  /article/<id>           publisher landing page (HTML with a PDF link;
+                                 ETag, If-None-Match gives 304)
+    GET  /full/<id>              landing page of the other layout (landing='full'),
+                                 whose PDF is at /pdf/<id>
+    HEAD /article/pdf/<id>       200 application/pdf
+    GET  /article/pdf/<id>       the PDF bytes (ETag; Range / If-Range give 206)
+    GET  /pmc/PMC<n>/, .../pdf/  PubMed Central page and PDF of the papers in `pmc`
+                                 (PMC ID = PMC_BASE + paper number); 404 otherwise
+    GET  /pubmed/...             404
+    GET  /idconv                 NCBI PMC ID converter (ids=..., format=json): the
+                                 PMC IDs of the DOIs whose paper is in `pmc`
+    GET  /s2/search              Semantic Scholar search: the paper's open access
+                                 PDF if it is in `open_access`, else no results
+    POST /s2/batch               Semantic Scholar paper/batch: one paper (or null)
+                                 per "DOI:..." id, with openAccessPdf if in `open_access`
+    GET  /oa/<id>                that open access PDF (a repository, not the publisher)
+
+Articles are registered with add_paper(); make_articles() builds matching
+review-list rows. point(module) aims a download_reviews module at the server.
+The JSON answers have the shapes of the real APIs' answers. Papers in
+`paywalled` have a landing page but no PDF at the publisher.
+`delays` adds seconds to every request of a route ('doi', 'article', 's2',
+'oa', 'pmc', 'pubmed': the first path segment), e.g. to stand in for a slow source.
+Papers listed in `interrupt` (id -> count) have their PDF body cut off
+halfway that many times, like a dropped connection; `bytes_sent` counts the
+body bytes served. handshake is slept once per new TCP connection (standing in for the TCP +
+TLS setup of a real HTTPS host), and `connections` counts them.
+With host_rate set, each Host is only allowed that many requests per second
+and gets 429 + Retry-After beyond it, like a real rate-limited service.
+
+Used by the benchmark_*.py scripts; can also be run on its own to poke at:
+    python stand_in_server.py [port]
+"""
+
+import hashlib
+import json
+import re
+import sys
+from urllib.parse import parse_qs
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DOI_PREFIX = "10.5555/standin."
+PMC_BASE = 9000000  # PMC ID of paper 00042 is PMC9000042
+
+
+def make_pdf(paper_id, size=200_000):
+    """Deterministic fake PDF of about `size` bytes."""
+    block = hashlib.sha256(paper_id.encode()).hexdigest().encode()
+    body = block * (size // len(block) + 1)
+    return b"%PDF-1.4\n" + body[:size] + b"\n%%EOF\n"
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections when many workers connect at
+    # once, and the client's SYN retry then stalls a request for a second
+    request_queue_size = 128
+
+
+class StandInServer:
+    """Threaded local HTTP server; use as a context manager."""
+
+    def __init__(self, latency=0.05, port=0, host_rate=None, retry_after=1, handshake=0.0):
+        self.latency = latency
+        self.handshake = handshake
+        self.connections = 0
+        self.host_rate = host_rate
+        self.retry_after = retry_after
+        self.papers = {}
+        self.slow_404 = 0.0  # extra seconds before a 404 (a publisher slow to reject guessed URLs)
+        self.landing = 'article'  # publisher layout the DOIs redirect to: 'article' or 'full'
+        self.open_access = set()  # paper ids the Semantic Scholar search finds a PDF for
+        self.pmc = set()  # paper ids that are in PubMed Central
+        self.paywalled = set()  # paper ids whose publisher serves no PDF
+        self.route_counts = Counter()  # first path segment -> requests
+        self.delays = {}  # first path segment -> extra seconds per request
+        self.interrupt = {}  # paper id -> times its PDF body is still to be cut off
+        self.bytes_sent = 0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.statuses = Counter()
+        self.host_times = defaultdict(list)  # Host header -> request arrival times
+        self._allowance = {}  # Host header -> (tokens, last update) for host_rate
+        self._lock = threading.Lock()
+        self.httpd = _Server(('127.0.0.1', port), self._handler_class())
+        self.httpd.daemon_threads = True
+        port = self.httpd.server_address[1]
+        self.url = f"http://127.0.0.1:{port}"
+        self.publisher_url = f"http://localhost:{port}"
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def add_paper(self, paper_id, size=200_000):
+        self.papers[paper_id] = make_pdf(paper_id, size)
+        return self.papers[paper_id]
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = self.max_in_flight = self.connections = self.bytes_sent = 0
+            self.statuses.clear()
+            self.route_counts.clear()
+            self.host_times.clear()
+            self._allowance.clear()
+
+    def peak_rate(self, host, window=1.0):
+        """Most requests the host (Host header) received within any `window` seconds."""
+        times = sorted(self.host_times.get(host, []))
+        best = start = 0
+        for end, t in enumerate(times):
+            while t - times[start] > window:
+                start += 1
+            best = max(best, end - start + 1)
+        return best / window
+
+    def _over_rate(self, host):
+        """Token bucket per Host (burst = one second's worth); True if this request is over."""
+        now = time.monotonic()
+        self.host_times[host].append(now)
+        if not self.host_rate:
+            return False
+        tokens, last = self._allowance.get(host, (self.host_rate, now))
+        tokens = min(self.host_rate, tokens + (now - last) * self.host_rate)
+        if tokens < 1:
+            self._allowance[host] = (tokens, now)
+            return True
+        self._allowance[host] = (tokens - 1, now)
+        return False
+
+    def _paper_of_doi(self, doi):
+        """Paper id a stand-in DOI (any case) names, or None."""
+        doi = doi.lower()
+        if not doi.startswith(DOI_PREFIX):
+            return None
+        paper_id = doi[len(DOI_PREFIX):]
+        return paper_id if paper_id in self.papers else None
+
+    def point(self, module):
+        """Aim download_reviews' service URLs at this server."""
+        module.DOI_RESOLVER = f"{self.url}/doi"
+        module.PMC_ARTICLES_URL = f"{self.url}/pmc"
+        module.PUBMED_URL = f"{self.url}/pubmed"
+        module.SEMANTIC_SCHOLAR_SEARCH_URL = f"{self.url}/s2/search"
+        module.SEMANTIC_SCHOLAR_BATCH_URL = f"{self.url}/s2/batch"
+        module.PMC_IDCONV_URL = f"{self.url}/idconv"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (ConnectionResetError, BrokenPipeError):
+                    pass  # the client dropped the connection (e.g. aborted a download)
+
+            def _finish(self):
+                # The request stops counting as in flight once its response is
+                # decided, before the body goes out: the client cannot send its
+                # next request before it has read this body, so the count never
+                # includes a request that has in fact already been answered
+                if self._in_flight:
+                    self._in_flight = False
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def setup(self):
+                # Once per TCP connection, however many requests it carries
+                with server._lock:
+                    server.connections += 1
+                time.sleep(server.handshake)
+                super().setup()
+
+            def _send(self, status, body=b'', content_type='text/html', headers=None, head=False, cut=False):
+                if status == 404:
+                    time.sleep(server.slow_404)
+                with server._lock:
+                    server.statuses[status] += 1
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self._finish()
+                if not head:
+                    if cut:
+                        # Half the body, then drop the connection
+                        body = body[:len(body) // 2]
+                        self.close_connection = True
+                    self.wfile.write(body)
+                    with server._lock:
+                        server.bytes_sent += len(body)
+
+            def _route(self, head=False):
+                host = self.headers.get('Host', '').split(':')[0]
+                with server._lock:
+                    server.requests += 1
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                    over_rate = server._over_rate(host)
+                self._in_flight = True
+                try:
+                    if over_rate:
+                        return self._send(429, headers={'Retry-After': str(server.retry_after)}, head=head)
+                    path, _, query = self.path.partition('?')
+                    with server._lock:
+                        server.route_counts[path.split('/')[1]] += 1
+                    time.sleep(server.latency + server.delays.get(path.split('/')[1], 0))
+                    if path.startswith('/doi/'):
+                        doi = path[len('/doi/'):]
+                        paper_id = doi[len(DOI_PREFIX):] if doi.startswith(DOI_PREFIX) else None
+                        if paper_id in server.papers:
+                            location = f"{server.publisher_url}/{server.landing}/{paper_id}"
+                            return self._send(302, headers={'Location': location}, head=head)
+                        return self._send(404, head=head)
+                    if path.startswith('/oa/'):
+                        paper_id = path[len('/oa/'):]
+                        if paper_id not in server.open_access or paper_id not in server.papers:
+                            return self._send(404, head=head)
+                        return self._send_pdf(paper_id, server.papers[paper_id], head)
+                    if path.startswith('/pdf/'):
+                        paper_id = path[len('/pdf/'):]
+                        if paper_id not in server.papers or paper_id in server.paywalled:
+                            return self._send(404, head=head)
+                        return self._send_pdf(paper_id, server.papers[paper_id], head)
+                    if path.startswith('/full/'):
+                        paper_id = path[len('/full/'):]
+                        if paper_id not in server.papers:
+                            return self._send(404, head=head)
+                        html = (f'<html><body><a href="/supplement/{paper_id}.pdf">Supplementary data (PDF)</a>'
+                                f'<a href="/pdf/{paper_id}">PDF</a></body></html>')
+                        return self._send(200, html.encode(), head=head)
+                    if path.startswith('/article/pdf/'):
+                        paper_id = path[len('/article/pdf/'):]
+                        pdf = server.papers.get(paper_id)
+                        if pdf is None or paper_id in server.paywalled:
+                            return self._send(404, head=head)
+                        return self._send_pdf(paper_id, pdf, head)
+                    if path.startswith('/article/'):
+                        paper_id = path[len('/article/'):]
+                        if paper_id not in server.papers:
+                            return self._send(404, head=head)
+                        html = f'<html><body><a href="/article/pdf/{paper_id}">Download PDF</a></body></html>'
+                        etag = f'"page-{paper_id}"'
+                        if self.headers.get('If-None-Match') == etag:
+                            return self._send(304, headers={'ETag': etag}, head=True)
+                        return self._send(200, html.encode(), headers={'ETag': etag}, head=head)
+                    if path.startswith('/s2/search'):
+                        m = re.search(r"number (\d+)", parse_qs(query).get('query', [''])[0])
+                        paper_id = f"{int(m.group(1)):05d}" if m else None
+                        data = []
+                        if paper_id in server.open_access and paper_id in server.papers:
+                            pdf_url = f"{server.url}/oa/{paper_id}"
+                            data = [{'paperId': paper_id, 'openAccessPdf': {'url': pdf_url}}]
+                        return self._send(200, json.dumps({'total': len(data), 'data': data}).encode(),
+                                          'application/json', head=head)
+                    if path.startswith('/s2/batch') and self.command == 'POST':
+                        papers = []
+                        for s2_id in json.loads(self._body or b'{}').get('ids', []):
+                            paper_id = server._paper_of_doi(s2_id[len('DOI:'):]) if s2_id.startswith('DOI:') else None
+                            if paper_id is None:
+                                papers.append(None)
+                                continue
+                            pdf = None
+                            if paper_id in server.open_access:
+                                pdf = {'url': f"{server.url}/oa/{paper_id}", 'status': 'GREEN'}
+                            papers.append({'paperId': f"standin{paper_id}",
+                                           'externalIds': {'DOI': DOI_PREFIX + paper_id},
+                                           'openAccessPdf': pdf})
+                        return self._send(200, json.dumps(papers).encode(), 'application/json')
+                    if path.startswith('/idconv'):
+                        params = parse_qs(query)
+                        records = []
+                        for requested in params.get('ids', [''])[0].split(','):
+                            paper_id = server._paper_of_doi(requested)
+                            if paper_id in server.pmc:
+                                records.append({'pmcid': f"PMC{PMC_BASE + int(paper_id)}",
+                                                'doi': DOI_PREFIX + paper_id, 'requested-id': requested})
+                            else:
+                                records.append({'requested-id': requested, 'status': 'error',
+                                                'errmsg': 'Identifier not found in PMC'})
+                        answer = {'status': 'ok', 'responseDate': time.strftime('%Y-%m-%d %H:%M:%S'),
+                                  'request': query, 'records': records}
+                        return self._send(200, json.dumps(answer).encode(), 'application/json', head=head)
+                    m = re.fullmatch(r"/pmc/PMC(\d+)/(pdf/)?", path)
+                    if m:
+                        paper_id = f"{int(m.group(1)) - PMC_BASE:05d}"
+                        if paper_id not in server.pmc or paper_id not in server.papers:
+                            return self._send(404, head=head)
+                        if m.group(2):
+                            return self._send_pdf(paper_id, server.papers[paper_id], head)
+                        return self._send(200, f'<html><body><a href="pdf/">PDF</a></body></html>'.encode(), head=head)
+                    return self._send(404, head=head)
+                finally:
+                    self._finish()
+
+            def _send_pdf(self, paper_id, pdf, head):
+                etag = '"%s"' % hashlib.sha1(pdf).hexdigest()[:16]
+                headers = {'ETag': etag, 'Accept-Ranges': 'bytes'}
+                cut = False
+                if not head:
+                    with server._lock:
+                        if server.interrupt.get(paper_id):
+                            server.interrupt[paper_id] -= 1
+                            cut = True
+                m = re.fullmatch(r"bytes=(\d+)-", self.headers.get('Range', ''))
+                if m and self.headers.get('If-Range', etag) == etag:
+                    start = int(m.group(1))
+                    if start >= len(pdf):
+                        return self._send(416, headers={'Content-Range': f"bytes */{len(pdf)}"}, head=head)
+                    headers['Content-Range'] = f"bytes {start}-{len(pdf) - 1}/{len(pdf)}"
+                    return self._send(206, pdf[start:], 'application/pdf', headers, head, cut)
+                return self._send(200, pdf, 'application/pdf', headers, head, cut)
+
+            def do_GET(self):
+                self._route()
+
+            def do_POST(self):
+                # The body is read first, so a 429 answer leaves the connection usable
+                self._body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self._route()
+
+            def do_HEAD(self):
+                self._route(head=True)
+
+        return Handler
+
+
+def make_articles(server, n, size=200_000):
+    """Register n papers on the server and return review-list rows citing them by DOI."""
+    rows = []
+    for i in range(n):
+        paper_id = f"{i:05d}"
+        server.add_paper(paper_id, size)
+        rows.append({
+            'title': f"Stand-in review number {i}",
+            'authors': f"Author{i}, A",
+            'full_citation': f"Author{i}, A. Stand-in review number {i}. Trends Test. "
+                             f"https://doi.org/{DOI_PREFIX}{paper_id} (2024).",
+            'journal': 'Trends Test',
+            'year': '2024',
+        })
+    return rows
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    with StandInServer(port=port) as server:
+        make_articles(server, 10)
+        print(f"Serving 10 stand-in papers on {server.url} (DOIs {DOI_PREFIX}00000..00009); Ctrl-C to stop")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
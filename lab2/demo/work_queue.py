@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Shared work queue for running download_reviews.py on several processes or
+machines at once (--queue).
+
+The queue is one SQLite file that every worker opens. Each article is a job
+row holding the review-list row itself, so a worker needs nothing but the
+queue file:
+    pending     not tried yet
+    leased      a worker is on it until lease_until; the worker renews its
+                leases with a heartbeat every LEASE / 3 seconds, and a job
+                whose lease ran out (the worker crashed, was killed or lost
+                its machine) is pending again for the next worker that asks
+                (this counts as an attempt)
+    downloaded / paywalled / failed
+                as in job_ledger.py: failed jobs come back after a backoff
+                (doubled per attempt, MAX_ATTEMPTS attempts at most)
+Workers claim one job at a time inside an IMMEDIATE transaction, so no two
+workers get the same job while its lease holds. The batch lookup of the
+jobs' DOIs / PubMed IDs (id_resolver.py) is done once per queue too: its
+records are kept in the file, and each chunk of jobs is looked up by
+whichever worker marks it first (shared_lookup). The mark is a lease like a
+job's, renewed by the same heartbeat, and the network requests are made
+outside any transaction, so the other workers' claims and heartbeats are
+never held up by a lookup. The outcome of every job
+(state, worker, PDF file, last error) is in the same file, and
+write_manifest() turns it into one manifest.csv for the whole run, whichever
+worker did what.
+
+Worker processes on one machine can share the queue in WAL mode (the
+default). SQLite's WAL needs shared memory, so workers on different machines
+sharing the file over a network file system must use the rollback journal
+instead (network_fs=True, --queue-network-fs); that file system's locking
+has to work for either.
+
+Usage:
+    python work_queue.py queue.sqlite                      # job counts and workers
+    python work_queue.py queue.sqlite --failed             # failed jobs with their last error
+    python work_queue.py queue.sqlite --manifest manifest.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from job_ledger import article_key
+
+STATES = ('pending', 'leased', 'downloaded', 'paywalled', 'failed')
+LEASE = 120  # seconds a claimed job stays with its worker without a heartbeat
+MAX_ATTEMPTS = 5
+QUEUE_BACKOFF = 60  # seconds before the first retry of a failed job, doubled per attempt
+LOOKUP_CHUNK = 500  # jobs looked up at a time by shared_lookup (one Semantic Scholar batch)
+LOOKUP_COLUMNS = [('looked_up', 'INTEGER NOT NULL DEFAULT 0'), ('lookup_by', 'TEXT'), ('lookup_until', 'REAL')]
+MANIFEST_COLUMNS = ['title', 'state', 'attempts', 'worker', 'source', 'pdf_file', 'last_error', 'updated', 'key']
+
+
+class WorkQueue:
+    """SQLite job queue with leases, shared by worker processes; use as a context manager."""
+
+    def __init__(self, path, lease=LEASE, max_attempts=MAX_ATTEMPTS, backoff=QUEUE_BACKOFF, network_fs=False):
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._lock = threading.Lock()  # one statement / transaction at a time on the shared connection
+        # isolation_level=None: transactions are begun explicitly (BEGIN IMMEDIATE)
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=" + ("DELETE" if network_fs else "WAL"))
+        self.conn.execute("PRAGMA busy_timeout=60000")
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " key TEXT PRIMARY KEY,"
+            " title TEXT,"
+            " row TEXT NOT NULL,"
+            " state TEXT NOT NULL DEFAULT 'pending',"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " worker TEXT,"
+            " lease_until REAL,"
+            " source TEXT,"
+            " pdf_file TEXT,"
+            " last_error TEXT,"
+            " updated REAL,"
+            " looked_up INTEGER NOT NULL DEFAULT 0,"
+            " lookup_by TEXT,"
+            " lookup_until REAL);"
+            "CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);"
+            "CREATE TABLE IF NOT EXISTS lookups ("
+            " id TEXT PRIMARY KEY,"
+            " record TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS workers ("
+            " worker TEXT PRIMARY KEY,"
+            " started REAL,"
+            " heartbeat REAL,"
+            " done INTEGER NOT NULL DEFAULT 0);"
+        )
+        # Queue files made before the shared lookup have no lookup columns yet
+        columns = {c[1] for c in self.conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in LOOKUP_COLUMNS:
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE: take the write lock up front, so read-then-update can't race another worker."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _execute_many(self, sql, params):
+        with self._transaction() as conn:
+            conn.executemany(sql, params)
+
+    def enqueue(self, articles):
+        """Add the articles (rows) not queued yet as pending jobs; returns how many were new."""
+        jobs = [(article_key(row), row.get('title', ''), json.dumps(row, ensure_ascii=False), time.time())
+                for row in articles]
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO jobs (key, title, row, updated) VALUES (?, ?, ?, ?)", jobs)
+            added = conn.total_changes - before
+        return added
+
+    def shared_lookup(self, lookup, worker, poll=1.0):
+        """
+        Batch-look up the identifiers of the jobs no worker has looked up yet,
+        LOOKUP_CHUNK jobs at a time: lookup(rows) returns id -> record
+        (download_reviews.resolve_articles). Each chunk is first marked as
+        worker's for one lease, in a short transaction; the lookup itself runs
+        outside any transaction and its records are written in a second one.
+        Chunks other workers are on are waited for (polling every `poll`
+        seconds) and taken over if their mark runs out, so workers starting
+        together share the chunks instead of repeating them. heartbeat()
+        renews worker's marks. Returns the records of the whole queue.
+        """
+        while True:
+            now = time.time()
+            with self._transaction() as conn:
+                jobs = conn.execute(
+                    "SELECT key, row FROM jobs WHERE NOT looked_up AND (lookup_until IS NULL OR lookup_until < ?)"
+                    " LIMIT ?", (now, LOOKUP_CHUNK)).fetchall()
+                keys = [key for key, _ in jobs]
+                conn.executemany("UPDATE jobs SET lookup_by = ?, lookup_until = ? WHERE key = ?",
+                                 [(worker, now + self.lease, key) for key in keys])
+                if not keys:
+                    [(busy,)] = conn.execute("SELECT COUNT(*) FROM jobs WHERE NOT looked_up").fetchall()
+            if not keys:
+                if not busy:
+                    break
+                time.sleep(poll)  # other workers are looking up the rest
+                continue
+            try:
+                records = lookup([json.loads(row) for _, row in jobs])
+            except BaseException:
+                # Let the next worker have the chunk at once
+                self._execute_many("UPDATE jobs SET lookup_by = NULL, lookup_until = NULL"
+                                   " WHERE key = ? AND lookup_by = ? AND NOT looked_up",
+                                   [(key, worker) for key in keys])
+                raise
+            with self._transaction() as conn:
+                conn.executemany("INSERT OR REPLACE INTO lookups (id, record) VALUES (?, ?)",
+                                 [(key, json.dumps(record)) for key, record in records.items()])
+                conn.executemany("UPDATE jobs SET looked_up = 1, lookup_by = NULL, lookup_until = NULL"
+                                 " WHERE key = ?", [(key,) for key in keys])
+        return {key: json.loads(record) for key, record in self._execute("SELECT id, record FROM lookups")}
+
+    def retry_paywalled(self):
+        """Put paywalled jobs back to pending."""
+        self._execute("UPDATE jobs SET state = 'pending' WHERE state = 'paywalled'")
+
+    def register(self, worker):
+        now = time.time()
+        self._execute("INSERT OR REPLACE INTO workers (worker, started, heartbeat) VALUES (?, ?, ?)",
+                      (worker, now, now))
+
+    def claim(self, worker):
+        """
+        Lease the next job to worker: a pending one (including those whose
+        lease expired) or a failed one whose backoff has passed.
+        Returns (key, row) or None.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            # Expired leases: the worker is gone, its jobs go back in line at
+            # once (a job that keeps outliving its workers ends up failed)
+            conn.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END,"
+                " attempts = attempts + 1, updated = ?, last_error = 'lease of ' || worker || ' expired'"
+                " WHERE state = 'leased' AND lease_until < ?", (self.max_attempts, now, now))
+            found = conn.execute(
+                "SELECT key, row FROM jobs WHERE state = 'pending' OR (state = 'failed' AND attempts < ?"
+                " AND updated + ? * (1 << MAX(attempts - 1, 0)) <= ?) ORDER BY state = 'failed', updated LIMIT 1",
+                (self.max_attempts, self.backoff, now)).fetchone()
+            if found:
+                conn.execute("UPDATE jobs SET state = 'leased', worker = ?, lease_until = ? WHERE key = ?",
+                             (worker, now + self.lease, found[0]))
+        return (found[0], json.loads(found[1])) if found else None
+
+    def heartbeat(self, worker, keys=None):
+        """Renew the leases of the jobs worker holds (only those in keys, if given) and its lookup marks."""
+        now = time.time()
+        with self._transaction() as conn:
+            if keys is None:
+                conn.execute("UPDATE jobs SET lease_until = ? WHERE state = 'leased' AND worker = ?",
+                             (now + self.lease, worker))
+            else:
+                conn.executemany("UPDATE jobs SET lease_until = ? WHERE state = 'leased' AND worker = ? AND key = ?",
+                                 [(now + self.lease, worker, key) for key in keys])
+            conn.execute("UPDATE jobs SET lookup_until = ? WHERE lookup_by = ? AND NOT looked_up",
+                         (now + self.lease, worker))
+            conn.execute("UPDATE workers SET heartbeat = ? WHERE worker = ?", (now, worker))
+
+    def complete(self, key, worker, state, error=None, source=None, pdf_file=None):
+        """
+        Record the outcome of worker's attempt at key. A worker whose lease ran
+        out meanwhile only records a download, and never over another worker's.
+        Returns True if recorded.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            current = conn.execute("SELECT state, worker FROM jobs WHERE key = ?", (key,)).fetchone()
+            mine = current is not None and current == ('leased', worker)
+            if mine or (state == 'downloaded' and current is not None and current[0] != 'downloaded'):
+                conn.execute(
+                    "UPDATE jobs SET state = ?, attempts = attempts + 1, worker = ?, lease_until = NULL,"
+                    " source = ?, pdf_file = ?, last_error = ?, updated = ? WHERE key = ?",
+                    (state, worker, source, pdf_file, error, now, key))
+                conn.execute("UPDATE workers SET done = done + 1 WHERE worker = ?", (worker,))
+                recorded = True
+            else:
+                recorded = False
+        return recorded
+
+    def open_jobs(self):
+        """Jobs some worker may still process now: pending, leased, or failed and due."""
+        [(n,)] = self._execute(
+            "SELECT COUNT(*) FROM jobs WHERE state IN ('pending', 'leased')"
+            " OR (state = 'failed' AND attempts < ? AND updated + ? * (1 << MAX(attempts - 1, 0)) <= ?)",
+            (self.max_attempts, self.backoff, time.time()))
+        return n
+
+    def counts(self):
+        """state -> number of jobs."""
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(self._execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"))
+        return counts
+
+    def workers(self):
+        """(worker, started, last heartbeat, jobs done) of every worker that joined."""
+        return self._execute("SELECT worker, started, heartbeat, done FROM workers ORDER BY started")
+
+    def failures(self):
+        """(title, attempts, last_error) of every failed job."""
+        return self._execute("SELECT title, attempts, last_error FROM jobs WHERE state = 'failed' ORDER BY updated")
+
+    def write_manifest(self, path):
+        """Write every job's outcome to one CSV (atomically replaced); returns the number of rows."""
+        rows = self._execute(f"SELECT {', '.join(MANIFEST_COLUMNS)} FROM jobs ORDER BY title")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(MANIFEST_COLUMNS)
+            for row in rows:
+                updated = row[MANIFEST_COLUMNS.index('updated')]
+                row = list(row)
+                row[MANIFEST_COLUMNS.index('updated')] = (
+                    time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(updated)) if updated else '')
+                writer.writerow(row)
+        os.replace(tmp, path)
+        return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('queue', help="queue file (download_reviews.py --queue)")
+    parser.add_argument('--failed', action='store_true', help="list failed jobs")
+    parser.add_argument('--manifest', metavar='CSV', help="write the manifest of all jobs to CSV")
+    parser.add_argument('--network-fs', action='store_true', help="the file is on a network file system")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.queue):
+        print(f"No queue at {args.queue}")
+        return
+    with WorkQueue(args.queue, network_fs=args.network_fs) as queue:
+        for state, n in queue.counts().items():
+            print(f"{state:<12}{n:>8}")
+        now = time.time()
+        for worker, started, heartbeat, done in queue.workers():
+            print(f"worker {worker}: {done} jobs, last heartbeat {now - heartbeat:.0f}s ago")
+        if args.failed:
+            for title, attempts, error in queue.failures():
+                print(f"\n{title[:80]}\n  {attempts} attempts: {error}")
+        if args.manifest:
+            print(f"{queue.write_manifest(args.manifest)} jobs written to {args.manifest}")
+
+
+if __name__ == '__main__':
+    main()